@@ -1,5 +1,8 @@
 from flask import Flask, render_template, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import load_only
+from shapely.geometry import LineString
 import json
 import os
 import logging
@@ -7,6 +10,12 @@ from datetime import datetime
 from flask import send_from_directory, abort
 import os
 
+from backend.utils.geo_utils import decode_profile
+from backend.utils.json_utils import dumps_with_raw, json_response, stream_array, stream_lines, streaming_response
+from backend.utils.instrumentation import (init_instrumentation, instrument_engine, timed_map, timer,
+                                           collect_timings, merge_timings)
+from backend.utils.concurrency import get_executor
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +29,7 @@ db = SQLAlchemy()
 # Define models
 class Road(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    source_key = db.Column(db.String(64), nullable=True, index=True)  # OSM id or geometry hash, stable across imports
     name = db.Column(db.String(100), nullable=True)
     highway = db.Column(db.String(50), nullable=False)
     surface = db.Column(db.String(50), nullable=True)
@@ -30,18 +40,55 @@ class Road(db.Model):
     maxspeed = db.Column(db.Integer, nullable=True)
     coordinates_json = db.Column(db.Text, nullable=False)  # Stored as GeoJSON or JSON array
     elevation_profile_json = db.Column(db.Text, nullable=True)  # Stored as JSON array
+    profile_spacing = db.Column(db.Float, nullable=True)  # meters between profile samples
+    profile_start_dm = db.Column(db.Integer, nullable=True)  # first profile elevation in decimetres
+    profile_deltas = db.Column(db.LargeBinary, nullable=True)  # int16 decimetre steps, little-endian
     featured = db.Column(db.Boolean, default=False)
     favorite = db.Column(db.Boolean, default=False)
     difficulty = db.Column(db.String(20), nullable=True)
     
+    # API fields of to_dict and the columns needed to serialise them
+    API_FIELDS = {
+        'id': 'id',
+        'name': 'name',
+        'highway': 'highway',
+        'surface': 'surface',
+        'length_meters': 'length_meters',
+        'min_elevation': 'min_elevation',
+        'max_elevation': 'max_elevation',
+        'gradient': 'gradient',
+        'maxspeed': 'maxspeed',
+        'coordinates': 'coordinates_json',
+        'favorite': 'favorite',
+        'difficulty': 'difficulty'
+    }
+    GEOMETRY_MODES = ('none', 'simplified', 'full')
+    
+    @classmethod
+    def load_only_fields(cls, fields):
+        """Query option loading only the columns needed for the given API fields"""
+        return load_only(*(getattr(cls, cls.API_FIELDS[field]) for field in fields))
+    
     def get_coordinates(self):
         """Return the road's coordinates as a Python list"""
         if self.coordinates_json:
             return json.loads(self.coordinates_json)
         return []
     
+    def get_elevation_arrays(self):
+        """Return the stored sampled profile as (distances, elevations) arrays, or None"""
+        if self.profile_deltas is None or self.profile_start_dm is None:
+            return None
+        return decode_profile(self.profile_start_dm, self.profile_deltas, self.profile_spacing)
+    
     def get_elevation_profile(self):
         """Return the road's elevation profile as a Python list"""
+        arrays = self.get_elevation_arrays()
+        if arrays is not None:
+            distances, elevations = arrays
+            return [{'distance': d, 'elevation': e}
+                    for d, e in zip(distances.tolist(), elevations.tolist())]
+        
         if self.elevation_profile_json:
             return json.loads(self.elevation_profile_json)
         
@@ -69,22 +116,58 @@ class Road(db.Model):
             
         return profile
 
-    def to_dict(self):
-        """Convert road object to dictionary for API response"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'highway': self.highway,
-            'surface': self.surface if hasattr(self, 'surface') else None,
-            'length_meters': self.length_meters,
-            'min_elevation': self.min_elevation,
-            'max_elevation': self.max_elevation,
-            'gradient': self.gradient,
-            'maxspeed': self.maxspeed,
-            'coordinates': self.get_coordinates(),
-            'favorite': self.favorite if hasattr(self, 'favorite') else False,
-            'difficulty': self.difficulty if hasattr(self, 'difficulty') else None
-        }
+    def get_simplified_coordinates(self, tolerance):
+        """Return the road's coordinates simplified with Douglas-Peucker"""
+        coordinates = self.get_coordinates()
+        if len(coordinates) < 3:
+            return coordinates
+        simplified = LineString(coordinates).simplify(tolerance, preserve_topology=False)
+        return [list(coord) for coord in simplified.coords]
+    
+    def to_dict(self, fields=None, geometry='full', simplify_tolerance=0.0001):
+        """
+        Convert road object to dictionary for API response
+        
+        Args:
+            fields: API field names to include; None includes all of API_FIELDS
+            geometry: 'full', 'simplified' or 'none' for the coordinates field
+            simplify_tolerance: Tolerance in degrees for simplified coordinates
+        """
+        fields = Road.API_FIELDS if fields is None else fields
+        data = {}
+        for field in fields:
+            if field == 'coordinates':
+                if geometry == 'full':
+                    data['coordinates'] = self.get_coordinates()
+                elif geometry == 'simplified':
+                    data['coordinates'] = self.get_simplified_coordinates(simplify_tolerance)
+            elif field == 'favorite':
+                data['favorite'] = self.favorite if hasattr(self, 'favorite') else False
+            else:
+                data[field] = getattr(self, field, None)
+        return data
+    
+    def to_json(self, fields=None, geometry='full', simplify_tolerance=0.0001, extra=None):
+        """
+        Serialize the road to JSON bytes for API responses
+        
+        Full coordinates are copied from the stored JSON text as they are
+        instead of being decoded and encoded again.
+        
+        Args:
+            fields, geometry, simplify_tolerance: As for to_dict
+            extra: Optional dictionary of additional members
+        """
+        fields = list(Road.API_FIELDS) if fields is None else fields
+        raw = {}
+        if geometry == 'full' and 'coordinates' in fields:
+            fields = [field for field in fields if field != 'coordinates']
+            raw['coordinates'] = self.coordinates_json or '[]'
+        
+        data = self.to_dict(fields, geometry, simplify_tolerance)
+        if extra:
+            data.update(extra)
+        return dumps_with_raw(data, raw)
 
 class Hill(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -114,6 +197,32 @@ class Hill(db.Model):
             'image': self.image
         }
 
+def add_missing_columns(model):
+    """
+    Add columns defined on a model but missing from its existing table.
+    
+    db.create_all() only creates missing tables, so databases created before a
+    column was added to a model need an ALTER TABLE. New columns must be nullable.
+    """
+    table = model.__table__
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table.name):
+        return
+    
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    with db.engine.begin() as connection:
+        added = set()
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.add(column.name)
+                logger.info(f"Added column {table.name}.{column.name}")
+        # Indexes on added columns are not created by create_all either
+        for index in table.indexes:
+            if added & {column.name for column in index.columns}:
+                index.create(connection, checkfirst=True)
+
 # Helper function for consistent API responses
 def api_response(data=None, status="success", message=None):
     response = {
@@ -146,6 +255,10 @@ def create_app():
     # Register blueprints
     app.register_blueprint(hill_routes)
     
+    # Request timing: Server-Timing headers and Prometheus metrics at /metrics
+    if app.config.get('INSTRUMENTATION_ENABLED', False):
+        init_instrumentation(app, server_timing=app.config.get('SERVER_TIMING', False))
+    
     # Ensure the instance folder exists
     os.makedirs(app.instance_path, exist_ok=True)
     
@@ -231,8 +344,31 @@ def create_app():
         max_length = request.args.get('max_length', type=float)
         road_type = request.args.get('road_type')
         
-        # Base query
-        query = Road.query
+        # Field projection: fields=id,name,gradient and geometry=none|simplified|full
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else list(Road.API_FIELDS)
+        unknown = [field for field in fields if field not in Road.API_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}", 'status': 'error'}), 400
+        
+        geometry = request.args.get('geometry')
+        if geometry is not None and geometry not in Road.GEOMETRY_MODES:
+            return jsonify({'error': f"geometry must be one of {', '.join(Road.GEOMETRY_MODES)}",
+                            'status': 'error'}), 400
+        # Output format: one JSON document, or one road per line
+        output_format = request.args.get('format', 'json')
+        if output_format not in ('json', 'ndjson'):
+            return jsonify({'error': "format must be json or ndjson", 'status': 'error'}), 400
+        
+        if geometry == 'none':
+            fields = [field for field in fields if field != 'coordinates']
+        elif geometry is not None and 'coordinates' not in fields:
+            fields.append('coordinates')
+        if not fields:
+            return jsonify({'error': "No fields left to return", 'status': 'error'}), 400
+        
+        # Base query, loading only the columns the response needs
+        query = Road.query.options(Road.load_only_fields(fields))
         
         # Apply filters if provided
         if min_gradient is not None:
@@ -246,15 +382,19 @@ def create_app():
         if road_type:
             query = query.filter(Road.highway == road_type)
         
-        # Get roads
-        roads = query.all()
+        # Stream roads from a server-side cursor instead of loading them all
+        roads = query.order_by(Road.id).yield_per(app.config.get('STREAM_BATCH_SIZE', 1000))
+        
+        # Serialize with the requested fields, splicing stored coordinates in as they are
+        tolerance = app.config.get('ROAD_SIMPLIFY_TOLERANCE', 0.0001)
+        roads_json = timed_map('serialize', lambda road: road.to_json(fields, geometry or 'full', tolerance), roads)
         
-        # Convert to dictionary format with coordinates
-        roads_data = [road.to_dict() for road in roads]
+        if output_format == 'ndjson':
+            return streaming_response(stream_lines(roads_json), mimetype='application/x-ndjson')
         
         # Support both new and old API formats
         # The new API has direct attribute access, while the old one uses .data
-        return jsonify({'roads': roads_data, 'status': 'success'})
+        return streaming_response(stream_array(roads_json, head=b'{"status":"success","roads":[', tail=b']}'))
 
     @app.route('/api/roads/<int:road_id>')
     def api_road_detail(road_id):
@@ -264,18 +404,25 @@ def create_app():
         elevation_profile = road.get_elevation_profile()
         
         # Create full road data
-        road_data = road.to_dict()
-        road_data['elevation_profile'] = elevation_profile
+        with timer('serialize'):
+            road_json = road.to_json(extra={'elevation_profile': elevation_profile})
         
         # Return in the same format as the roads list endpoint
-        return jsonify(road_data)
+        return json_response(road_json)
+
+    def load_road_profile(road_id):
+        # Runs on the profile pool, outside the request context
+        with app.app_context(), collect_timings() as timings:
+            road = Road.query.get_or_404(road_id)
+            return road, road.get_elevation_profile(), timings
 
     @app.route('/api/roads/<int:road_id>/profile')
-    def api_road_profile(road_id):
-        road = Road.query.get_or_404(road_id)
-        
-        # Get elevation profile
-        elevation_profile = road.get_elevation_profile()
+    async def api_road_profile(road_id):
+        # Load on the worker's bounded pool; concurrent requests for the same road share one load
+        profiles = get_executor('profiles', app.config.get('DEM_READ_WORKERS', 4))
+        with timer('profile'):
+            road, elevation_profile, timings = await profiles.run(('road_profile', road_id), load_road_profile, road_id)
+        merge_timings(timings)
         
         # Check if this is an HTMX request
         if request.headers.get('HX-Request') == 'true':
@@ -395,9 +542,12 @@ def create_app():
     def server_error(e):
         return render_template('errors/500.html'), 500
 
-    # Create tables on startup
+    # Create tables on startup and add columns introduced since
     with app.app_context():
         db.create_all()
+        add_missing_columns(Road)
+        if app.config.get('INSTRUMENTATION_ENABLED', False):
+            instrument_engine(db.engine)
     
     return app
 
@@ -11,6 +11,14 @@ ENV = os.environ.get('FLASK_ENV', 'development')
 
 # API settings
 ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', 'development-admin-key')
+ELEVATION_BATCH_LIMIT = 100000  # maximum coordinates per batch elevation request
+ROAD_SIMPLIFY_TOLERANCE = 0.0001  # degrees (~10 m) for geometry=simplified road listings
+STREAM_BATCH_SIZE = 1000  # rows fetched per database round trip for streamed lists
+
+# Instrumentation settings
+# Off by default: /metrics is unauthenticated and Server-Timing exposes query counts and timings
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'False') == 'True'  # request timing and /metrics
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'False') == 'True'  # add Server-Timing headers with per-request timings
 
 # Mapbox settings
 MAPBOX_TOKEN = os.environ.get('pk.eyJ1IjoibGllZGVja2U5NSIsImEiOiJjbGNxZ3E1YnEwNXV3M3BsaHdqaG0yOG5vIn0.nphFmNshYXzqJDdb_SoGnw', '')
@@ -24,10 +32,21 @@ DHM_DIR = os.path.join(DATA_DIR, 'dhm')
 ROADS_FILE = os.path.join(DATA_DIR, 'denmark_roads.geojson')
 HILLS_FILE = os.path.join(DATA_DIR, 'denmark_hills.geojson')
 MERGED_DHM = os.path.join(DATA_DIR, 'merged_dhm.tif')
+SLOPE_RASTER = os.path.join(DATA_DIR, 'slope_aspect.tif')
+DHM_SHARED_MEMORY = os.environ.get('DHM_SHARED_MEMORY')  # name of a DHM published with backend.services.shared_dem; None reads the GeoTIFF
+DEM_READ_WORKERS = 4  # threads reading the DHM and road profiles behind the async endpoints
+ROAD_GRAPH_FILE = os.path.join(DATA_DIR, 'denmark_roads_graph.npz')
+GRADIENT_CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 OUTPUT_FILE = os.path.join(DATA_DIR, 'processed_roads.geojson')
 
 # Processing settings
 SAMPLE_DISTANCE = 10  # meters between elevation samples
+PROFILE_MAX_GAP = 50  # longest DHM nodata gap in meters interpolated along a road profile
+PROFILE_SMOOTHING_WINDOW = 5  # samples in the Savitzky-Golay window applied to road profiles (odd)
+PROFILE_SMOOTHING_ORDER = 2  # polynomial order of the profile smoothing
+PROFILE_KERNEL = 'auto'  # 'numpy', 'numba' or 'auto' (Numba when installed) for the profile gap/smoothing/gradient kernels
 HILL_MIN_LENGTH = 100  # minimum hill length in meters
 HILL_MIN_GRADIENT = 3.0  # minimum average gradient percentage
-HILL_MIN_ELEVATION_GAIN = 10  # minimum elevation gain in meters
\ No newline at end of file
+HILL_MIN_ELEVATION_GAIN = 10  # minimum elevation gain in meters
+HILL_CATEGORY_METHOD = 'gradient'  # 'gradient' (average %) or 'score' (FIETS-style climb score)
+HILL_CATEGORY_THRESHOLDS = None  # lower bounds of categories 3, 2, 1 and HC; None uses the method's defaults
\ No newline at end of file
@@ -1,14 +1,27 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app
 import os
 import json
+import itertools
+import numpy as np
+import shapely
 import geopandas as gpd
 from shapely.geometry import shape, box
+from pyproj import CRS, Transformer
+from pyproj.enums import TransformDirection
+from pyproj.exceptions import CRSError
 import logging
 
 # Import our services
 from backend.services.hill_database import HillDatabase
 from backend.services.dhm_processor import DHMProcessor
 from backend.services.road_processor import RoadProcessor
+from backend.services.elevation_service import get_elevation_service, get_elevation_batcher
+from backend.services.route_profiler import RouteProfiler
+from backend.services.road_graph import RoadGraph
+from backend.services.route_planner import RoutePlanner, ROUTE_MODES
+from backend.utils.geo_utils import decode_polyline
+from backend.utils.json_utils import dumps_with_raw, stream_array, stream_lines, streaming_response
+from backend.utils.instrumentation import timer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,8 +55,16 @@ def get_hills():
             except:
                 pass
         
-        # Search hills with filters
-        hills_gdf = hill_db.search_hills(
+        # Output format: a GeoJSON FeatureCollection, or one Feature per line
+        output_format = request.args.get('format', 'geojson')
+        if output_format not in ('geojson', 'ndjson'):
+            return jsonify({"error": "format must be geojson or ndjson", "status": "error"}), 400
+        
+        # Stream matching hills from a database cursor, with only the
+        # essential properties for the list view
+        batches = hill_db.iter_hills(
+            columns=HILL_LIST_PROPERTIES + ['geometry'],
+            batch_size=current_app.config.get('STREAM_BATCH_SIZE', 1000),
             min_gradient=min_gradient,
             max_gradient=max_gradient,
             min_length=min_length,
@@ -53,32 +74,34 @@ def get_hills():
             bbox=bbox
         )
         
-        # Convert to GeoJSON
-        if not hills_gdf.empty:
-            # Keep only essential properties for the list view
-            properties_to_keep = [
-                'id', 'name', 'category', 'length_m', 
-                'avg_gradient', 'max_gradient', 'elevation_gain'
-            ]
-            
-            if len(hills_gdf.columns) > len(properties_to_keep) + 1:  # +1 for geometry
-                hills_gdf = hills_gdf[properties_to_keep + ['geometry']]
-            
-            # Convert to GeoJSON
-            geo_json = json.loads(hills_gdf.to_json())
-            
-            # Return formatted GeoJSON
-            return jsonify(geo_json)
-        else:
-            return jsonify({
-                "type": "FeatureCollection",
-                "features": []
-            })
+        # Run the query now so database errors are still reported as errors
+        first_batch = next(batches, [])
+        features = _hill_features(itertools.chain([first_batch], batches))
+        
+        if output_format == 'ndjson':
+            return streaming_response(stream_lines(features), mimetype='application/x-ndjson')
+        return streaming_response(stream_array(features, head=b'{"type":"FeatureCollection","features":[',
+                                               tail=b']}'))
             
     except Exception as e:
         logger.error(f"Error getting hills: {e}")
         return jsonify({"error": str(e), "status": "error"}), 500
 
+# Properties of each hill in list responses
+HILL_LIST_PROPERTIES = ['id', 'name', 'category', 'length_m', 'avg_gradient', 'max_gradient', 'elevation_gain']
+
+def _hill_features(batches):
+    """Serialize batches of hill rows to GeoJSON Feature bytes."""
+    for rows in batches:
+        # Convert the batch's WKT geometries to GeoJSON in one go
+        with timer('geometry'):
+            geometries = shapely.to_geojson(shapely.from_wkt([row.pop('geometry') for row in rows]))
+        with timer('serialize'):
+            features = [dumps_with_raw({"id": row['id'], "type": "Feature", "properties": row},
+                                       {"geometry": geometry if geometry is not None else 'null'})
+                        for row, geometry in zip(rows, geometries)]
+        yield from features
+
 @hill_routes.route('/api/hills/<int:hill_id>', methods=['GET'])
 def get_hill_details(hill_id):
     """Get detailed information about a specific hill."""
@@ -88,8 +111,9 @@ def get_hill_details(hill_id):
         
         if hill_details:
             # Convert geometry to GeoJSON
-            geom_json = json.loads(gpd.GeoSeries([hill_details['geometry']]).to_json())
-            geometry = geom_json['features'][0]['geometry']
+            with timer('geometry'):
+                geom_json = json.loads(gpd.GeoSeries([hill_details['geometry']]).to_json())
+                geometry = geom_json['features'][0]['geometry']
             
             # Create response
             response = {
@@ -108,7 +132,8 @@ def get_hill_details(hill_id):
                 "status": "success"
             }
             
-            return jsonify(response)
+            with timer('serialize'):
+                return jsonify(response)
         else:
             return jsonify({"error": "Hill not found", "status": "error"}), 404
             
@@ -141,7 +166,16 @@ def process_data():
         roads_file = current_app.config.get('ROADS_FILE', os.path.join(data_dir, 'denmark_roads.geojson'))
         
         dhm_processor = DHMProcessor(data_dir)
-        road_processor = RoadProcessor(roads_file, dhm_processor)
+        road_processor = RoadProcessor(
+            roads_file,
+            dhm_processor,
+            cache_dir=current_app.config.get('GRADIENT_CACHE_DIR'),
+            sample_distance=current_app.config.get('SAMPLE_DISTANCE', 10),
+            max_gap=current_app.config.get('PROFILE_MAX_GAP', 50),
+            smoothing_window=current_app.config.get('PROFILE_SMOOTHING_WINDOW', 5),
+            smoothing_order=current_app.config.get('PROFILE_SMOOTHING_ORDER', 2),
+            kernel=current_app.config.get('PROFILE_KERNEL', 'auto')
+        )
         
         # Process steps
         steps = request.json.get('steps', ['all'])
@@ -163,9 +197,7 @@ def process_data():
                 roads_gdf = road_processor.load_roads()
                 
                 # Calculate gradients
-                road_processor.calculate_road_gradients(
-                    sample_distance=current_app.config.get('SAMPLE_DISTANCE', 10)
-                )
+                road_processor.calculate_road_gradients()
                 
                 # Save processed roads
                 processed_path = os.path.join(data_dir, 'processed_roads.geojson')
@@ -179,7 +211,14 @@ def process_data():
             try:
                 # Identify hills
                 hills_path = os.path.join(data_dir, 'denmark_hills.geojson')
-                hills_saved = road_processor.save_hills(hills_path)
+                hills_saved = road_processor.save_hills(
+                    hills_path,
+                    min_length=current_app.config.get('HILL_MIN_LENGTH', 100),
+                    min_gradient=current_app.config.get('HILL_MIN_GRADIENT', 3.0),
+                    min_elevation_gain=current_app.config.get('HILL_MIN_ELEVATION_GAIN', 10),
+                    category_method=current_app.config.get('HILL_CATEGORY_METHOD', 'gradient'),
+                    category_thresholds=current_app.config.get('HILL_CATEGORY_THRESHOLDS')
+                )
                 results['hill_identification'] = "Success" if hills_saved else "Failed"
             except Exception as e:
                 results['hill_identification'] = f"Error: {str(e)}"
@@ -203,32 +242,263 @@ def process_data():
         logger.error(f"Error processing data: {e}")
         return jsonify({"error": str(e), "status": "error"}), 500
 
+def _elevation_service():
+    """Elevation service for this worker, kept open across requests."""
+    return get_elevation_service(current_app.config.get('DATA_DIR', 'data'),
+                                 current_app.config.get('DHM_SHARED_MEMORY'))
+
+def _elevation_batcher():
+    """Batcher merging this worker's concurrent elevation lookups on its DEM thread pool."""
+    return get_elevation_batcher(current_app.config.get('DATA_DIR', 'data'),
+                                 current_app.config.get('DHM_SHARED_MEMORY'),
+                                 current_app.config.get('DEM_READ_WORKERS', 4))
+
 @hill_routes.route('/api/elevation', methods=['GET'])
-def get_elevation():
-    """Get elevation for a specific coordinate."""
+async def get_elevation():
+    """
+    Get elevation for a specific coordinate.
+    
+    The lookup runs on the worker's bounded DEM thread pool, batched with
+    other lookups in flight, so a burst of map hover requests shares DHM
+    block reads.
+    """
     try:
         # Parse coordinates
         lon = request.args.get('lon', type=float)
         lat = request.args.get('lat', type=float)
+        crs = request.args.get('crs', 'EPSG:4326')
         
         if lon is None or lat is None:
             return jsonify({"error": "Missing coordinates", "status": "error"}), 400
             
-        # Initialize DHM processor
-        data_dir = current_app.config.get('DATA_DIR', 'data')
-        dhm_processor = DHMProcessor(data_dir)
+        # Get elevation from the worker's open DHM
+        with timer('dem'):
+            elevation = (await _elevation_batcher().run(([lon], [lat], crs)))[0]
         
-        # Get elevation
-        elevation = dhm_processor.get_elevation(lon, lat)
-        
-        # Close dataset
-        dhm_processor.close()
-        
-        if elevation is not None:
+        if not np.isnan(elevation):
             return jsonify({"elevation": float(elevation), "status": "success"})
         else:
             return jsonify({"error": "Could not determine elevation", "status": "error"}), 404
             
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "error"}), 400
+    except FileNotFoundError as e:
+        logger.error(f"Elevation data unavailable: {e}")
+        return jsonify({"error": "Elevation data unavailable", "status": "error"}), 503
     except Exception as e:
         logger.error(f"Error getting elevation: {e}")
-        return jsonify({"error": str(e), "status": "error"}), 500
\ No newline at end of file
+        return jsonify({"error": str(e), "status": "error"}), 500
+
+@hill_routes.route('/api/elevation/batch', methods=['POST'])
+def get_elevations_batch():
+    """
+    Get elevations for many coordinates in one request.
+    
+    Accepts either JSON ({"coordinates": [[x, y], ...], "crs": "EPSG:4326"}) or
+    a binary body (Content-Type: application/octet-stream) of little-endian
+    float64 x, y pairs with the CRS in the `crs` query parameter. JSON requests
+    get a JSON list with null for missing data; binary requests get
+    little-endian float32 elevations with NaN for missing data.
+    """
+    try:
+        limit = current_app.config.get('ELEVATION_BATCH_LIMIT', 100000)
+        binary = request.mimetype == 'application/octet-stream'
+        
+        # Parse coordinates
+        if binary:
+            body = request.get_data()
+            if len(body) % 16:
+                return jsonify({"error": "Body must hold float64 x, y pairs", "status": "error"}), 400
+            coords = np.frombuffer(body, dtype='<f8').reshape(-1, 2)
+            crs = request.args.get('crs', 'EPSG:4326')
+        else:
+            payload = request.get_json(silent=True) or {}
+            coords = np.asarray(payload.get('coordinates', []), dtype='float64')
+            crs = payload.get('crs', 'EPSG:4326')
+            if coords.size and (coords.ndim != 2 or coords.shape[1] != 2):
+                return jsonify({"error": "Coordinates must be [x, y] pairs", "status": "error"}), 400
+                
+        if len(coords) == 0:
+            return jsonify({"error": "Missing coordinates", "status": "error"}), 400
+        if len(coords) > limit:
+            return jsonify({"error": f"At most {limit} coordinates per request", "status": "error"}), 413
+            
+        # Get all elevations in one gather
+        elevations = _elevation_service().get_elevations(coords[:, 0], coords[:, 1], crs)
+        
+        if binary:
+            return Response(elevations.astype('<f4').tobytes(), mimetype='application/octet-stream')
+        
+        return jsonify({
+            "elevations": [None if np.isnan(e) else round(float(e), 2) for e in elevations],
+            "status": "success"
+        })
+        
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "error"}), 400
+    except FileNotFoundError as e:
+        logger.error(f"Elevation data unavailable: {e}")
+        return jsonify({"error": "Elevation data unavailable", "status": "error"}), 503
+    except Exception as e:
+        logger.error(f"Error getting elevations: {e}")
+        return jsonify({"error": str(e), "status": "error"}), 500
+
+@hill_routes.route('/api/route-profile', methods=['POST'])
+def get_route_profile():
+    """
+    Get the elevation/gradient profile of a user-drawn route.
+    
+    The body is JSON with either a GeoJSON LineString (bare, as "geometry" or
+    as a Feature) or an encoded polyline in "polyline" (with an optional
+    "precision", default 5). Coordinates are in "crs" (default EPSG:4326) and
+    an optional "sample_distance" sets the spacing in meters.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Expected a JSON object", "status": "error"}), 400
+        crs = payload.get('crs', 'EPSG:4326')
+        sample_distance = payload.get('sample_distance')
+        if sample_distance is not None:
+            try:
+                sample_distance = float(sample_distance)
+            except (TypeError, ValueError):
+                sample_distance = float('nan')
+            if not np.isfinite(sample_distance) or sample_distance <= 0:
+                return jsonify({"error": "sample_distance must be a positive number", "status": "error"}), 400
+        
+        # Parse the route geometry
+        if 'polyline' in payload:
+            xs, ys = decode_polyline(payload['polyline'], int(payload.get('precision', 5)))
+        else:
+            geometry = payload.get('geometry', payload)
+            if isinstance(geometry, dict) and geometry.get('type') == 'Feature':
+                geometry = geometry.get('geometry') or {}
+            if not isinstance(geometry, dict) or geometry.get('type') != 'LineString':
+                return jsonify({"error": "Expected a GeoJSON LineString or an encoded polyline",
+                                "status": "error"}), 400
+            coords = np.asarray(geometry.get('coordinates', []), dtype='float64')
+            if coords.ndim != 2 or coords.shape[1] < 2:
+                return jsonify({"error": "Invalid LineString coordinates", "status": "error"}), 400
+            xs, ys = coords[:, 0], coords[:, 1]
+            
+        profiler = RouteProfiler(
+            _elevation_service(),
+            sample_distance=current_app.config.get('SAMPLE_DISTANCE', 10),
+            climb_min_gradient=current_app.config.get('HILL_MIN_GRADIENT', 3.0),
+            climb_min_length=current_app.config.get('HILL_MIN_LENGTH', 100),
+            climb_min_elevation_gain=current_app.config.get('HILL_MIN_ELEVATION_GAIN', 10)
+        )
+        profile = profiler.profile(xs, ys, crs, sample_distance)
+        
+        if profile is None:
+            return jsonify({"error": "No elevation data along route", "status": "error"}), 404
+            
+        return jsonify({"data": profile, "status": "success"})
+        
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "error"}), 400
+    except FileNotFoundError as e:
+        logger.error(f"Elevation data unavailable: {e}")
+        return jsonify({"error": "Elevation data unavailable", "status": "error"}), 503
+    except Exception as e:
+        logger.error(f"Error getting route profile: {e}")
+        return jsonify({"error": str(e), "status": "error"}), 500
+
+# Route planner per worker, reloaded when the graph file changes
+_route_planner_cache = {}
+
+def _route_planner():
+    """Route planner over the saved road graph, or None if there is no graph."""
+    graph_file = current_app.config.get('ROAD_GRAPH_FILE', os.path.join('data', 'denmark_roads_graph.npz'))
+    if not os.path.exists(graph_file):
+        return None
+    mtime = os.path.getmtime(graph_file)
+    cached = _route_planner_cache.get(graph_file)
+    if cached is None or cached[0] != mtime:
+        graph = RoadGraph.load(graph_file)
+        if graph is None:
+            return None
+        cached = _route_planner_cache[graph_file] = (mtime, RoutePlanner(graph))
+    return cached[1]
+
+def _point(value):
+    """A JSON [x, y] pair as a tuple of two finite floats, or None if it is not one."""
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return None
+    point = (float(value[0]), float(value[1]))
+    return point if np.isfinite(point).all() else None
+
+@hill_routes.route('/api/route', methods=['POST'])
+def plan_route():
+    """
+    Plan a gradient-aware route over the road network.
+    
+    The body is JSON with "start" as [x, y], and either "end" as [x, y] for a
+    point-to-point route or "loop_length_km" for a loop back to the start.
+    "mode" is one of shortest, flattest or hilliest, and coordinates are in
+    "crs" (default EPSG:4326). The route geometry is returned in the same CRS.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Expected a JSON object", "status": "error"}), 400
+        mode = payload.get('mode', 'shortest')
+        crs = payload.get('crs', 'EPSG:4326')
+        start = payload.get('start')
+        end = payload.get('end')
+        loop_length_km = payload.get('loop_length_km')
+        
+        if mode not in ROUTE_MODES:
+            return jsonify({"error": f"Mode must be one of {', '.join(ROUTE_MODES)}", "status": "error"}), 400
+        if start is None or (end is None and loop_length_km is None):
+            return jsonify({"error": "Missing start and end or loop_length_km", "status": "error"}), 400
+        start = _point(start)
+        if start is None or (end is not None and _point(end) is None):
+            return jsonify({"error": "start and end must be [x, y] pairs of numbers", "status": "error"}), 400
+        if end is None:
+            try:
+                loop_length_km = float(loop_length_km)
+            except (TypeError, ValueError):
+                loop_length_km = float('nan')
+            if not np.isfinite(loop_length_km) or loop_length_km <= 0:
+                return jsonify({"error": "loop_length_km must be a positive number", "status": "error"}), 400
+        try:
+            request_crs = CRS.from_user_input(crs)
+        except CRSError:
+            return jsonify({"error": f"Invalid CRS: {crs}", "status": "error"}), 400
+            
+        planner = _route_planner()
+        if planner is None:
+            return jsonify({"error": "Road graph unavailable", "status": "error"}), 503
+        if planner.graph.crs is None:
+            return jsonify({"error": "Road graph has no CRS", "status": "error"}), 503
+            
+        # Snap the requested points onto the nearest graph nodes
+        to_graph = Transformer.from_crs(request_crs, CRS.from_user_input(planner.graph.crs), always_xy=True)
+        source, _ = planner.graph.nearest_node(*to_graph.transform(*start))
+        
+        if end is not None:
+            target, _ = planner.graph.nearest_node(*to_graph.transform(*_point(end)))
+            route = planner.route(source, target, mode)
+        else:
+            route = planner.loop(source, loop_length_km * 1000, mode)
+            
+        if route is None:
+            return jsonify({"error": "No route found", "status": "error"}), 404
+            
+        # Return the geometry in the request CRS
+        coords = route.pop('coordinates')
+        xs, ys = to_graph.transform(coords[:, 0], coords[:, 1], direction=TransformDirection.INVERSE)
+        route['geometry'] = {"type": "LineString", "coordinates": np.column_stack([xs, ys]).tolist()}
+        route['mode'] = mode
+        
+        return jsonify({"data": route, "status": "success"})
+        
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "error"}), 400
+    except Exception as e:
+        logger.error(f"Error planning route: {e}")
+        return jsonify({"error": str(e), "status": "error"}), 500
@@ -0,0 +1,292 @@
+# backend/services/climb_detector.py
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString
+from shapely.ops import substring
+import logging
+
+from .road_graph import RoadGraph
+from ..utils.profile_kernels import get_profile_kernels
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ClimbDetector:
+    """Finds climbs inside elevation profiles and stitches them across connected roads."""
+
+    def __init__(self, min_length=100, min_gradient=3.0, min_elevation_gain=10, max_drop=3.0,
+                 snap_tolerance=0.5, kernels=None):
+        """
+        Initialize with climb thresholds.
+
+        Args:
+            min_length: Minimum climb length in meters
+            min_gradient: Minimum average gradient percentage
+            min_elevation_gain: Minimum elevation gain in meters
+            max_drop: Largest dip (meters, measured against the minimum gradient)
+                tolerated inside a climb before it is ended
+            snap_tolerance: Distance in meters within which road endpoints are
+                treated as the same junction
+            kernels: ProfileKernels running the climb sweep; defaults to the
+                fastest available backend
+        """
+        self.min_length = min_length
+        self.min_gradient = min_gradient
+        self.min_elevation_gain = min_elevation_gain
+        self.max_drop = max_drop
+        self.snap_tolerance = snap_tolerance
+        self.kernels = kernels or get_profile_kernels()
+
+    def find_climbs(self, distances, elevations):
+        """
+        Find maximal climbing intervals in a single elevation profile.
+
+        The sweep runs over the elevation relative to a line rising at the
+        minimum gradient, h = elevation - min_gradient * distance. Any interval
+        where h ends higher than it starts averages at least the minimum
+        gradient, so a steep wall inside a long, gentle road still stands out.
+        A climb ends once h drops more than max_drop below its running peak.
+
+        Args:
+            distances: Distances along the profile in meters (increasing)
+            elevations: Elevations in meters
+
+        Returns:
+            List of (start_index, end_index) tuples, end inclusive
+        """
+        distances = np.asarray(distances, dtype='float64')
+        elevations = np.asarray(elevations, dtype='float64')
+
+        candidates = self.kernels.sweep(elevations - self.min_gradient / 100 * distances, self.max_drop)
+
+        climbs = []
+        for start, end in candidates:
+            length = distances[end] - distances[start]
+            gain = elevations[end] - elevations[start]
+            if length >= self.min_length and gain >= self.min_elevation_gain:
+                climbs.append((start, end))
+        return climbs
+
+    def detect(self, roads_gdf, road_graph=None):
+        """
+        Detect climbs over a road network, following roads across way boundaries.
+
+        Ways that meet end to end at a node shared by exactly two ways are
+        joined into one stroke, and climbs are searched in the stroke's combined
+        profile, so a hill split across several OSM ways is found as one climb.
+
+        Args:
+            roads_gdf: GeoDataFrame with geometry and 'elevation_profile' lists of
+                (distance, elevation) tuples, as produced by RoadProcessor
+            road_graph: RoadGraph of roads_gdf; built on the fly if not given
+
+        Returns:
+            GeoDataFrame with one row per climb
+        """
+        return self.build_climbs(roads_gdf, self.find_intervals(roads_gdf, road_graph))
+
+    def find_intervals(self, roads_gdf, road_graph=None):
+        """
+        Sweep the strokes of a road network for rises, keeping only their indices.
+
+        All rises of the sweep at the minimum gradient are kept, before the
+        length and gain thresholds, but no geometries or profiles are built;
+        build_climbs turns the intervals that pass the thresholds into rows.
+
+        Args:
+            roads_gdf: GeoDataFrame with geometry and 'elevation_profile' lists
+            road_graph: RoadGraph of roads_gdf; built on the fly if not given
+
+        Returns:
+            Dictionary with 'strokes' (see _build_strokes) and per-interval
+            arrays 'stroke', 'start', 'end', 'length_m' and 'elevation_gain'
+        """
+        if road_graph is None or road_graph.edge_count != len(roads_gdf):
+            road_graph = RoadGraph.build(roads_gdf, self.snap_tolerance)
+
+        has_profile = roads_gdf['elevation_profile'].apply(
+            lambda p: isinstance(p, (list, tuple)) and len(p) > 1).to_numpy()
+
+        strokes = _build_strokes(road_graph, has_profile)
+        stroke_ids, starts, ends, lengths, gains = [], [], [], [], []
+        for i, stroke in enumerate(strokes):
+            distances, elevations = _join_stroke_profile(roads_gdf, stroke)
+            intervals = self.kernels.sweep(elevations - self.min_gradient / 100 * distances, self.max_drop)
+            if not intervals:
+                continue
+            start, end = np.array(intervals, dtype='int64').T
+            stroke_ids.append(np.full(len(start), i))
+            starts.append(start)
+            ends.append(end)
+            lengths.append(distances[end] - distances[start])
+            gains.append(elevations[end] - elevations[start])
+
+        def joined(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+        return {
+            'strokes': strokes,
+            'stroke': joined(stroke_ids, 'int64'),
+            'start': joined(starts, 'int64'),
+            'end': joined(ends, 'int64'),
+            'length_m': joined(lengths, 'float64'),
+            'elevation_gain': joined(gains, 'float64')
+        }
+
+    def build_climbs(self, roads_gdf, intervals, min_length=None, min_elevation_gain=None):
+        """
+        Build climb rows for the intervals of find_intervals that pass the thresholds.
+
+        Args:
+            roads_gdf: GeoDataFrame the intervals were found in
+            intervals: Result of find_intervals
+            min_length: Minimum climb length in meters; defaults to the detector's
+            min_elevation_gain: Minimum elevation gain in meters; defaults to the detector's
+
+        Returns:
+            GeoDataFrame with one row per climb
+        """
+        min_length = self.min_length if min_length is None else min_length
+        min_elevation_gain = self.min_elevation_gain if min_elevation_gain is None else min_elevation_gain
+        keep = np.flatnonzero((intervals['length_m'] >= min_length) &
+                              (intervals['elevation_gain'] >= min_elevation_gain))
+
+        # Join only the strokes that have a climb left, once each
+        records = []
+        strokes = intervals['strokes']
+        stroke_of = intervals['stroke'][keep]
+        for i in np.unique(stroke_of).tolist():
+            stroke = strokes[i]
+            distances, elevations, coords, offsets = _join_stroke(roads_gdf, stroke)
+            line = LineString(coords)
+            for k in keep[stroke_of == i].tolist():
+                records.append(_climb_record(roads_gdf, stroke, offsets, line, distances, elevations,
+                                             int(intervals['start'][k]), int(intervals['end'][k])))
+
+        logger.info(f"Detected {len(records)} climbs in {len(strokes)} road strokes")
+        return gpd.GeoDataFrame(records, columns=CLIMB_COLUMNS, geometry='geometry', crs=roads_gdf.crs)
+
+
+CLIMB_COLUMNS = [
+    'name', 'road_id', 'length_m', 'avg_gradient', 'max_gradient', 'elevation_gain',
+    'start_distance', 'end_distance', 'elevation_profile', 'geometry'
+]
+
+
+def _build_strokes(graph, usable):
+    """
+    Chain edges through nodes of degree two.
+
+    Args:
+        graph: RoadGraph
+        usable: Boolean array marking edges that may be part of a stroke
+
+    Returns:
+        List of strokes, each a list of (edge, reversed) tuples in travel order
+    """
+    degree = graph.degree
+    visited = ~usable
+    strokes = []
+    for edge in np.flatnonzero(usable):
+        if visited[edge]:
+            continue
+        visited[edge] = True
+        stroke = [(edge, False)]
+
+        # Extend forwards from the end, then backwards from the start
+        for forward in (True, False):
+            current = edge
+            node = graph.edge_v[edge] if forward else graph.edge_u[edge]
+            while degree[node] == 2:
+                _, edges, _ = graph.neighbors(node)
+                following = edges[1] if edges[0] == current else edges[0]
+                if following == current or visited[following]:
+                    break
+                visited[following] = True
+                # A way is reversed when travel leaves it through its start
+                enters_at_start = graph.edge_u[following] == node
+                reversed_way = not enters_at_start if forward else enters_at_start
+                if forward:
+                    stroke.append((following, reversed_way))
+                else:
+                    stroke.insert(0, (following, reversed_way))
+                node = graph.edge_v[following] if enters_at_start else graph.edge_u[following]
+                current = following
+        strokes.append(stroke)
+    return strokes
+
+
+def _line_coords(geometry):
+    """All coordinates of a LineString or MultiLineString in order."""
+    parts = list(geometry.geoms) if geometry.geom_type == 'MultiLineString' else [geometry]
+    return [coord[:2] for part in parts for coord in part.coords]
+
+
+def _join_stroke_profile(roads, stroke):
+    """Concatenate the profiles of the ways in a stroke, without their coordinates."""
+    distances, elevations = [], []
+    offset = 0.0
+    for position, reversed_way in stroke:
+        length = roads.geometry.iloc[position].length
+        profile = np.asarray(roads['elevation_profile'].iloc[position], dtype='float64')
+        way_d, way_e = profile[:, 0], profile[:, 1]
+        if reversed_way:
+            way_d, way_e = length - way_d[::-1], way_e[::-1]
+        # Skip samples that repeat the junction already covered by the previous way
+        keep = way_d + offset > (distances[-1][-1] + 1e-6 if distances else -np.inf)
+        distances.append(way_d[keep] + offset)
+        elevations.append(way_e[keep])
+        offset += length
+    return np.concatenate(distances), np.concatenate(elevations)
+
+
+def _join_stroke(roads, stroke):
+    """Concatenate the profiles and coordinates of the ways in a stroke."""
+    distances, elevations, coords, offsets = [], [], [], []
+    offset = 0.0
+    for position, reversed_way in stroke:
+        geometry = roads.geometry.iloc[position]
+        profile = np.asarray(roads['elevation_profile'].iloc[position], dtype='float64')
+        way_d, way_e = profile[:, 0], profile[:, 1]
+        way_coords = _line_coords(geometry)
+        if reversed_way:
+            way_d, way_e = geometry.length - way_d[::-1], way_e[::-1]
+            way_coords = way_coords[::-1]
+        # Skip samples that repeat the junction already covered by the previous way
+        keep = way_d + offset > (distances[-1][-1] + 1e-6 if distances else -np.inf)
+        distances.append(way_d[keep] + offset)
+        elevations.append(way_e[keep])
+        coords.extend(way_coords if not coords else way_coords[1:])
+        offsets.append(offset)
+        offset += geometry.length
+    return np.concatenate(distances), np.concatenate(elevations), coords, offsets
+
+
+def _climb_record(roads, stroke, offsets, line, distances, elevations, start, end):
+    """Build the output row for one climb within a stroke."""
+    start_d, end_d = distances[start], distances[end]
+    length = end_d - start_d
+    gain = elevations[end] - elevations[start]
+    steps = np.diff(elevations[start:end + 1]) / np.maximum(np.diff(distances[start:end + 1]), 1e-9) * 100
+
+    # Ways the climb runs over
+    positions = [position for (position, _), offset, next_offset
+                 in zip(stroke, offsets, offsets[1:] + [np.inf])
+                 if offset < end_d and next_offset > start_d]
+    labels = roads.index[positions]
+    names = [name for name in roads['name'].iloc[positions] if isinstance(name, str)] \
+        if 'name' in roads.columns else []
+
+    return {
+        'name': names[0] if names else None,
+        'road_id': ','.join(str(label) for label in labels),
+        'length_m': float(length),
+        'avg_gradient': float(gain / length * 100),
+        'max_gradient': float(steps.max()) if len(steps) else 0.0,
+        'elevation_gain': float(gain),
+        'start_distance': float(start_d),
+        'end_distance': float(end_d),
+        'elevation_profile': list(zip((distances[start:end + 1] - start_d).tolist(),
+                                      elevations[start:end + 1].tolist())),
+        'geometry': substring(line, start_d, end_d)
+    }
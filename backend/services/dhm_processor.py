@@ -2,31 +2,104 @@
 import os
 import numpy as np
 import rasterio
-from rasterio.merge import merge
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 import geopandas as gpd
+import shapely
 from shapely.geometry import Point, LineString
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from rasterio.windows import Window
+from rasterio.enums import MaskFlags
+from rasterio.transform import from_origin
+from rasterio.shutil import copy as copy_raster
+
+from .shared_dem import SharedDEM
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Nodata value for the derived slope/aspect raster
+SLOPE_NODATA = -9999.0
+
+# Nodata value used for the merged DHM when the source tiles declare none
+DHM_NODATA = -9999.0
+
+# Internal tile size of written rasters and the window size used when merging
+TILE_SIZE = 256
+MERGE_WINDOW_SIZE = 2048
+
+# Target resolutions (meters) of the overview levels built into the merged DHM
+DEFAULT_OVERVIEW_RESOLUTIONS = (1, 5, 25)
+
 class DHMProcessor:
     """Processes Denmark's Digital Height Model (DHM) data."""
     
-    def __init__(self, dhm_directory='data'):
+    def __init__(self, dhm_directory='data', overview_resolutions=DEFAULT_OVERVIEW_RESOLUTIONS):
         """Initialize with directory containing DHM files."""
         self.dhm_directory = dhm_directory
         self.merged_dhm_path = os.path.join(dhm_directory, 'merged_dhm.tif')
+        self.slope_path = os.path.join(dhm_directory, 'slope_aspect.tif')
+        self.overview_resolutions = overview_resolutions
         self.dhm_dataset = None
+        self.slope_dataset = None
+        self.overview_datasets = {}
+        self.shared_dem = None
+    
+    def publish_shared_dem(self, name=None):
+        """
+        Decode the merged DHM into shared memory and read elevations from it.
+        
+        Other processes can then call attach_shared_dem with the returned
+        SharedDEM's name instead of each opening the GeoTIFF. The block is
+        removed when this processor is closed.
+        
+        Args:
+            name: Shared memory name; None lets the system choose one
+            
+        Returns:
+            SharedDEM owning the block
+        """
+        if not os.path.exists(self.merged_dhm_path):
+            self.merge_dhm_files()
+        self.shared_dem = SharedDEM.publish(self.merged_dhm_path, name)
+        return self.shared_dem
+    
+    def attach_shared_dem(self, name):
+        """
+        Read elevations from a DHM another process published in shared memory.
+        
+        Raises:
+            FileNotFoundError: If no shared DHM with that name exists
+        """
+        self.shared_dem = SharedDEM.attach(name)
+        logger.info(f"Attached to shared DHM '{name}' ({self.shared_dem.nbytes / 1e6:.1f} MB)")
+        return self.shared_dem
     
     def list_dhm_files(self):
         """List all DTM TIF files in the data directory."""
         return [os.path.join(self.dhm_directory, f) for f in os.listdir(self.dhm_directory) 
                 if f.startswith('DTM') and f.endswith('.tif')]
     
-    def merge_dhm_files(self, output_path=None):
-        """Merge multiple DHM files into a single raster."""
+    def merge_dhm_files(self, output_path=None, window_size=MERGE_WINDOW_SIZE, progress_callback=None):
+        """
+        Merge multiple DHM files into a single raster.
+        
+        The merge runs out of core: the output grid is computed from the bounds
+        of all tiles, then each output window is filled from windowed reads of
+        only the tiles that overlap it and written as soon as it completes. Peak
+        memory is bounded by the window size, not by the coverage area. Where
+        tiles overlap, the first tile in file order wins.
+        
+        Args:
+            output_path: Where to write the merged raster
+            window_size: Edge length of the output windows in pixels
+            progress_callback: Optional callable receiving (windows_done, windows_total)
+                after each window is written
+                
+        Returns:
+            Path to the merged DHM file
+        """
         if output_path:
             self.merged_dhm_path = output_path
             
@@ -42,59 +115,300 @@ class DHMProcessor:
             
         logger.info(f"Merging {len(dhm_files)} DHM files...")
         
-        # Open each dataset
-        src_files_to_mosaic = [rasterio.open(fp) for fp in dhm_files]
-        
-        # Merge datasets
-        mosaic, out_trans = merge(src_files_to_mosaic)
-        
-        # Copy the metadata from the first file
-        out_meta = src_files_to_mosaic[0].meta.copy()
+        # Collect tile bounds without keeping the files open
+        tile_bounds = np.empty((len(dhm_files), 4))
+        for i, fp in enumerate(dhm_files):
+            with rasterio.open(fp) as src:
+                tile_bounds[i] = tuple(src.bounds)
+                if i == 0:
+                    # Copy the metadata from the first file
+                    out_meta = src.meta.copy()
+                    xres, yres = src.res
+                    dtype = src.dtypes[0]
+                    nodata = src.nodata if src.nodata is not None else DHM_NODATA
+                    
+        # Output grid covering the bounds of every tile
+        left, top = tile_bounds[:, 0].min(), tile_bounds[:, 3].max()
+        width = int(round((tile_bounds[:, 2].max() - left) / xres))
+        height = int(round((top - tile_bounds[:, 1].min()) / yres))
+        out_trans = from_origin(left, top, xres, yres)
         
         # Update the metadata
         out_meta.update({
             "driver": "GTiff",
-            "height": mosaic.shape[1],
-            "width": mosaic.shape[2],
+            "height": height,
+            "width": width,
             "transform": out_trans,
-            "crs": src_files_to_mosaic[0].crs
+            "nodata": nodata
         })
+        out_meta.update(_tiled_creation_options(dtype))
         
-        # Write the mosaic to disk
-        with rasterio.open(self.merged_dhm_path, "w", **out_meta) as dest:
-            dest.write(mosaic)
-            
-        # Close all source files
-        for src in src_files_to_mosaic:
-            src.close()
+        windows = list(_iter_windows(width, height, window_size))
+        tmp_path = self.merged_dhm_path + '.tmp'
+        
+        try:
+            with rasterio.open(tmp_path, "w", **out_meta) as dest:
+                for i, window in enumerate(windows):
+                    window_bounds = rasterio.windows.bounds(window, out_trans)
+                    window_trans = rasterio.windows.transform(window, out_trans)
+                    
+                    # Tiles whose bounds intersect this window
+                    overlapping = np.flatnonzero(
+                        (tile_bounds[:, 0] < window_bounds[2]) & (tile_bounds[:, 2] > window_bounds[0]) &
+                        (tile_bounds[:, 1] < window_bounds[3]) & (tile_bounds[:, 3] > window_bounds[1])
+                    )
+                    
+                    block = np.full((out_meta["count"], window.height, window.width), nodata, dtype=dtype)
+                    for tile in overlapping:
+                        _merge_tile_into_block(dhm_files[tile], block, window_bounds, window_trans, nodata)
+                        
+                    dest.write(block, window=window)
+                    
+                    if progress_callback is not None:
+                        progress_callback(i + 1, len(windows))
+                    else:
+                        logger.info(f"Merged window {i + 1}/{len(windows)} ({len(overlapping)} tiles)")
+                        
+                # Build overview levels for coarse queries
+                factors = self._overview_factors(xres)
+                if factors:
+                    logger.info(f"Building overview levels with factors {factors}")
+                    dest.build_overviews(factors, Resampling.average)
+                    dest.update_tags(ns='rio_overview', resampling='average')
+                    
+            # Rewrite with the overviews ahead of the full resolution tiles
+            # (cloud-optimized layout)
+            copy_raster(tmp_path, self.merged_dhm_path, driver="GTiff", copy_src_overviews=True,
+                        **_tiled_creation_options(dtype))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             
         logger.info(f"Merged DHM saved to: {self.merged_dhm_path}")
         return self.merged_dhm_path
     
-    def load_merged_dhm(self):
-        """Load the merged DHM file."""
+    def _overview_factors(self, base_resolution):
+        """Convert the target overview resolutions into decimation factors."""
+        factors = {
+            max(2, int(round(resolution / base_resolution)))
+            for resolution in self.overview_resolutions
+            if resolution > base_resolution
+        }
+        return sorted(factors)
+    
+    def get_dataset_for_spacing(self, sample_distance):
+        """
+        Choose the coarsest DHM level that still resolves the sample spacing.
+        
+        A level is used when its pixel size is at most half the sample distance,
+        so every sample still falls in its own pixel. Falls back to the full
+        resolution dataset when the merged file has no overviews.
+        
+        Args:
+            sample_distance: Distance between samples in meters
+            
+        Returns:
+            Open rasterio dataset for the chosen level
+        """
+        if self.dhm_dataset is None:
+            self.load_merged_dhm()
+            
+        base_resolution = abs(self.dhm_dataset.transform.a)
+        level = None
+        for i, factor in enumerate(self.dhm_dataset.overviews(1)):
+            if base_resolution * factor <= sample_distance / 2:
+                level = i
+                
+        if level is None:
+            return self.dhm_dataset
+            
+        if level not in self.overview_datasets:
+            self.overview_datasets[level] = rasterio.open(self.merged_dhm_path, overview_level=level)
+        return self.overview_datasets[level]
+    
+    def compute_slope_raster(self, output_path=None, block_size=1024, max_workers=None):
+        """
+        Compute a slope/aspect raster from the merged DHM.
+        
+        The DEM is processed in square blocks, each read with a one pixel halo so
+        block edges match a whole-raster computation. Blocks are computed in
+        parallel on a thread pool and written in order by the calling thread.
+        
+        Args:
+            output_path: Where to write the raster (defaults to slope_aspect.tif)
+            block_size: Block edge length in pixels
+            max_workers: Number of worker threads (defaults to CPU count)
+            
+        Returns:
+            Path to the slope/aspect raster. Band 1 holds the slope as a percent
+            grade, band 2 the aspect in degrees clockwise from north, pointing
+            downhill.
+        """
+        if output_path:
+            self.slope_path = output_path
+            
+        # Check if slope raster already exists
+        if os.path.exists(self.slope_path):
+            logger.info(f"Using existing slope raster: {self.slope_path}")
+            return self.slope_path
+            
+        if not os.path.exists(self.merged_dhm_path):
+            self.merge_dhm_files()
+            
+        with rasterio.open(self.merged_dhm_path) as src:
+            profile = src.profile.copy()
+            width, height = src.width, src.height
+            xres, yres = abs(src.transform.a), abs(src.transform.e)
+            
+        profile.update({
+            "driver": "GTiff",
+            "count": 2,
+            "dtype": "float32",
+            "nodata": SLOPE_NODATA
+        })
+        profile.update(_tiled_creation_options("float32"))
+        
+        windows = list(_iter_windows(width, height, block_size))
+        
+        logger.info(f"Computing slope/aspect for {len(windows)} blocks...")
+        
+        # Rasterio handles must not be shared between threads
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+        
+        def compute_block(window):
+            src = getattr(local, 'src', None)
+            if src is None:
+                src = local.src = rasterio.open(self.merged_dhm_path)
+                with handles_lock:
+                    handles.append(src)
+            return window, _slope_aspect_block(src, window, xres, yres)
+        
+        try:
+            with rasterio.open(self.slope_path, "w", **profile) as dest, \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i, (window, block) in enumerate(executor.map(compute_block, windows)):
+                    dest.write(block, window=window)
+                    if i % 100 == 0:
+                        logger.info(f"Processing slope block {i}/{len(windows)}")
+        finally:
+            for src in handles:
+                src.close()
+                
+        logger.info(f"Slope raster saved to: {self.slope_path}")
+        return self.slope_path
+    
+    def load_slope_raster(self):
+        """Load the slope/aspect raster, computing it if needed."""
+        if not os.path.exists(self.slope_path):
+            self.compute_slope_raster()
+            
+        self.slope_dataset = rasterio.open(self.slope_path)
+        return self.slope_dataset
+    
+    def get_directional_gradient(self, xs, ys, bearings):
+        """
+        Look up the gradient along given bearings from the slope raster.
+        
+        Args:
+            xs, ys: Point coordinates in the DHM CRS
+            bearings: Direction of travel in degrees clockwise from north
+            
+        Returns:
+            NumPy array of gradients in percent (positive uphill), NaN where the
+            slope raster has no data
+        """
+        if self.slope_dataset is None:
+            self.load_slope_raster()
+            
+        slope, aspect = _gather_points(self.slope_dataset, xs, ys, indexes=[1, 2])
+        
+        # Aspect points downhill, so travelling along it descends at the full slope
+        return -slope * np.cos(np.radians(np.asarray(bearings, dtype='float64') - aspect))
+    
+    def estimate_line_gradients(self, line_geometry, sample_distance=10):
+        """
+        Estimate gradients along a line from the slope raster alone.
+        
+        Args:
+            line_geometry: Shapely LineString in the same CRS as the DHM
+            sample_distance: Distance between samples in meters
+            
+        Returns:
+            Tuple of (distances, gradients) NumPy arrays
+        """
+        distances = np.arange(0, line_geometry.length + 1e-9, sample_distance)
+        
+        # Bearing at each sample from points half a step either side of it
+        # (clipped, as negative distances are measured from the end of the line)
+        half_step = sample_distance / 2
+        ahead = shapely.line_interpolate_point(
+            line_geometry, np.minimum(distances + half_step, line_geometry.length))
+        behind = shapely.line_interpolate_point(
+            line_geometry, np.maximum(distances - half_step, 0))
+        dx = shapely.get_x(ahead) - shapely.get_x(behind)
+        dy = shapely.get_y(ahead) - shapely.get_y(behind)
+        bearings = np.degrees(np.arctan2(dx, dy))
+        
+        points = shapely.line_interpolate_point(line_geometry, distances)
+        gradients = self.get_directional_gradient(shapely.get_x(points), shapely.get_y(points), bearings)
+        return distances, gradients
+    
+    def load_merged_dhm(self, merge_if_missing=True):
+        """
+        Load the merged DHM file.
+        
+        Args:
+            merge_if_missing: Merge the DHM tiles if the merged file does not exist
+                yet; otherwise raise FileNotFoundError
+        """
         if not os.path.exists(self.merged_dhm_path):
+            if not merge_if_missing:
+                raise FileNotFoundError(f"Merged DHM file not found: {self.merged_dhm_path}")
             self.merge_dhm_files()
             
         self.dhm_dataset = rasterio.open(self.merged_dhm_path)
         return self.dhm_dataset
     
     def get_elevation(self, lon, lat):
-        """Get elevation for a specific coordinate."""
+        """Get elevation for a specific coordinate, or None where the DHM has no data."""
+        if self.shared_dem is not None:
+            elevation_value = self.shared_dem.get_elevations([lon], [lat])[0]
+            return None if np.isnan(elevation_value) else float(elevation_value)
         if self.dhm_dataset is None:
             self.load_merged_dhm()
             
-        # Get pixel coordinates from map coordinates
-        py, px = self.dhm_dataset.index(lon, lat)
-        
-        # Read the elevation value
-        window = ((py, py+1), (px, px+1))
+        # Read the elevation value, masking the dataset's declared nodata
         try:
-            elevation_value = self.dhm_dataset.read(1, window=window)[0, 0]
-            return float(elevation_value)
+            elevation_value = _gather_points(self.dhm_dataset, [lon], [lat])[0]
         except Exception as e:
             logger.error(f"Error reading elevation at ({lon}, {lat}): {e}")
             return None
+        return None if np.isnan(elevation_value) else float(elevation_value)
+    
+    def get_elevations(self, xs, ys, sample_distance=None):
+        """
+        Get elevations for many coordinates in one vectorized gather.
+        
+        Args:
+            xs, ys: Coordinates in the DHM CRS
+            sample_distance: Spacing of the coordinates in meters, used to read
+                from a coarser overview level; None reads full resolution
+            
+        Returns:
+            NumPy array of elevations, NaN outside the DHM or where it has no data
+        """
+        if self.shared_dem is not None:
+            return self.shared_dem.get_elevations(xs, ys, sample_distance)
+        if sample_distance is not None:
+            dataset = self.get_dataset_for_spacing(sample_distance)
+        else:
+            if self.dhm_dataset is None:
+                self.load_merged_dhm()
+            dataset = self.dhm_dataset
+            
+        return _gather_points(dataset, xs, ys)
     
     def sample_elevations_along_line(self, line_geometry, sample_distance=10):
         """
@@ -107,33 +421,176 @@ class DHMProcessor:
         Returns:
             List of (distance, elevation) tuples
         """
-        if self.dhm_dataset is None:
-            self.load_merged_dhm()
-            
-        # Get the total length of the line
-        total_length = line_geometry.length
+        distances, xs, ys = sample_points_along_line(line_geometry, sample_distance)
         
-        # Generate points at regular intervals
-        elevations = []
-        current_distance = 0
+        # Read all elevations in one gather
+        values = self.get_elevations(xs, ys, sample_distance)
         
-        while current_distance <= total_length:
-            # Get point at current distance
-            point = line_geometry.interpolate(current_distance)
-            
-            # Get elevation
-            elev = self.get_elevation(point.x, point.y)
-            
-            # Store distance (in meters) and elevation
-            elevations.append((current_distance, elev))
-            
-            # Move to next point
-            current_distance += sample_distance
-            
-        return elevations
+        return [(float(d), None if np.isnan(e) else float(e)) for d, e in zip(distances, values)]
     
     def close(self):
-        """Close the DHM dataset."""
+        """Close the DHM datasets and detach from (or remove) a shared DHM."""
         if self.dhm_dataset is not None:
             self.dhm_dataset.close()
-            self.dhm_dataset = None
\ No newline at end of file
+            self.dhm_dataset = None
+        if self.slope_dataset is not None:
+            self.slope_dataset.close()
+            self.slope_dataset = None
+        for dataset in self.overview_datasets.values():
+            dataset.close()
+        self.overview_datasets = {}
+        if self.shared_dem is not None:
+            self.shared_dem.close()
+            self.shared_dem = None
+
+
+def sample_points_along_line(line_geometry, sample_distance=10):
+    """
+    Points at regular intervals along a line, starting at its first vertex.
+    
+    The end point is included when the length is an exact multiple of the
+    sample distance.
+    
+    Returns:
+        Tuple of (distances, xs, ys) NumPy arrays
+    """
+    distances = np.arange(int(np.floor(line_geometry.length / sample_distance)) + 1) * sample_distance
+    points = shapely.line_interpolate_point(line_geometry, distances)
+    return distances, shapely.get_x(points), shapely.get_y(points)
+
+
+def _tiled_creation_options(dtype):
+    """GTiff creation options for an internally tiled, compressed raster."""
+    return {
+        "tiled": True,
+        "blockxsize": TILE_SIZE,
+        "blockysize": TILE_SIZE,
+        "compress": "deflate",
+        # Floating point predictor for elevations, horizontal differencing otherwise
+        "predictor": 3 if np.dtype(dtype).kind == 'f' else 2,
+        "BIGTIFF": "IF_SAFER"
+    }
+
+
+def _iter_windows(width, height, size):
+    """Yield square windows of the given size covering a raster, row by row."""
+    for row in range(0, height, size):
+        for col in range(0, width, size):
+            yield Window(col, row, min(size, width - col), min(size, height - row))
+
+
+def _merge_tile_into_block(path, block, block_bounds, block_transform, nodata):
+    """
+    Copy the part of a source tile that overlaps an output block into it.
+    
+    Only pixels that are still nodata in the block are filled, so tiles merged
+    earlier take precedence.
+    """
+    with rasterio.open(path) as src:
+        # Intersection of the tile and the block in map coordinates
+        left = max(block_bounds[0], src.bounds.left)
+        bottom = max(block_bounds[1], src.bounds.bottom)
+        right = min(block_bounds[2], src.bounds.right)
+        top = min(block_bounds[3], src.bounds.top)
+        
+        # Destination pixels inside the block
+        dst = rasterio.windows.from_bounds(left, bottom, right, top, transform=block_transform)
+        dst = dst.round_offsets().round_lengths()
+        row0, col0 = int(dst.row_off), int(dst.col_off)
+        height = min(int(dst.height), block.shape[1] - row0)
+        width = min(int(dst.width), block.shape[2] - col0)
+        if height <= 0 or width <= 0:
+            return
+            
+        # Matching source window, resampled if the tile resolution differs
+        src_window = rasterio.windows.from_bounds(left, bottom, right, top, transform=src.transform)
+        data = src.read(window=src_window, out_shape=(src.count, height, width), masked=True)
+        
+        target = block[:, row0:row0 + height, col0:col0 + width]
+        fill = (target == nodata) & ~np.ma.getmaskarray(data)
+        target[fill] = data.data[fill]
+
+
+def _slope_aspect_block(src, window, xres, yres):
+    """Compute slope (percent) and aspect (degrees) for one window of a DEM."""
+    # Read the window with a one pixel halo, clipped to the raster
+    row0 = max(window.row_off - 1, 0)
+    col0 = max(window.col_off - 1, 0)
+    row1 = min(window.row_off + window.height + 1, src.height)
+    col1 = min(window.col_off + window.width + 1, src.width)
+    z = src.read(1, window=Window(col0, row0, col1 - col0, row1 - row0), masked=True)
+    z = z.astype('float64').filled(np.nan)
+    
+    # Replicate edge pixels where the halo falls outside the raster
+    pad = (
+        (1 if window.row_off == 0 else 0, 1 if row1 == window.row_off + window.height else 0),
+        (1 if window.col_off == 0 else 0, 1 if col1 == window.col_off + window.width else 0)
+    )
+    z = np.pad(z, pad, mode='edge')
+    
+    # Central differences; rows increase southwards
+    dz_dx = (z[1:-1, 2:] - z[1:-1, :-2]) / (2 * xres)
+    dz_dy = (z[:-2, 1:-1] - z[2:, 1:-1]) / (2 * yres)
+    
+    slope = np.hypot(dz_dx, dz_dy) * 100
+    aspect = np.degrees(np.arctan2(-dz_dx, -dz_dy)) % 360
+    
+    block = np.stack([slope, aspect]).astype('float32')
+    block[:, np.isnan(slope)] = SLOPE_NODATA
+    return block
+
+
+def _gather_points(dataset, xs, ys, indexes=1):
+    """
+    Read raster values at many points with as few reads as possible.
+    
+    Points are grouped by the dataset's internal blocks and each block is read
+    once, so the cost depends on how many blocks the points touch rather than
+    on the number of points.
+    
+    Returns:
+        Float64 array of shape (n,) for a single band index or (bands, n) for a
+        list of indexes, NaN outside the raster and where the dataset's mask
+        (its declared nodata value or internal mask) marks no data
+    """
+    xs = np.asarray(xs, dtype='float64')
+    ys = np.asarray(ys, dtype='float64')
+    bands = [indexes] if np.isscalar(indexes) else list(indexes)
+    
+    inverse = ~dataset.transform
+    cols = np.floor(inverse.a * xs + inverse.b * ys + inverse.c).astype('int64')
+    rows = np.floor(inverse.d * xs + inverse.e * ys + inverse.f).astype('int64')
+    inside = (rows >= 0) & (rows < dataset.height) & (cols >= 0) & (cols < dataset.width)
+    
+    values = np.full((len(bands), xs.size), np.nan)
+    
+    # A declared nodata value is masked with a comparison; internal masks and
+    # alpha bands need the (slower) masked read
+    flags = dataset.mask_flag_enums[bands[0] - 1]
+    masked_read = MaskFlags.per_dataset in flags or MaskFlags.alpha in flags
+    
+    if inside.any():
+        block_height, block_width = dataset.block_shapes[0]
+        idx = np.flatnonzero(inside)
+        n_block_cols = -(-dataset.width // block_width)
+        block_ids = (rows[idx] // block_height) * n_block_cols + (cols[idx] // block_width)
+        order = np.argsort(block_ids, kind='stable')
+        idx = idx[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(block_ids[order]) != 0])
+        ends = np.r_[starts[1:], idx.size]
+        
+        for start, end in zip(starts, ends):
+            group = idx[start:end]
+            row_off = (rows[group[0]] // block_height) * block_height
+            col_off = (cols[group[0]] // block_width) * block_width
+            window = Window(col_off, row_off,
+                            min(block_width, dataset.width - col_off),
+                            min(block_height, dataset.height - row_off))
+            data = dataset.read(bands, window=window, masked=masked_read)
+            sampled = data[:, rows[group] - row_off, cols[group] - col_off]
+            values[:, group] = sampled.astype('float64').filled(np.nan) if masked_read else sampled
+            
+        if dataset.nodata is not None and not masked_read:
+            values[values == dataset.nodata] = np.nan
+            
+    return values[0] if np.isscalar(indexes) else values
\ No newline at end of file
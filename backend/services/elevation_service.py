@@ -0,0 +1,189 @@
+# backend/services/elevation_service.py
+import os
+import threading
+import numpy as np
+from pyproj import CRS, Transformer
+from pyproj.exceptions import CRSError
+import logging
+
+from .dhm_processor import DHMProcessor
+from ..utils.concurrency import RequestBatcher, get_executor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ElevationService:
+    """Serves elevation lookups from a DHM handle kept open by the worker process."""
+
+    def __init__(self, dhm_directory='data', shared_dem=None):
+        """
+        Initialize with directory containing the merged DHM.
+
+        Args:
+            dhm_directory: Directory containing the merged DHM
+            shared_dem: Name of a DHM published in shared memory (see
+                shared_dem); lookups fall back to the GeoTIFF if it is missing
+        """
+        self.dhm_processor = DHMProcessor(dhm_directory)
+        self._lock = threading.Lock()
+        self._transformers = {}
+        if shared_dem:
+            try:
+                self.dhm_processor.attach_shared_dem(shared_dem)
+            except FileNotFoundError:
+                logger.warning(f"Shared DHM '{shared_dem}' not found; worker {os.getpid()} reads the GeoTIFF")
+
+    @property
+    def crs(self):
+        """CRS of the DHM."""
+        if self.dhm_processor.shared_dem is not None:
+            return self.dhm_processor.shared_dem.crs
+        return self._dataset().crs
+
+    def _dataset(self):
+        """Open the merged DHM on first use; never merge on the request path."""
+        if self.dhm_processor.dhm_dataset is None:
+            with self._lock:
+                if self.dhm_processor.dhm_dataset is None:
+                    self.dhm_processor.load_merged_dhm(merge_if_missing=False)
+                    logger.info(f"Opened DHM for worker {os.getpid()}: {self.dhm_processor.merged_dhm_path}")
+        return self.dhm_processor.dhm_dataset
+
+    def to_dhm_crs(self, xs, ys, crs=None):
+        """
+        Reproject coordinates into the DHM CRS.
+
+        Args:
+            xs, ys: Coordinates in the given CRS
+            crs: Source CRS (anything pyproj accepts); None means the DHM CRS
+
+        Returns:
+            Tuple of (xs, ys) NumPy arrays in the DHM CRS
+
+        Raises:
+            ValueError: If the CRS is not valid
+        """
+        xs = np.asarray(xs, dtype='float64')
+        ys = np.asarray(ys, dtype='float64')
+        if crs is None:
+            return xs, ys
+
+        key = str(crs)
+        transformer = self._transformers.get(key)
+        if transformer is None:
+            try:
+                source = CRS.from_user_input(crs)
+            except CRSError as e:
+                raise ValueError(f"Invalid CRS: {crs}") from e
+            transformer = Transformer.from_crs(source, CRS.from_user_input(self.crs), always_xy=True)
+            self._transformers[key] = transformer
+        return transformer.transform(xs, ys)
+
+    def get_elevations(self, xs, ys, crs=None, sample_distance=None):
+        """
+        Get elevations for many coordinates.
+
+        Args:
+            xs, ys: Coordinates
+            crs: CRS of the coordinates; None means the DHM CRS
+            sample_distance: Spacing of the coordinates in meters, allowing reads
+                from a coarser overview level; None reads full resolution
+
+        Returns:
+            NumPy array of elevations, NaN where there is no data
+        """
+        xs, ys = self.to_dhm_crs(xs, ys, crs)
+
+        # Shared DHM views are read-only arrays and safe to share between threads
+        if self.dhm_processor.shared_dem is not None:
+            return self.dhm_processor.get_elevations(xs, ys, sample_distance)
+
+        # Rasterio handles are not safe to read from several threads at once
+        self._dataset()
+        with self._lock:
+            return self.dhm_processor.get_elevations(xs, ys, sample_distance)
+
+    def get_elevations_batch(self, requests):
+        """
+        Elevations for several lookups with one DHM gather.
+
+        Points from different requests that fall in the same DHM block are
+        read together, so concurrent lookups around the same area cost
+        about as much as one. Each request is reprojected on its own, so an
+        invalid one fails alone instead of failing the whole batch.
+
+        Args:
+            requests: List of (xs, ys, crs) tuples
+
+        Returns:
+            List with one entry per request: its elevation array, or the
+            exception (e.g. ValueError for an invalid CRS) it failed with
+        """
+        results = [None] * len(requests)
+        valid, xs, ys = [], [], []
+        for i, (request_xs, request_ys, crs) in enumerate(requests):
+            try:
+                x = np.atleast_1d(np.asarray(request_xs, dtype='float64'))
+                y = np.atleast_1d(np.asarray(request_ys, dtype='float64'))
+                if x.shape != y.shape or x.ndim != 1:
+                    raise ValueError("Coordinates must be matching 1-D arrays")
+                x, y = self.to_dhm_crs(x, y, crs)
+            except Exception as e:
+                results[i] = e
+                continue
+            valid.append(i)
+            xs.append(x)
+            ys.append(y)
+
+        if valid:
+            elevations = self.get_elevations(np.concatenate(xs), np.concatenate(ys))
+            for i, part in zip(valid, np.split(elevations, np.cumsum([len(x) for x in xs])[:-1])):
+                results[i] = part
+        return results
+
+    def get_elevation(self, x, y, crs=None):
+        """Get the elevation of a single coordinate, or None if there is no data."""
+        elevation = self.get_elevations([x], [y], crs)[0]
+        return None if np.isnan(elevation) else float(elevation)
+
+    def close(self):
+        """Close the DHM handle."""
+        with self._lock:
+            self.dhm_processor.close()
+
+
+# One service per DHM directory, shared DHM and worker process
+_services = {}
+_services_lock = threading.Lock()
+
+def get_elevation_service(dhm_directory='data', shared_dem=None):
+    """Get the elevation service for this worker process, creating it on first use."""
+    key = (os.getpid(), dhm_directory, shared_dem)
+    service = _services.get(key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(key)
+            if service is None:
+                service = _services[key] = ElevationService(dhm_directory, shared_dem)
+    return service
+
+# One lookup batcher per service and worker process
+_batchers = {}
+
+def get_elevation_batcher(dhm_directory='data', shared_dem=None, max_workers=4):
+    """
+    Get the RequestBatcher merging this worker's concurrent elevation lookups.
+
+    Submit (xs, ys, crs) tuples; lookups run on the worker's bounded 'dem'
+    thread pool, one DHM gather for everything queued while it was busy.
+    """
+    key = (os.getpid(), dhm_directory, shared_dem)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        service = get_elevation_service(dhm_directory, shared_dem)
+        with _services_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = _batchers[key] = RequestBatcher(service.get_elevations_batch,
+                                                          get_executor('dem', max_workers))
+    return batcher
@@ -0,0 +1,165 @@
+# backend/services/gradient_cache.py
+import os
+import json
+import hashlib
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-road columns stored in the cache
+GRADIENT_COLUMNS = ['length_m', 'avg_gradient', 'max_gradient', 'elevation_gain', 'max_gap_m']
+
+class GradientCache:
+    """
+    Persistent road gradient results keyed by the inputs they were computed from.
+
+    A cache entry is valid for one roads file, one DEM, one sample distance,
+    smoothing setting and maximum interpolated gap. Files are identified by
+    the SHA-256 of their contents; digests are remembered per path, size and
+    modification time so large files are only hashed again after they change.
+    """
+
+    FORMAT_VERSION = 3
+
+    def __init__(self, cache_dir='data/cache'):
+        """Initialize with the directory holding the cache files."""
+        self.cache_dir = cache_dir
+        self.digest_file = os.path.join(cache_dir, 'digests.json')
+
+    def key(self, roads_file, dhm_file, sample_distance, smoothing, max_gap=None):
+        """
+        Build the cache key for a gradient calculation.
+
+        Args:
+            roads_file: Path of the roads file
+            dhm_file: Path of the merged DHM
+            sample_distance: Distance between elevation samples in meters
+            smoothing: Savitzky-Golay (window, order) the profiles were smoothed
+                with, or a false value if they were not smoothed
+            max_gap: Longest nodata gap in meters filled by interpolation
+
+        Returns:
+            Hex string identifying the inputs
+        """
+        parts = [
+            f"v{self.FORMAT_VERSION}",
+            self.file_digest(roads_file),
+            self.file_digest(dhm_file),
+            f"{float(sample_distance):g}",
+            f"savgol{smoothing[0]}-{smoothing[1]}" if smoothing else 'raw',
+            f"gap{float(max_gap or 0):g}"
+        ]
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+    def path(self, key):
+        """Path of the cache file for a key."""
+        return os.path.join(self.cache_dir, f"gradients_{key}.npz")
+
+    def load(self, key, road_count):
+        """
+        Load cached gradients.
+
+        Args:
+            key: Cache key from key()
+            road_count: Expected number of roads
+
+        Returns:
+            Dictionary of arrays (see save), or None if there is no valid entry
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != self.FORMAT_VERSION or len(data['length_m']) != road_count:
+                    logger.warning(f"Ignoring outdated gradient cache: {path}")
+                    return None
+                arrays = {name: data[name] for name in data.files if name != 'version'}
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable gradient cache {path}: {e}")
+            return None
+        logger.info(f"Loaded cached gradients from {path}")
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        Store gradients for a key.
+
+        Args:
+            key: Cache key from key()
+            arrays: Dictionary with the GRADIENT_COLUMNS arrays and the packed
+                profiles (profile_offsets, profile_distances, profile_elevations)
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        # Write under a temporary name so readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, version=self.FORMAT_VERSION, **arrays)
+        os.replace(temp_path, path)
+        logger.info(f"Saved gradient cache to {path}")
+
+    def file_digest(self, path):
+        """SHA-256 of a file's contents, reusing the remembered digest while the file is unchanged."""
+        stat = os.stat(path)
+        digests = self._read_digests()
+        entry = digests.get(os.path.abspath(path))
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        logger.info(f"Hashing {path}")
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        digests[os.path.abspath(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        self._write_digests(digests)
+        return digest
+
+    def _read_digests(self):
+        """Remembered file digests, or an empty dict."""
+        try:
+            with open(self.digest_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_digests(self, digests):
+        """Persist remembered file digests."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.digest_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(digests, f)
+        os.replace(temp_path, self.digest_file)
+
+
+def pack_profiles(profiles):
+    """
+    Pack per-road elevation profiles into flat arrays.
+
+    Args:
+        profiles: Sequence of lists of (distance, elevation) tuples, or None
+
+    Returns:
+        Tuple of (offsets, distances, elevations); road i's samples are
+        offsets[i]:offsets[i + 1]
+    """
+    counts = np.array([len(p) if p else 0 for p in profiles], dtype='int64')
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+    samples = [p for p in profiles if p]
+    flat = np.asarray([s for p in samples for s in p], dtype='float64').reshape(-1, 2)
+    return offsets, flat[:, 0].copy(), flat[:, 1].copy()
+
+
+def unpack_profiles(offsets, distances, elevations):
+    """Inverse of pack_profiles; roads without samples get None."""
+    distances = distances.tolist()
+    elevations = elevations.tolist()
+    profiles = []
+    for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        profiles.append(list(zip(distances[start:end], elevations[start:end])) if end > start else None)
+    return profiles
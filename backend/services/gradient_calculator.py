@@ -1,9 +1,10 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 import rasterio
 from rasterio.merge import merge
 import geopandas as gpd
+import pyogrio
 import numpy as np
 from shapely.geometry import LineString
 import glob
@@ -11,6 +12,8 @@ import os
 import json
 from flask_cors import CORS
 
+from backend.utils.concurrency import get_executor
+
 app = Flask(__name__)
 CORS(app)
 
@@ -38,7 +41,8 @@ CONFIG = {
     ],
     'ROADS_FILE': 'T:/hill_hunt/hill_gradient_app/data/denmark_roads.geojson',
     'OUTPUT_FILE': 'T:/hill_hunt/hill_gradient_app/data/vejle_roads_elevation.geojson',
-    'MERGED_DHM': 'merged_dhm.tif'
+    'MERGED_DHM': 'merged_dhm.tif',
+    'READ_CHUNK_SIZE': 10000  # features read at a time while streaming roads
 }
 
 def get_elevation(dem, x, y):
@@ -205,16 +209,22 @@ def process_roads():
             'message': str(e)
         }), 500
 
+def load_gradient_profile(road_id):
+    """Read a road and sample its gradient profile from the DEM"""
+    # Read the roads data
+    roads = gpd.read_file(CONFIG['OUTPUT_FILE'])
+    road = roads.iloc[int(road_id)]
+    
+    # Create profile
+    with rasterio.open(CONFIG['MERGED_DHM']) as dem:
+        profile_data = create_gradient_profile(road.geometry, dem)
+    return road, profile_data
+
 @app.route('/api/gradient-profile/<road_id>', methods=['GET'])
-def get_gradient_profile(road_id):
+async def get_gradient_profile(road_id):
     try:
-        # Read the roads data
-        roads = gpd.read_file(CONFIG['OUTPUT_FILE'])
-        road = roads.iloc[int(road_id)]
-        
-        # Create profile
-        with rasterio.open(CONFIG['MERGED_DHM']) as dem:
-            profile_data = create_gradient_profile(road.geometry, dem)
+        # Concurrent requests for the same road share one read on the bounded pool
+        road, profile_data = await get_executor('profiles').run(('gradient_profile', road_id), load_gradient_profile, road_id)
         
         return jsonify({
             'status': 'success',
@@ -239,44 +249,60 @@ def get_roads():
         highway_type = request.args.get('highway_type')
         min_gradient = float(request.args.get('min_gradient', 0))
         max_gradient = float(request.args.get('max_gradient', 100))
+        output_format = request.args.get('format', 'json')
         
-        # Read processed roads
-        roads = gpd.read_file(CONFIG['OUTPUT_FILE'])
-        
-        # Filter by criteria
-        if highway_type:
-            roads = roads[roads['highway'] == highway_type]
-        
-        roads = roads[
-            (roads['gradient'] >= min_gradient) & 
-            (roads['gradient'] <= max_gradient)
-        ]
-        
-        # Convert to list of road metadata
-        roads_list = []
-        for _, road in roads.iterrows():
-            roads_list.append({
-                'id': int(road.get('id', 0)),
+        # Processed roads are read in chunks of attributes while streaming
+        feature_count = pyogrio.read_info(CONFIG['OUTPUT_FILE'])['features']
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+    
+    def read_roads():
+        chunk_size = CONFIG['READ_CHUNK_SIZE']
+        for start in range(0, feature_count, chunk_size):
+            chunk = pyogrio.read_dataframe(CONFIG['OUTPUT_FILE'], read_geometry=False,
+                                           skip_features=start, max_features=chunk_size)
+            yield from chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+    
+    def matching_roads():
+        for road in read_roads():
+            # Filter by criteria
+            if highway_type and road.get('highway') != highway_type:
+                continue
+            if road.get('gradient') is None or not min_gradient <= road['gradient'] <= max_gradient:
+                continue
+            
+            yield json.dumps({
+                'id': int(road.get('id') or 0),
                 'name': road.get('name'),
                 'highway': road.get('highway'),
                 'maxspeed': road.get('maxspeed'),
                 'surface': road.get('surface'),
-                'length_meters': float(road.get('length_meters', 0)),
+                'length_meters': float(road.get('length_meters') or 0),
                 'gradient': float(road['gradient']),
                 'min_elevation': float(road['min_elevation']),
                 'max_elevation': float(road['max_elevation'])
             })
-        
-        return jsonify({
-            'status': 'success',
-            'data': roads_list
-        })
     
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
+    def generate_ndjson():
+        for road in matching_roads():
+            yield road + '\n'
+    
+    def generate_json():
+        # Same document as before, written as the roads are read
+        yield '{"status": "success", "data": ['
+        separator = ''
+        for road in matching_roads():
+            yield separator + road
+            separator = ', '
+        yield ']}'
+    
+    if output_format == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
 
 @app.route('/api/roads/stats', methods=['GET'])
 def get_road_stats():
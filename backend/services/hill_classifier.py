@@ -0,0 +1,102 @@
+# backend/services/hill_classifier.py
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Category labels from easiest to hardest
+CATEGORY_LABELS = ['4', '3', '2', '1', 'HC']
+
+# Lower bounds of categories 3, 2, 1 and HC for each category method
+DEFAULT_CATEGORY_THRESHOLDS = {
+    'gradient': (3.0, 5.0, 7.0, 10.0),  # average gradient %
+    'score': (0.05, 0.15, 0.3, 0.5)     # climb score
+}
+
+class HillClassifier:
+    """Filters and categorises detected climbs with vectorized column operations."""
+
+    def __init__(self, min_length=100, min_elevation_gain=10, method='gradient', thresholds=None):
+        """
+        Initialize with filter and category thresholds.
+
+        Args:
+            min_length: Minimum climb length in meters
+            min_elevation_gain: Minimum elevation gain in meters
+            method: 'gradient' to categorise by average gradient, 'score' by climb score
+            thresholds: Ascending lower bounds of categories 3, 2, 1 and HC in the
+                method's unit; None uses DEFAULT_CATEGORY_THRESHOLDS
+        """
+        if method not in DEFAULT_CATEGORY_THRESHOLDS:
+            raise ValueError(f"Unknown category method: {method}")
+        self.min_length = min_length
+        self.min_elevation_gain = min_elevation_gain
+        self.method = method
+        self.thresholds = _check_thresholds(thresholds or DEFAULT_CATEGORY_THRESHOLDS[method])
+
+    def classify(self, climbs_gdf):
+        """
+        Filter climbs by the thresholds and add 'climb_score' and 'category'.
+
+        Only reads the length_m, avg_gradient and elevation_gain columns, so
+        climbs can be reclassified with new thresholds without touching the
+        elevation profiles.
+
+        Args:
+            climbs_gdf: GeoDataFrame of climbs, e.g. from ClimbDetector.detect
+
+        Returns:
+            Filtered copy of the GeoDataFrame
+        """
+        length = climbs_gdf['length_m'].to_numpy(dtype='float64')
+        gain = climbs_gdf['elevation_gain'].to_numpy(dtype='float64')
+        keep = (length >= self.min_length) & (gain >= self.min_elevation_gain)
+
+        hills_gdf = climbs_gdf.loc[keep].copy()
+        hills_gdf['climb_score'] = climb_score(length[keep], gain[keep])
+
+        if self.method == 'score':
+            values = hills_gdf['climb_score']
+        else:
+            values = hills_gdf['avg_gradient'].astype('float64')
+
+        # Half-open bins [lower, upper) so a threshold value falls in the harder category
+        bins = [-np.inf, *self.thresholds, np.inf]
+        hills_gdf['category'] = pd.cut(values, bins, right=False, labels=CATEGORY_LABELS).astype(object)
+
+        logger.info(f"Classified {len(hills_gdf)} of {len(climbs_gdf)} climbs by {self.method}")
+        return hills_gdf
+
+
+def climb_score(length, elevation_gain):
+    """
+    FIETS-style climb difficulty score.
+
+    H^2 / (10 * D) for elevation gain H and length D in meters, which equals
+    length x gradient^2 up to a constant. The FIETS altitude bonus only starts
+    above 1000 m, so it is left out.
+
+    Args:
+        length: Climb lengths in meters
+        elevation_gain: Elevation gains in meters
+
+    Returns:
+        NumPy array of scores (0 for zero-length climbs)
+    """
+    length = np.asarray(length, dtype='float64')
+    elevation_gain = np.asarray(elevation_gain, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = elevation_gain ** 2 / (10 * length)
+    return np.where(length > 0, score, 0.0)
+
+
+def _check_thresholds(thresholds):
+    """Validate one ascending threshold per category boundary."""
+    thresholds = tuple(float(t) for t in thresholds)
+    if len(thresholds) != len(CATEGORY_LABELS) - 1:
+        raise ValueError(f"Expected {len(CATEGORY_LABELS) - 1} category thresholds, got {len(thresholds)}")
+    if any(b <= a for a, b in zip(thresholds, thresholds[1:])):
+        raise ValueError(f"Category thresholds must be ascending: {thresholds}")
+    return thresholds
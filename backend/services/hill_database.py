@@ -1,7 +1,6 @@
 # backend/services/hill_database.py
 import os
 import json
-import sqlite3
 import numpy as np
 import geopandas as gpd
 import pandas as pd
@@ -9,6 +8,8 @@ import logging
 from shapely.geometry import shape, LineString, Point
 from shapely import wkt
 
+from ..utils.instrumentation import connect_sqlite
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -19,9 +20,13 @@ class HillDatabase:
         """Initialize with database path."""
         self.db_path = db_path
         
+    def _connect(self):
+        """Open a connection whose queries are timed in the request instrumentation."""
+        return connect_sqlite(self.db_path, 'hill_db')
+        
     def init_db(self):
         """Create database tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Create hills table
@@ -80,7 +85,7 @@ class HillDatabase:
         self.init_db()
         
         # Connect to database
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Clear existing data if needed
@@ -180,7 +185,7 @@ class HillDatabase:
     
     def get_all_hills(self):
         """Get all hills from the database."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         
         # Convert database rows to DataFrame
         hills_df = pd.read_sql_query("SELECT * FROM hills", conn)
@@ -218,10 +223,28 @@ class HillDatabase:
         Returns:
             GeoDataFrame with matching hills
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
+        query, params = self._search_query(min_gradient, max_gradient, min_length, max_length,
+                                           category, region, bbox)
+        
+        # Get results
+        hills_df = pd.read_sql_query(query, conn, params=params)
         
+        # Create a GeoDataFrame with WKT geometries
+        if not hills_df.empty:
+            hills_df['geometry'] = hills_df['geometry'].apply(wkt.loads)
+            hills_gdf = gpd.GeoDataFrame(hills_df, geometry='geometry')
+        else:
+            hills_gdf = gpd.GeoDataFrame()
+            
+        conn.close()
+        return hills_gdf
+    
+    def _search_query(self, min_gradient=None, max_gradient=None, min_length=None, max_length=None,
+                      category=None, region=None, bbox=None, columns=None):
+        """Build the SQL and parameters for search_hills and iter_hills."""
         # Build query
-        query = "SELECT * FROM hills WHERE 1=1"
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM hills WHERE 1=1"
         params = []
         
         if min_gradient is not None:
@@ -253,8 +276,8 @@ class HillDatabase:
             minx, miny, maxx, maxy = bbox
             
             # Use the spatial index for initial filtering
-            spatial_query = """
-            SELECT h.* FROM hills h
+            spatial_query = f"""
+            SELECT {', '.join('h.' + c for c in columns) if columns else 'h.*'} FROM hills h
             JOIN idx_hills_bbox i ON h.id = i.id
             WHERE i.min_x <= ? AND i.max_x >= ?
             AND i.min_y <= ? AND i.max_y >= ?
@@ -268,22 +291,39 @@ class HillDatabase:
                 query = spatial_query
                 params = [maxx, minx, maxy, miny]
         
-        # Get results
-        hills_df = pd.read_sql_query(query, conn, params=params)
+        return query, params
+    
+    def iter_hills(self, columns=None, batch_size=1000, **filters):
+        """
+        Iterate over matching hills without loading them all.
         
-        # Create a GeoDataFrame with WKT geometries
-        if not hills_df.empty:
-            hills_df['geometry'] = hills_df['geometry'].apply(wkt.loads)
-            hills_gdf = gpd.GeoDataFrame(hills_df, geometry='geometry')
-        else:
-            hills_gdf = gpd.GeoDataFrame()
+        Rows are read from a cursor with fetchmany, so memory stays flat
+        however many hills match.
+        
+        Args:
+            columns: Column names to select; None selects all
+            batch_size: Rows fetched per round trip
+            **filters: Filters as for search_hills
             
-        conn.close()
-        return hills_gdf
+        Yields:
+            Lists of up to batch_size rows as dictionaries
+        """
+        query, params = self._search_query(columns=columns, **filters)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, params)
+            names = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(names, row)) for row in rows]
+        finally:
+            conn.close()
     
     def get_hill_elevation_profile(self, hill_id):
         """Get the elevation profile for a specific hill."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         
         # Query elevation profile
         query = """
@@ -305,7 +345,7 @@ class HillDatabase:
     
     def get_hill_details(self, hill_id):
         """Get detailed information about a specific hill."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         
         # Query hill details
         query = "SELECT * FROM hills WHERE id = ?"
@@ -344,7 +384,7 @@ class HillDatabase:
     
     def get_statistics(self):
         """Get statistical information about the hills in the database."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         stats = {}
@@ -0,0 +1,185 @@
+# backend/services/road_graph.py
+import os
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RoadGraph:
+    """
+    Road connectivity as CSR adjacency over endpoint-snapped nodes.
+
+    Every road way is one undirected edge between the nodes at its two ends.
+    Endpoints closer than the snap tolerance share a node. Edges are numbered
+    by the way's position in the roads GeoDataFrame. For node n, the slice
+    indptr[n]:indptr[n + 1] of `indices`, `edge_index` and `edge_forward`
+    lists its neighbouring nodes, the connecting edges and whether each edge is
+    travelled from its start to its end.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, node_xy, edge_u, edge_v, edge_labels, snap_tolerance=0.5,
+                 edge_coords=None, edge_coord_offsets=None, edge_attributes=None, crs=None):
+        """
+        Initialize from node coordinates and edge endpoints; builds the CSR arrays.
+
+        Args:
+            node_xy: (n_nodes, 2) node coordinates
+            edge_u, edge_v: Start and end node of every edge
+            edge_labels: Index label of every edge's road in the roads GeoDataFrame
+            snap_tolerance: Grid size used to merge endpoints
+            edge_coords: Optional (n_coords, 2) coordinates of all edges, concatenated
+            edge_coord_offsets: Start of each edge in edge_coords (n_edges + 1 entries)
+            edge_attributes: Optional dict of per-edge arrays (length_m, avg_gradient, ...)
+            crs: CRS of the coordinates as WKT
+        """
+        self.node_xy = np.asarray(node_xy, dtype='float64')
+        self.edge_u = np.asarray(edge_u, dtype='int64')
+        self.edge_v = np.asarray(edge_v, dtype='int64')
+        self.edge_labels = np.asarray(edge_labels)
+        self.snap_tolerance = snap_tolerance
+        self.edge_coords = edge_coords
+        self.edge_coord_offsets = edge_coord_offsets
+        self.edge_attributes = dict(edge_attributes or {})
+        self.crs = crs
+        self._tree = None
+
+        # Each edge appears once in each direction
+        n_edges = len(self.edge_u)
+        source = np.concatenate([self.edge_u, self.edge_v])
+        target = np.concatenate([self.edge_v, self.edge_u])
+        edges = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+        forward = np.concatenate([np.ones(n_edges, dtype=bool), np.zeros(n_edges, dtype=bool)])
+
+        order = np.argsort(source, kind='stable')
+        counts = np.bincount(source, minlength=self.node_count)
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+        self.indices = target[order]
+        self.edge_index = edges[order]
+        self.edge_forward = forward[order]
+
+    @property
+    def node_count(self):
+        return len(self.node_xy)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_u)
+
+    @property
+    def degree(self):
+        """Number of edge ends at each node."""
+        return np.diff(self.indptr)
+
+    @classmethod
+    def build(cls, roads_gdf, snap_tolerance=0.5):
+        """
+        Build the graph from a GeoDataFrame of LineString/MultiLineString ways.
+
+        Args:
+            roads_gdf: Road ways in a projected CRS (meters)
+            snap_tolerance: Grid size in meters used to merge nearby endpoints
+
+        Returns:
+            RoadGraph
+        """
+        geometries = roads_gdf.geometry.values
+        coords, owner = shapely.get_coordinates(geometries, return_index=True)
+
+        # First and last coordinate of every way; empty geometries get NaN
+        n_edges = len(geometries)
+        first = np.full((n_edges, 2), np.nan)
+        last = np.full((n_edges, 2), np.nan)
+        if len(owner):
+            starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+            ends = np.r_[starts[1:] - 1, len(owner) - 1]
+            first[owner[starts]] = coords[starts]
+            last[owner[ends]] = coords[ends]
+
+        # Snap endpoints onto a grid so touching ways share a key; empty
+        # geometries each get a node of their own
+        endpoints = np.concatenate([first, last])
+        missing = np.isnan(endpoints).any(axis=1)
+        keys = np.empty((len(endpoints), 2), dtype='int64')
+        keys[~missing] = np.round(endpoints[~missing] / snap_tolerance)
+        keys[missing, 0] = np.iinfo('int64').min
+        keys[missing, 1] = np.arange(missing.sum())
+
+        _, first_index, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        node_xy = endpoints[first_index]
+
+        # Edge geometries as one flat coordinate array with per-edge offsets
+        coord_offsets = np.searchsorted(owner, np.arange(n_edges + 1)).astype('int64')
+
+        graph = cls(node_xy, inverse[:n_edges], inverse[n_edges:], roads_gdf.index.values, snap_tolerance,
+                    edge_coords=coords, edge_coord_offsets=coord_offsets,
+                    edge_attributes={'length_m': shapely.length(geometries)},
+                    crs=roads_gdf.crs.to_wkt() if roads_gdf.crs is not None else None)
+        logger.info(f"Built road graph with {graph.node_count} nodes and {graph.edge_count} edges")
+        return graph
+
+    def neighbors(self, node):
+        """Return (nodes, edges, forward) arrays for the edges leaving a node."""
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return self.indices[start:end], self.edge_index[start:end], self.edge_forward[start:end]
+
+    def edge_line(self, edge, reverse=False):
+        """Coordinates of an edge's geometry, optionally in reverse order."""
+        coords = self.edge_coords[self.edge_coord_offsets[edge]:self.edge_coord_offsets[edge + 1]]
+        return coords[::-1] if reverse else coords
+
+    def set_edge_attributes(self, **attributes):
+        """Set per-edge attribute arrays (one value per edge)."""
+        for name, values in attributes.items():
+            values = np.asarray(values, dtype='float64')
+            if len(values) != self.edge_count:
+                raise ValueError(f"Attribute {name} has {len(values)} values for {self.edge_count} edges")
+            self.edge_attributes[name] = values
+
+    def nearest_node(self, x, y):
+        """Return (node, distance) of the node closest to a coordinate."""
+        if self._tree is None:
+            # Nodes of empty geometries have no position
+            self._tree_nodes = np.flatnonzero(~np.isnan(self.node_xy).any(axis=1))
+            self._tree = cKDTree(self.node_xy[self._tree_nodes])
+        distance, position = self._tree.query([x, y])
+        return int(self._tree_nodes[position]), float(distance)
+
+    def save(self, path):
+        """Persist the graph as a compressed NumPy archive."""
+        np.savez_compressed(
+            path,
+            version=self.FORMAT_VERSION,
+            node_xy=self.node_xy,
+            edge_u=self.edge_u,
+            edge_v=self.edge_v,
+            edge_labels=self.edge_labels.astype(str) if self.edge_labels.dtype == object else self.edge_labels,
+            snap_tolerance=self.snap_tolerance,
+            edge_coords=self.edge_coords,
+            edge_coord_offsets=self.edge_coord_offsets,
+            crs=self.crs or '',
+            **{f'attr_{name}': values for name, values in self.edge_attributes.items()}
+        )
+        logger.info(f"Saved road graph to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """Load a graph saved with save(); returns None if missing or outdated."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != cls.FORMAT_VERSION:
+                logger.warning(f"Ignoring road graph with old format: {path}")
+                return None
+            attributes = {key[len('attr_'):]: data[key] for key in data.files if key.startswith('attr_')}
+            return cls(data['node_xy'], data['edge_u'], data['edge_v'], data['edge_labels'],
+                       float(data['snap_tolerance']),
+                       edge_coords=data['edge_coords'],
+                       edge_coord_offsets=data['edge_coord_offsets'],
+                       edge_attributes=attributes,
+                       crs=str(data['crs']) or None)
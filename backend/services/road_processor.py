@@ -1,25 +1,130 @@
 # backend/services/road_processor.py
 import os
+import json
+import hashlib
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import LineString, Point
+import shapely
 import logging
-from scipy.signal import savgol_filter
 
-from .dhm_processor import DHMProcessor
+from .dhm_processor import DHMProcessor, sample_points_along_line
+from .climb_detector import ClimbDetector
+from .hill_classifier import HillClassifier
+from .gradient_cache import GradientCache, GRADIENT_COLUMNS, pack_profiles, unpack_profiles
+from .road_graph import RoadGraph
+from ..utils.geo_utils import encode_profiles
+from ..utils.profile_kernels import get_profile_kernels
+from ..utils.profiling import StageProfiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# OSM tag values that do not put a way on a bridge or in a tunnel. Culverts
+# carry water under the road and building passages run at ground level, so
+# the terrain model is right for both.
+NOT_BRIDGE = {'', 'no', 'none', 'false', '0'}
+NOT_TUNNEL = NOT_BRIDGE | {'culvert', 'building_passage'}
+
+def structure_flags(roads_gdf):
+    """
+    Which ways are bridges or tunnels, from their OSM tags.
+
+    Tags are read from 'bridge' and 'tunnel' columns, or from the 'other_tags'
+    column written by GDAL's OSM driver when those are missing.
+
+    Args:
+        roads_gdf: GeoDataFrame of road ways
+
+    Returns:
+        Tuple of boolean arrays (bridges, tunnels), one entry per way
+    """
+    def tag_values(tag):
+        if tag in roads_gdf.columns:
+            values = roads_gdf[tag]
+        elif 'other_tags' in roads_gdf.columns:
+            values = roads_gdf['other_tags'].astype('string').str.extract(rf'"{tag}"=>"([^"]*)"', expand=False)
+        else:
+            return pd.Series('', index=roads_gdf.index)
+        return values.astype('string').fillna('').str.strip().str.lower()
+
+    bridges = ~tag_values('bridge').isin(NOT_BRIDGE).to_numpy(dtype=bool)
+    tunnels = ~tag_values('tunnel').isin(NOT_TUNNEL).to_numpy(dtype=bool)
+    return bridges, tunnels
+
+# Columns holding a way's OSM id, in order of preference
+OSM_ID_COLUMNS = ('osm_id', '@id', 'id')
+
+def source_keys(roads_gdf, coordinates_json):
+    """
+    Stable keys identifying each way across re-imports.
+
+    The key is the OSM id when the roads have one, and otherwise a hash of
+    the way's stored coordinates. Ways sharing a key (e.g. the parts of a
+    split way) are numbered in file order.
+
+    Args:
+        roads_gdf: Roads GeoDataFrame
+        coordinates_json: The coordinates_json text of each way
+
+    Returns:
+        List of key strings, one per way
+    """
+    column = next((name for name in OSM_ID_COLUMNS if name in roads_gdf.columns), None)
+    ids = roads_gdf[column].tolist() if column else [None] * len(roads_gdf)
+
+    keys, seen = [], {}
+    for osm_id, coords in zip(ids, coordinates_json):
+        if osm_id is None or (isinstance(osm_id, float) and np.isnan(osm_id)) or str(osm_id) == '':
+            key = 'geom:' + hashlib.sha1(coords.encode()).hexdigest()
+        else:
+            key = f"osm:{osm_id}"
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        keys.append(key if count == 0 else f"{key}#{count}")
+    return keys
+
 class RoadProcessor:
     """Processes road data and calculates gradients using elevation data."""
     
-    def __init__(self, roads_file='data/denmark_roads.geojson', dhm_processor=None):
-        """Initialize with the road network file and DHM processor."""
+    def __init__(self, roads_file='data/denmark_roads.geojson', dhm_processor=None, graph_file=None,
+                 cache_dir=None, sample_distance=10, max_gap=50, smoothing_window=5, smoothing_order=2,
+                 kernel='auto', profiler=None):
+        """
+        Initialize with the road network file and DHM processor.
+        
+        Args:
+            roads_file: Road network file
+            dhm_processor: DHMProcessor; a default one is created if not given
+            graph_file: Road graph file; defaults to <roads>_graph.npz
+            cache_dir: Gradient cache directory; defaults to 'cache' next to the
+                roads file, False disables the cache
+            sample_distance: Default distance between elevation samples in meters
+            max_gap: Default longest run of nodata samples, in meters, filled by
+                interpolating along the profile
+            smoothing_window: Odd number of samples in the Savitzky-Golay window
+            smoothing_order: Polynomial order of the Savitzky-Golay filter
+            kernel: Profile kernel backend, 'numpy', 'numba' or 'auto' for
+                Numba when it is installed (see profile_kernels)
+            profiler: StageProfiler receiving step timers, counters and progress;
+                a timers-only one is created if not given
+        """
         self.roads_file = roads_file
         self.dhm_processor = dhm_processor if dhm_processor else DHMProcessor()
+        self.graph_file = graph_file or os.path.splitext(roads_file)[0] + '_graph.npz'
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(roads_file), 'cache')
+        self.gradient_cache = GradientCache(cache_dir) if cache_dir else None
+        self.sample_distance = sample_distance
+        self.max_gap = max_gap
+        self.smoothing_window = smoothing_window
+        self.smoothing_order = smoothing_order
+        self.kernels = get_profile_kernels(kernel)
+        self.profiler = profiler or StageProfiler()
         self.roads_gdf = None
+        self.road_graph = None
+        self._climb_candidates = {}
         
     def load_roads(self):
         """Load road network data."""
@@ -30,7 +135,8 @@ class RoadProcessor:
             raise FileNotFoundError(f"Road file not found: {self.roads_file}")
             
         # Load roads as GeoDataFrame
-        self.roads_gdf = gpd.read_file(self.roads_file)
+        with self.profiler.timer('read_roads'):
+            self.roads_gdf = gpd.read_file(self.roads_file)
         
         # Ensure roads are in the same CRS as the DHM
         if self.dhm_processor.dhm_dataset is None:
@@ -39,142 +145,372 @@ class RoadProcessor:
         dhm_crs = self.dhm_processor.dhm_dataset.crs
         if self.roads_gdf.crs != dhm_crs:
             logger.info(f"Reprojecting roads from {self.roads_gdf.crs} to {dhm_crs}")
-            self.roads_gdf = self.roads_gdf.to_crs(dhm_crs)
+            with self.profiler.timer('reproject_roads'):
+                self.roads_gdf = self.roads_gdf.to_crs(dhm_crs)
             
         logger.info(f"Loaded {len(self.roads_gdf)} road segments")
+        
+        with self.profiler.timer('road_graph'):
+            self.load_road_graph()
         return self.roads_gdf
+    
+    def load_road_graph(self):
+        """
+        Load the road connectivity graph, building and saving it if needed.
         
-    def calculate_road_gradients(self, sample_distance=10, smoothing=True):
+        The saved graph is reused while it is newer than the roads file and
+        covers the same number of ways.
+        """
+        if self.roads_gdf is None:
+            self.load_roads()
+            return self.road_graph
+            
+        graph = None
+        if os.path.exists(self.graph_file) and os.path.getmtime(self.graph_file) >= os.path.getmtime(self.roads_file):
+            graph = RoadGraph.load(self.graph_file)
+            if graph is not None and graph.edge_count != len(self.roads_gdf):
+                graph = None
+                
+        if graph is None:
+            graph = RoadGraph.build(self.roads_gdf)
+            graph.save(self.graph_file)
+        else:
+            logger.info(f"Using existing road graph: {self.graph_file}")
+            
+        self.road_graph = graph
+        return self.road_graph
+        
+    def calculate_road_gradients(self, sample_distance=None, smoothing=True, use_cache=True, max_gap=None):
         """
         Calculate gradients for all road segments.
         
+        Samples where the DHM has no data (water, masked areas) are filled by
+        interpolating along the profile when the gap is at most max_gap
+        meters. Roads with a longer gap get no profile or gradients; every
+        road's longest gap is kept in 'max_gap_m' so they can be found.
+        
+        Bridges and tunnels (see structure_flags) do not follow the bare-earth
+        terrain, so their profile is a straight line between the elevations
+        at their ends instead of the DHM values along them.
+        
+        Results are stored in the gradient cache, keyed by the roads file, the
+        DHM, the sample distance, smoothing and max_gap, and loaded from there
+        instead of sampling the DHM again while those inputs are unchanged.
+        
         Args:
-            sample_distance: Distance between elevation samples in meters
-            smoothing: Whether to apply smoothing to elevation profiles
+            sample_distance: Distance between elevation samples in meters;
+                None uses the processor's sample distance
+            smoothing: Whether to smooth the elevation profiles with the
+                processor's Savitzky-Golay window and order
+            use_cache: Whether to read and write the gradient cache
+            max_gap: Longest nodata gap in meters to interpolate; None uses the
+                processor's max_gap
         
         Returns:
             GeoDataFrame with road segments and gradient information
         """
         if self.roads_gdf is None:
             self.load_roads()
+        sample_distance = sample_distance or self.sample_distance
+        max_gap = self.max_gap if max_gap is None else max_gap
+        self._climb_candidates = {}
+        profiler = self.profiler
+        
+        cache_key = None
+        if use_cache and self.gradient_cache is not None:
+            with profiler.timer('cache_lookup'):
+                cache_key = self.gradient_cache.key(self.roads_file, self.dhm_processor.merged_dhm_path,
+                                                    sample_distance,
+                                                    smoothing and (self.smoothing_window, self.smoothing_order),
+                                                    max_gap)
+                cached = self.gradient_cache.load(cache_key, len(self.roads_gdf))
+            if cached is not None:
+                profiler.count('cache_hits')
+                with profiler.timer('apply_results'):
+                    self._apply_gradients(cached)
+                return self.roads_gdf
             
         logger.info("Calculating road gradients...")
         
-        # Create columns for gradient data
-        self.roads_gdf['elevation_profile'] = None
-        self.roads_gdf['avg_gradient'] = None
-        self.roads_gdf['max_gradient'] = None
-        self.roads_gdf['length_m'] = None
-        self.roads_gdf['elevation_gain'] = None
-        
-        # Process each road segment
-        for idx, row in self.roads_gdf.iterrows():
-            if idx % 100 == 0:
-                logger.info(f"Processing road segment {idx}/{len(self.roads_gdf)}")
-                
-            # Get the geometry
-            line = row.geometry
-            
-            # Calculate length in meters
-            length = line.length
-            self.roads_gdf.at[idx, 'length_m'] = length
+        # Bridges and tunnels get straight profiles between their ends
+        bridges, tunnels = structure_flags(self.roads_gdf)
+        structures = bridges | tunnels
+        profiler.count('bridges', int(bridges.sum()))
+        profiler.count('tunnels', int(tunnels.sum()))
+        
+        # Sample every road; gap filling, smoothing and gradients are then
+        # computed for all profiles at once
+        total = len(self.roads_gdf)
+        lengths = self.roads_gdf.geometry.length.to_numpy(dtype='float64')
+        counts = np.zeros(total, dtype='int64')
+        profile_distances, profile_elevations = [], []
+        for i, line in enumerate(self.roads_gdf.geometry.to_numpy()):
+            profiler.progress(i, total, 'roads')
             
             # Skip very short segments
-            if length < sample_distance * 2:
+            if lengths[i] < sample_distance * 2:
+                profiler.count('roads_skipped_short')
                 continue
                 
             # Sample elevations along the line
-            elevations = self.dhm_processor.sample_elevations_along_line(line, sample_distance)
+            with profiler.timer('interpolate_points'):
+                distances, xs, ys = sample_points_along_line(line, sample_distance)
+            with profiler.timer('dem_read'):
+                if structures[i]:
+                    values = self._straight_profile(distances, xs, ys, sample_distance)
+                else:
+                    values = self.dhm_processor.get_elevations(xs, ys, sample_distance)
+            counts[i] = len(values)
+            profile_distances.append(distances)
+            profile_elevations.append(values)
+        
+        profiler.progress(total, total, 'roads')
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        distances = np.concatenate(profile_distances) if profile_distances else np.empty(0)
+        elevations = np.concatenate(profile_elevations) if profile_elevations else np.empty(0)
+        profiler.count('samples_read', len(elevations))
+        kernels = self.kernels
+        
+        # Bridge short nodata gaps; roads with long ones are left out
+        sampled = counts > 0
+        with profiler.timer('fill_gaps'):
+            nodata = int(np.isnan(elevations).sum())
+            elevations, max_gaps, filled, usable = kernels.fill_gaps(offsets, distances, elevations, max_gap)
+        max_gaps[~sampled] = np.nan
+        if nodata:
+            profiler.count('nodata_samples', nodata)
+            profiler.count('nodata_samples_filled', int(filled.sum()))
+            profiler.count('roads_gap_filled', int((filled > 0).sum()))
+            profiler.count('roads_skipped_nodata', int((sampled & ~usable).sum()))
+        
+        if smoothing:
+            with profiler.timer('smoothing'):
+                elevations = kernels.smooth(offsets, elevations, self.smoothing_window, self.smoothing_order)
+        
+        with profiler.timer('gradients'):
+            avg_gradient, max_gradient, elevation_gain, gradient_count = kernels.statistics(
+                offsets, distances, elevations)
             
-            # Skip if we couldn't get valid elevation data
-            if not elevations or any(e is None for _, e in elevations):
-                continue
-                
-            # Extract distances and elevation values
-            distances = [d for d, _ in elevations]
-            elev_values = [e for _, e in elevations]
-            
-            # Apply smoothing if requested
-            if smoothing and len(elev_values) > 5:
-                try:
-                    # Use Savitzky-Golay filter for smoothing
-                    window_length = min(5, len(elev_values) - 2)
-                    if window_length % 2 == 0:  # Must be odd
-                        window_length += 1
-                    poly_order = min(2, window_length - 1)
-                    elev_values = savgol_filter(elev_values, window_length, poly_order)
-                except Exception as e:
-                    logger.warning(f"Smoothing failed for segment {idx}: {e}")
-            
-            # Calculate gradients between consecutive points
-            gradients = []
-            for i in range(1, len(distances)):
-                dist_diff = distances[i] - distances[i-1]
-                elev_diff = elev_values[i] - elev_values[i-1]
-                
-                if dist_diff > 0:
-                    gradient = (elev_diff / dist_diff) * 100  # Convert to percentage
-                    gradients.append(gradient)
-            
-            # Store elevation profile and gradient statistics
-            if gradients:
-                self.roads_gdf.at[idx, 'elevation_profile'] = list(zip(distances, elev_values))
-                self.roads_gdf.at[idx, 'avg_gradient'] = float(np.mean(np.abs(gradients)))
-                self.roads_gdf.at[idx, 'max_gradient'] = float(np.max(np.abs(gradients)))
-                
-                # Calculate total elevation gain (sum of all positive elevation changes)
-                elev_gain = sum(max(0, elev_values[i] - elev_values[i-1]) for i in range(1, len(elev_values)))
-                self.roads_gdf.at[idx, 'elevation_gain'] = float(elev_gain)
+            # Only usable roads with at least one gradient keep their profile
+            processed = usable & (gradient_count > 0)
+            if (processed != sampled).any():
+                keep = np.repeat(processed, counts)
+                distances, elevations = distances[keep], elevations[keep]
+                counts = np.where(processed, counts, 0)
+                offsets = np.concatenate([[0], np.cumsum(counts)])
+            avg_gradient[~processed] = np.nan
+            max_gradient[~processed] = np.nan
+            elevation_gain[~processed] = np.nan
+        profiler.count('roads_processed', int(processed.sum()))
         
         logger.info("Gradient calculation complete")
+        long_gaps = int((max_gaps > max_gap).sum())
+        if long_gaps:
+            logger.warning(f"{long_gaps} roads have nodata gaps longer than {max_gap:g} m and were left without gradients")
+        
+        # Keep the results for next time
+        arrays = {'length_m': lengths, 'avg_gradient': avg_gradient, 'max_gradient': max_gradient,
+                  'elevation_gain': elevation_gain, 'max_gap_m': max_gaps, 'profile_offsets': offsets,
+                  'profile_distances': distances, 'profile_elevations': elevations}
+        with profiler.timer('apply_results'):
+            self._apply_gradients(arrays)
+        if cache_key is not None:
+            with profiler.timer('cache_save'):
+                self.gradient_cache.save(cache_key, arrays)
+            
         return self.roads_gdf
     
-    def identify_hills(self, min_length=100, min_gradient=3.0, min_elevation_gain=10):
+    def _straight_profile(self, distances, xs, ys, sample_distance):
+        """
+        Elevations along a bridge or tunnel, interpolated between its ends.
+        
+        Only the two end points are read from the DHM. If either has no data
+        (e.g. a bridge ending over water) the whole profile is read and the
+        outermost valid samples are joined instead.
+        
+        Returns:
+            Array of elevations, all NaN when no sample has data
         """
-        Identify hill segments based on criteria.
+        ends = [0, len(distances) - 1]
+        elevations = self.dhm_processor.get_elevations(xs[ends], ys[ends], sample_distance)
+        if np.isnan(elevations).any():
+            values = self.dhm_processor.get_elevations(xs, ys, sample_distance)
+            valid = np.flatnonzero(~np.isnan(values))
+            if len(valid) == 0:
+                return values
+            ends = [valid[0], valid[-1]]
+            elevations = values[ends]
+        return np.interp(distances, distances[ends], elevations)
+    
+    def _gradient_arrays(self):
+        """Per-road gradient columns and packed profiles as NumPy arrays."""
+        arrays = {column: self.roads_gdf[column].to_numpy(dtype='float64', na_value=np.nan)
+                  for column in GRADIENT_COLUMNS}
+        offsets, distances, elevations = pack_profiles(self.roads_gdf['elevation_profile'])
+        arrays.update(profile_offsets=offsets, profile_distances=distances, profile_elevations=elevations)
+        return arrays
+    
+    def _apply_gradients(self, arrays):
+        """Set the gradient columns from arrays and store them on the road graph."""
+        for column in GRADIENT_COLUMNS:
+            self.roads_gdf[column] = arrays[column]
+        self.roads_gdf['elevation_profile'] = unpack_profiles(
+            arrays['profile_offsets'], arrays['profile_distances'], arrays['profile_elevations'])
+        
+        # Store per-way gradient attributes on the road graph for routing
+        if self.road_graph is not None:
+            offsets = arrays['profile_offsets']
+            has_profile = np.diff(offsets) > 0
+            elevations = arrays['profile_elevations']
+            start_elevation = np.full(len(has_profile), np.nan)
+            end_elevation = np.full(len(has_profile), np.nan)
+            start_elevation[has_profile] = elevations[offsets[:-1][has_profile]]
+            end_elevation[has_profile] = elevations[offsets[1:][has_profile] - 1]
+            attributes = {column: arrays[column] for column in GRADIENT_COLUMNS}
+            attributes.update(start_elevation=start_elevation, end_elevation=end_elevation)
+            
+            # Skip rewriting the saved graph when it already carries these values
+            current = self.road_graph.edge_attributes
+            if not all(name in current and np.array_equal(current[name], values, equal_nan=True)
+                       for name, values in attributes.items()):
+                self.road_graph.set_edge_attributes(**attributes)
+                self.road_graph.save(self.graph_file)
+    
+    def identify_hills(self, min_length=100, min_gradient=3.0, min_elevation_gain=10,
+                       category_method='gradient', category_thresholds=None):
+        """
+        Identify climbs based on criteria.
+        
+        Climbs are detected within the elevation profiles rather than per road,
+        so a short steep section of a long road is found on its own and a climb
+        split across connected ways is reported once. The sweep's climb
+        intervals are kept per minimum gradient, so calling this again with
+        other length, gain or category thresholds only builds the climbs that
+        pass them and re-runs the vectorized classification.
         
         Args:
             min_length: Minimum length in meters
             min_gradient: Minimum average gradient percentage
             min_elevation_gain: Minimum elevation gain in meters
+            category_method: 'gradient' or 'score' (FIETS-style climb score)
+            category_thresholds: Lower bounds of categories 3, 2, 1 and HC for
+                the chosen method; None uses the classifier defaults
             
         Returns:
-            GeoDataFrame containing only hill segments
+            GeoDataFrame with one row per climb
         """
         if self.roads_gdf is None or 'avg_gradient' not in self.roads_gdf.columns:
-            logger.warning("Road gradients have not been calculated yet")
+            logger.warning("Road gradients have not been calculated yet, loading them from the cache or the DHM")
             self.calculate_road_gradients()
             
         logger.info(f"Identifying hills with min_length={min_length}m, min_gradient={min_gradient}%, min_gain={min_elevation_gain}m")
         
-        # Filter for hill segments
-        hills_gdf = self.roads_gdf[
-            (self.roads_gdf['length_m'] >= min_length) & 
-            (self.roads_gdf['avg_gradient'] >= min_gradient) &
-            (self.roads_gdf['elevation_gain'] >= min_elevation_gain)
-        ].copy()
-        
-        # Categorize hills by difficulty (example categories)
-        def categorize_hill(row):
-            avg_grad = row['avg_gradient']
-            length = row['length_m']
-            
-            if avg_grad >= 10:
-                return "HC"  # Hors Categorie (very steep)
-            elif avg_grad >= 7:
-                return "1"   # Category 1
-            elif avg_grad >= 5:
-                return "2"   # Category 2
-            elif avg_grad >= 3:
-                return "3"   # Category 3
-            else:
-                return "4"   # Category 4
-                
-        hills_gdf['category'] = hills_gdf.apply(categorize_hill, axis=1)
+        # Find climbs inside each road's profile, following roads across ways.
+        # Only the sweep depends on the gradient, so its index intervals are
+        # cached; geometries and profiles are built for the climbs that pass
+        # the length and gain thresholds
+        detector = ClimbDetector(min_length=min_length, min_gradient=min_gradient,
+                                 min_elevation_gain=min_elevation_gain, kernels=self.kernels)
+        intervals = self._climb_candidates.get(min_gradient)
+        if intervals is None:
+            with self.profiler.timer('climb_detection'):
+                intervals = detector.find_intervals(self.roads_gdf, self.road_graph)
+            self.profiler.count('climb_candidates', len(intervals['start']))
+            self._climb_candidates[min_gradient] = intervals
+        with self.profiler.timer('climb_geometry'):
+            candidates = detector.build_climbs(self.roads_gdf, intervals)
+        
+        # Filter and categorize with vectorized column operations
+        classifier = HillClassifier(
+            min_length=min_length,
+            min_elevation_gain=min_elevation_gain,
+            method=category_method,
+            thresholds=category_thresholds
+        )
+        with self.profiler.timer('classification'):
+            hills_gdf = classifier.classify(candidates)
+        self.profiler.count('hills_identified', len(hills_gdf))
         
-        logger.info(f"Identified {len(hills_gdf)} hill segments")
+        logger.info(f"Identified {len(hills_gdf)} hills")
         return hills_gdf
     
+    def road_records(self):
+        """
+        Build rows for the Road table from the processed roads.
+        
+        Every road with a sampled profile becomes one row. The profile is
+        stored delta-encoded (profile_spacing, profile_start_dm and int16
+        decimetre steps in profile_deltas) and coordinates are WGS84.
+        source_key identifies the way across re-imports (see source_keys).
+        
+        Returns:
+            List of dictionaries keyed by Road column names
+        """
+        if self.roads_gdf is None or 'avg_gradient' not in self.roads_gdf.columns:
+            self.calculate_road_gradients()
+        roads = self.roads_gdf
+        arrays = self._gradient_arrays()
+        
+        offsets = arrays['profile_offsets']
+        distances, elevations = arrays['profile_distances'], arrays['profile_elevations']
+        counts = np.diff(offsets)
+        usable = counts >= 2
+        
+        # Per-road elevation range over the non-empty profiles, which are contiguous
+        non_empty = counts > 0
+        min_elevation = np.full(len(roads), np.nan)
+        max_elevation = np.full(len(roads), np.nan)
+        if non_empty.any():
+            min_elevation[non_empty] = np.minimum.reduceat(elevations, offsets[:-1][non_empty])
+            max_elevation[non_empty] = np.maximum.reduceat(elevations, offsets[:-1][non_empty])
+        spacing = np.full(len(roads), np.nan)
+        spacing[usable] = distances[offsets[:-1][usable] + 1] - distances[offsets[:-1][usable]]
+        
+        starts, deltas = encode_profiles(offsets, elevations)
+        
+        # Difficulty bands used by the search page
+        gradient = arrays['avg_gradient']
+        difficulty = np.select([gradient < 4, gradient < 8, gradient < 12], ['easy', 'moderate', 'challenging'],
+                               default='extreme')
+        
+        coords, owner = shapely.get_coordinates(roads.geometry.to_crs('EPSG:4326').values, return_index=True)
+        coord_offsets = np.searchsorted(owner, np.arange(len(roads) + 1))
+        coords = np.round(coords, 6)
+        
+        def column(name):
+            if name not in roads.columns:
+                return [None] * len(roads)
+            return [value if isinstance(value, str) else None for value in roads[name]]
+        
+        names, highways, surfaces = column('name'), column('highway'), column('surface')
+        maxspeeds = pd.to_numeric(roads['maxspeed'], errors='coerce').to_numpy() \
+            if 'maxspeed' in roads.columns else np.full(len(roads), np.nan)
+        coordinates_json = [json.dumps(coords[coord_offsets[i]:coord_offsets[i + 1]].tolist())
+                            for i in range(len(roads))]
+        keys = source_keys(roads, coordinates_json)
+        
+        records = []
+        for i in np.flatnonzero(usable).tolist():
+            records.append({
+                'source_key': keys[i],
+                'name': names[i],
+                'highway': highways[i] or 'unclassified',
+                'surface': surfaces[i],
+                'length_meters': float(arrays['length_m'][i]),
+                'min_elevation': float(min_elevation[i]),
+                'max_elevation': float(max_elevation[i]),
+                'gradient': float(gradient[i]),
+                'maxspeed': None if np.isnan(maxspeeds[i]) else int(maxspeeds[i]),
+                'coordinates_json': coordinates_json[i],
+                'profile_spacing': float(spacing[i]),
+                'profile_start_dm': starts[i],
+                'profile_deltas': deltas[i],
+                'difficulty': str(difficulty[i])
+            })
+            
+        logger.info(f"Prepared {len(records)} road records with elevation profiles")
+        return records
+    
     def save_processed_roads(self, output_file='data/processed_roads.geojson'):
         """Save the processed road data to a file."""
         if self.roads_gdf is None:
@@ -196,9 +532,15 @@ class RoadProcessor:
         
         return True
     
-    def save_hills(self, output_file='data/denmark_hills.geojson'):
-        """Save identified hills to a file."""
-        hills_gdf = self.identify_hills()
+    def save_hills(self, output_file='data/denmark_hills.geojson', **criteria):
+        """
+        Save identified hills to a file.
+        
+        Args:
+            output_file: Output GeoJSON path
+            **criteria: Thresholds passed on to identify_hills
+        """
+        hills_gdf = self.identify_hills(**criteria)
         
         if hills_gdf.empty:
             logger.warning("No hills identified to save")
@@ -0,0 +1,253 @@
+# backend/services/route_planner.py
+import heapq
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Supported routing modes
+ROUTE_MODES = ('shortest', 'flattest', 'hilliest')
+
+class RoutePlanner:
+    """Gradient-aware route search over the road graph."""
+
+    def __init__(self, road_graph, climb_penalty=25.0, climb_reward=8.0, reuse_penalty=5.0):
+        """
+        Initialize with a RoadGraph carrying gradient attributes.
+
+        Args:
+            road_graph: RoadGraph with length_m and, for gradient-aware modes,
+                elevation_gain, start_elevation and end_elevation edge attributes
+            climb_penalty: Meters of extra cost per meter climbed ('flattest')
+            climb_reward: Meters of cost saved per meter climbed ('hilliest')
+            reuse_penalty: Cost multiplier for edges already used on a loop's way out
+        """
+        self.graph = road_graph
+        self.climb_penalty = climb_penalty
+        self.climb_reward = climb_reward
+        self.reuse_penalty = reuse_penalty
+        self._slot_costs = {}
+
+        # Plain lists index much faster than NumPy arrays inside the search loop
+        self._indptr = road_graph.indptr.tolist()
+        self._indices = road_graph.indices.tolist()
+        self._node_x = road_graph.node_xy[:, 0].tolist()
+        self._node_y = road_graph.node_xy[:, 1].tolist()
+
+        # Length and climbing per CSR slot, in the slot's direction of travel
+        attributes = road_graph.edge_attributes
+        length = np.nan_to_num(attributes['length_m'])
+        gain = np.nan_to_num(attributes.get('elevation_gain', np.zeros(road_graph.edge_count)))
+        rise = np.nan_to_num(attributes.get('end_elevation', np.zeros(road_graph.edge_count))
+                             - attributes.get('start_elevation', np.zeros(road_graph.edge_count)))
+
+        edges, forward = road_graph.edge_index, road_graph.edge_forward
+        # Both CSR slots of every edge, one per direction of travel
+        self.edge_slots = np.argsort(edges, kind='stable').reshape(-1, 2)
+        self.slot_length = length[edges]
+        # Travelled backwards, the climbing is the forward descent: gain - rise
+        self.slot_gain = np.maximum(np.where(forward, gain[edges], gain[edges] - rise[edges]), 0)
+
+    def slot_costs(self, mode):
+        """Cost of every CSR slot for a routing mode, as a list."""
+        if mode not in ROUTE_MODES:
+            raise ValueError(f"Unknown routing mode: {mode}")
+        if mode not in self._slot_costs:
+            if mode == 'shortest':
+                costs = self.slot_length
+            elif mode == 'flattest':
+                costs = self.slot_length + self.climb_penalty * self.slot_gain
+            else:
+                # Reward climbing but keep costs positive for the search
+                costs = np.maximum(self.slot_length - self.climb_reward * self.slot_gain,
+                                   0.1 * self.slot_length)
+            self._slot_costs[mode] = costs.tolist()
+        return self._slot_costs[mode]
+
+    def _heuristic_scale(self, mode):
+        """Lower bound of cost per meter of straight-line distance."""
+        return 0.1 if mode == 'hilliest' else 1.0
+
+    def search(self, source, target=None, mode='shortest', costs=None, max_cost=None):
+        """
+        A* (or Dijkstra when target is None) with a binary heap over the CSR arrays.
+
+        Args:
+            source: Start node
+            target: Goal node, or None to explore the whole reachable graph
+            mode: Routing mode for the edge costs
+            costs: Optional slot cost list overriding the mode's costs
+            max_cost: Stop expanding beyond this cost (Dijkstra only)
+
+        Returns:
+            Tuple of (cost, previous) dicts, previous mapping node -> (node, slot)
+        """
+        costs = costs if costs is not None else self.slot_costs(mode)
+        indptr, indices = self._indptr, self._indices
+        node_x, node_y = self._node_x, self._node_y
+
+        if target is not None:
+            scale = self._heuristic_scale(mode)
+            tx, ty = node_x[target], node_y[target]
+
+            def heuristic(node):
+                return scale * ((node_x[node] - tx) ** 2 + (node_y[node] - ty) ** 2) ** 0.5
+        else:
+            def heuristic(node):
+                return 0.0
+
+        # Flat per-node lists; only reached nodes end up in the returned dicts
+        inf = float('inf')
+        best = [inf] * len(node_x)
+        best[source] = 0.0
+        reached = [source]
+        previous = {}
+        heap = [(heuristic(source), 0.0, source)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while heap:
+            _, g, node = heappop(heap)
+            if node == target:
+                break
+            if g > best[node]:
+                continue
+            if max_cost is not None and g > max_cost:
+                break
+            for slot in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[slot]
+                candidate = g + costs[slot]
+                if candidate < best[neighbour]:
+                    if best[neighbour] == inf:
+                        reached.append(neighbour)
+                    best[neighbour] = candidate
+                    previous[neighbour] = (node, slot)
+                    heappush(heap, (candidate + heuristic(neighbour), candidate, neighbour))
+        cost = {node: best[node] for node in reached}
+        return cost, previous
+
+    def route(self, source, target, mode='shortest'):
+        """
+        Find the best route between two nodes.
+
+        Returns:
+            Route summary dictionary (see summarise), or None if unreachable
+        """
+        _, previous = self.search(source, target, mode)
+        slots = _backtrack(previous, source, target)
+        if slots is None:
+            return None
+        return self.summarise(slots)
+
+    def loop(self, source, length_m, mode='hilliest', candidates=5):
+        """
+        Find a loop of roughly the given length starting and ending at a node.
+
+        The loop goes out along the best path to a turnaround node about half
+        the target length away and returns by the best path back, with edges
+        used on the way out penalised so the return takes different roads.
+
+        Args:
+            source: Start node
+            length_m: Target loop length in meters
+            mode: Routing mode
+            candidates: Number of turnaround nodes to try
+
+        Returns:
+            Route summary dictionary, or None if no loop was found
+        """
+        if not length_m > 0:
+            raise ValueError("Loop length must be positive")
+        costs = self.slot_costs(mode)
+        # Explore only as far as the cheapest plausible turnaround
+        cost, previous = self.search(source, None, mode, max_cost=0.6 * length_m)
+
+        # Real length and climbing of the tree path to every reached node
+        length = {source: 0.0}
+        gain = {source: 0.0}
+        for node in sorted(cost, key=cost.get):
+            if node in previous:
+                parent, slot = previous[node]
+                length[node] = length[parent] + self.slot_length[slot]
+                gain[node] = gain[parent] + self.slot_gain[slot]
+
+        turnarounds = [node for node in length if 0.35 * length_m <= length[node] <= 0.6 * length_m]
+        if not turnarounds:
+            return None
+        if mode == 'hilliest':
+            turnarounds.sort(key=lambda node: -gain[node])
+        elif mode == 'flattest':
+            turnarounds.sort(key=lambda node: gain[node] / max(length[node], 1.0))
+        else:
+            turnarounds.sort(key=lambda node: abs(length[node] - 0.5 * length_m))
+
+        best, best_score = None, None
+        return_costs = list(costs)
+        for node in turnarounds[:candidates]:
+            outbound = _backtrack(previous, source, node)
+
+            # Penalise the way out in both directions for the way back, then restore
+            used = self.edge_slots[self.graph.edge_index[outbound]].ravel().tolist()
+            for slot in used:
+                return_costs[slot] = costs[slot] * self.reuse_penalty
+            _, back_previous = self.search(node, source, mode, costs=return_costs)
+            for slot in used:
+                return_costs[slot] = costs[slot]
+            inbound = _backtrack(back_previous, node, source)
+            if inbound is None:
+                continue
+
+            summary = self.summarise(outbound + inbound)
+            length_error = abs(summary['length_m'] - length_m) / length_m
+            if mode == 'hilliest':
+                score = summary['elevation_gain'] * (1 - min(length_error, 1))
+            elif mode == 'flattest':
+                score = -summary['elevation_gain'] - length_error * length_m / 100
+            else:
+                score = -length_error
+            if best_score is None or score > best_score:
+                best, best_score = summary, score
+        return best
+
+    def summarise(self, slots):
+        """
+        Summarise a route given as CSR slots in travel order.
+
+        Returns:
+            Dictionary with length, climbing, road ids and the route coordinates
+        """
+        graph = self.graph
+        edges = graph.edge_index[slots]
+        forward = graph.edge_forward[slots]
+
+        coords = []
+        for edge, is_forward in zip(edges, forward):
+            line = graph.edge_line(edge, reverse=not is_forward)
+            coords.append(line if not coords else line[1:])
+
+        # None when no edge of the route has a known gradient (NaN is not valid JSON)
+        max_gradient = None
+        max_gradients = graph.edge_attributes.get('max_gradient')
+        if max_gradients is not None:
+            known = max_gradients[edges]
+            known = known[~np.isnan(known)]
+            if len(known):
+                max_gradient = float(known.max())
+        return {
+            'length_m': float(self.slot_length[slots].sum()),
+            'elevation_gain': float(self.slot_gain[slots].sum()),
+            'max_gradient': max_gradient,
+            'road_ids': [str(label) for label in graph.edge_labels[edges]],
+            'coordinates': np.concatenate(coords) if coords else np.empty((0, 2))
+        }
+
+
+def _backtrack(previous, source, target):
+    """Slots from source to target following the search's previous pointers."""
+    if target != source and target not in previous:
+        return None
+    slots = []
+    node = target
+    while node != source:
+        node, slot = previous[node]
+        slots.append(slot)
+    return slots[::-1]
@@ -0,0 +1,135 @@
+# backend/services/route_profiler.py
+import numpy as np
+import logging
+
+from .climb_detector import ClimbDetector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RouteProfiler:
+    """Builds elevation/gradient profiles for arbitrary routes on the fly."""
+
+    def __init__(self, elevation_service, sample_distance=10, max_samples=20000,
+                 smoothing_window=5, climb_min_gradient=3.0, climb_min_length=100,
+                 climb_min_elevation_gain=10):
+        """
+        Initialize with an elevation service and profile settings.
+
+        Args:
+            elevation_service: ElevationService used for DHM lookups
+            sample_distance: Default distance between samples in meters
+            max_samples: Upper bound on samples per route; the sample distance
+                is widened for routes that would exceed it
+            smoothing_window: Moving average window (samples) applied to elevations
+            climb_min_gradient: Minimum average gradient (%) of a reported climb
+            climb_min_length: Minimum length (m) of a reported climb
+            climb_min_elevation_gain: Minimum elevation gain (m) of a reported climb
+        """
+        self.elevation_service = elevation_service
+        self.sample_distance = sample_distance
+        self.max_samples = max_samples
+        self.smoothing_window = smoothing_window
+        self.climb_detector = ClimbDetector(
+            min_length=climb_min_length,
+            min_gradient=climb_min_gradient,
+            min_elevation_gain=climb_min_elevation_gain
+        )
+
+    def profile(self, xs, ys, crs=None, sample_distance=None):
+        """
+        Compute the profile of a route.
+
+        Args:
+            xs, ys: Route vertices
+            crs: CRS of the vertices; None means the DHM CRS
+            sample_distance: Distance between samples in meters
+
+        Returns:
+            Dictionary with 'summary', 'profile' (column arrays of distance,
+            elevation and gradient) and 'climbs', or None when the route has
+            no elevation data at all
+        """
+        xs, ys = self.elevation_service.to_dhm_crs(xs, ys, crs)
+        if len(xs) < 2:
+            raise ValueError("A route needs at least two points")
+
+        # Cumulative distance along the vertices
+        cumulative = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(xs), np.diff(ys)))])
+        total_length = float(cumulative[-1])
+        if total_length <= 0:
+            raise ValueError("Route has zero length")
+
+        # Widen the spacing for very long routes to bound the work per request
+        sample_distance = sample_distance or self.sample_distance
+        sample_distance = max(sample_distance, total_length / self.max_samples)
+
+        # Evenly spaced sample positions from start to end point; the spacing is
+        # at most sample_distance, so no short last step inflates its gradient
+        steps = int(np.ceil(total_length / sample_distance))
+        distances = np.linspace(0, total_length, steps + 1)
+        sample_distance = total_length / steps
+        sample_xs = np.interp(distances, cumulative, xs)
+        sample_ys = np.interp(distances, cumulative, ys)
+
+        elevations = self.elevation_service.get_elevations(sample_xs, sample_ys,
+                                                           sample_distance=sample_distance)
+
+        # Fill missing samples from their neighbours
+        valid = ~np.isnan(elevations)
+        if not valid.any():
+            return None
+        if not valid.all():
+            elevations = np.interp(distances, distances[valid], elevations[valid])
+
+        if self.smoothing_window > 1 and len(elevations) > self.smoothing_window:
+            elevations = _moving_average(elevations, self.smoothing_window)
+
+        gradients = np.diff(elevations) / np.diff(distances) * 100
+        climbs = self._find_climbs(distances, elevations, gradients)
+        deltas = np.diff(elevations)
+
+        return {
+            'summary': {
+                'length_m': round(total_length, 1),
+                'sample_distance': round(float(sample_distance), 2),
+                'elevation_gain': round(float(deltas[deltas > 0].sum()), 1),
+                'elevation_loss': round(float(-deltas[deltas < 0].sum()), 1),
+                'min_elevation': round(float(elevations.min()), 1),
+                'max_elevation': round(float(elevations.max()), 1),
+                'max_gradient': round(float(gradients.max()), 1),
+                'min_gradient': round(float(gradients.min()), 1),
+                'missing_samples': int((~valid).sum()),
+                'climb_count': len(climbs)
+            },
+            'profile': {
+                'distance': np.round(distances, 1).tolist(),
+                'elevation': np.round(elevations, 1).tolist(),
+                # Gradient of the step ending at each sample
+                'gradient': np.round(np.concatenate([[0.0], gradients]), 1).tolist()
+            },
+            'climbs': climbs
+        }
+
+    def _find_climbs(self, distances, elevations, gradients):
+        """Find climbs along the route with the climb detector's sweep."""
+        climbs = []
+        for start, end in self.climb_detector.find_climbs(distances, elevations):
+            length = distances[end] - distances[start]
+            gain = elevations[end] - elevations[start]
+            climbs.append({
+                'start_distance': round(float(distances[start]), 1),
+                'end_distance': round(float(distances[end]), 1),
+                'length_m': round(float(length), 1),
+                'elevation_gain': round(float(gain), 1),
+                'avg_gradient': round(float(gain / length * 100), 1),
+                'max_gradient': round(float(gradients[start:end].max()), 1)
+            })
+        return climbs
+
+
+def _moving_average(values, window):
+    """Centered moving average with edge values repeated at both ends."""
+    half = window // 2
+    padded = np.pad(values, (half, window - 1 - half), mode='edge')
+    return np.convolve(padded, np.ones(window) / window, mode='valid')
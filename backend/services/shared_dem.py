@@ -0,0 +1,259 @@
+# backend/services/shared_dem.py
+"""
+The decoded merged DHM in shared memory, for many worker processes.
+
+One process publishes the DHM and its overview levels into a single
+multiprocessing.shared_memory block; workers attach to it by name and read
+elevations from zero-copy NumPy views instead of each opening the GeoTIFF
+and caching its own blocks. The block stays alive as long as its publisher
+(or until it is unlinked), so a publisher can run next to a pool of web
+workers:
+
+    python -m backend.services.shared_dem data/merged_dhm.tif --name hill-dem
+    DHM_SHARED_MEMORY=hill-dem gunicorn -w 16 app:app
+"""
+import sys
+import json
+import time
+import signal
+import threading
+import argparse
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import MaskFlags
+from rasterio.transform import Affine
+from multiprocessing import shared_memory, resource_tracker
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Layout: header length (8 bytes), JSON header, then the level arrays at aligned offsets
+HEADER_LENGTH_BYTES = 8
+ALIGNMENT = 64
+LAYOUT_VERSION = 1
+
+# Rows read from the GeoTIFF at a time while publishing
+PUBLISH_BLOCK_ROWS = 1024
+
+# Serializes the resource tracker workaround in _attach_untracked
+_attach_lock = threading.Lock()
+
+class SharedDEM:
+    """Elevation lookups from a DHM published in shared memory."""
+
+    def __init__(self, shm, header, owner=False):
+        """
+        Wrap an open shared memory block; use publish() or attach() instead.
+
+        Args:
+            shm: SharedMemory holding the header and level arrays
+            header: Decoded layout header
+            owner: Whether close() also unlinks the block
+        """
+        self.shm = shm
+        self.header = header
+        self.owner = owner
+        self.nodata = header['nodata']
+        self.levels = []
+        for level in header['levels']:
+            array = np.ndarray(level['shape'], dtype=header['dtype'], buffer=shm.buf, offset=level['offset'])
+            array.flags.writeable = False
+            self.levels.append((array, Affine(*level['transform']), level['factor']))
+
+    @property
+    def name(self):
+        """Name other processes attach with."""
+        return self.shm.name
+
+    @property
+    def crs(self):
+        """CRS of the DHM."""
+        return CRS.from_wkt(self.header['crs'])
+
+    @property
+    def nbytes(self):
+        """Size of the shared block in bytes."""
+        return self.shm.size
+
+    @classmethod
+    def publish(cls, path, name=None):
+        """
+        Decode a DHM GeoTIFF and its overviews into a new shared memory block.
+
+        Pixels masked by an internal mask are stored as the nodata value, so
+        lookups match DHMProcessor's reads of the file.
+
+        Args:
+            path: Merged DHM GeoTIFF
+            name: Name of the block; None lets the system choose one
+
+        Returns:
+            SharedDEM owning the block
+        """
+        with rasterio.open(path) as src:
+            flags = src.mask_flag_enums[0]
+            masked = MaskFlags.per_dataset in flags or MaskFlags.alpha in flags
+            dtype = np.dtype(src.dtypes[0])
+            nodata = src.nodata
+            if masked and nodata is None:
+                nodata = float('nan') if dtype.kind == 'f' else None
+            levels = [{'shape': [src.height, src.width], 'transform': list(src.transform)[:6], 'factor': 1}]
+            for i, factor in enumerate(src.overviews(1)):
+                with rasterio.open(path, overview_level=i) as overview:
+                    levels.append({'shape': [overview.height, overview.width],
+                                   'transform': list(overview.transform)[:6], 'factor': factor})
+            header = {'version': LAYOUT_VERSION, 'dtype': dtype.str, 'crs': src.crs.to_wkt(),
+                      'nodata': nodata, 'source': path, 'levels': levels}
+
+        # Reserve room for the header, then place each level after it
+        offset = _align(HEADER_LENGTH_BYTES + len(json.dumps(header)) + 64 * len(levels) + 64)
+        for level in levels:
+            level['offset'] = offset
+            offset = _align(offset + int(np.prod(level['shape'])) * dtype.itemsize)
+        encoded = json.dumps(header).encode()
+        if HEADER_LENGTH_BYTES + len(encoded) > levels[0]['offset']:
+            raise ValueError("Shared DHM header does not fit its reserved space")
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=offset)
+        try:
+            shm.buf[:HEADER_LENGTH_BYTES] = len(encoded).to_bytes(HEADER_LENGTH_BYTES, 'little')
+            shm.buf[HEADER_LENGTH_BYTES:HEADER_LENGTH_BYTES + len(encoded)] = encoded
+            for i, level in enumerate(levels):
+                # Level 0 is the full resolution, level i the file's overview i - 1
+                with rasterio.open(path, **({'overview_level': i - 1} if i else {})) as src:
+                    _read_into(src, shm.buf, level, dtype, masked, nodata)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        dem = cls(shm, header, owner=True)
+        logger.info(f"Published DHM {path} to shared memory '{dem.name}' "
+                    f"({dem.nbytes / 1e6:.1f} MB, {len(levels)} levels)")
+        return dem
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a DHM published by another process.
+
+        Raises:
+            FileNotFoundError: If no block with that name exists
+        """
+        shm = _attach_untracked(name)
+        size = int.from_bytes(bytes(shm.buf[:HEADER_LENGTH_BYTES]), 'little')
+        header = json.loads(bytes(shm.buf[HEADER_LENGTH_BYTES:HEADER_LENGTH_BYTES + size]))
+        if header.get('version') != LAYOUT_VERSION:
+            shm.close()
+            raise ValueError(f"Unsupported shared DHM layout version: {header.get('version')}")
+        return cls(shm, header)
+
+    def level_for_spacing(self, sample_distance):
+        """
+        Index of the coarsest level that still resolves the sample spacing.
+
+        Uses the same rule as DHMProcessor.get_dataset_for_spacing, so shared
+        and file lookups read the same pixels.
+        """
+        if sample_distance is None:
+            return 0
+        base_resolution = abs(self.levels[0][1].a)
+        level = 0
+        for i, (_, _, factor) in enumerate(self.levels[1:], start=1):
+            if base_resolution * factor <= sample_distance / 2:
+                level = i
+        return level
+
+    def get_elevations(self, xs, ys, sample_distance=None):
+        """
+        Get elevations for many coordinates.
+
+        Args:
+            xs, ys: Coordinates in the DHM CRS
+            sample_distance: Spacing of the coordinates in meters, used to read
+                from a coarser level; None reads full resolution
+
+        Returns:
+            Float64 array of elevations, NaN outside the DHM or where it has no data
+        """
+        array, transform, _ = self.levels[self.level_for_spacing(sample_distance)]
+        xs = np.asarray(xs, dtype='float64')
+        ys = np.asarray(ys, dtype='float64')
+        inverse = ~transform
+        cols = np.floor(inverse.a * xs + inverse.b * ys + inverse.c).astype('int64')
+        rows = np.floor(inverse.d * xs + inverse.e * ys + inverse.f).astype('int64')
+        inside = (rows >= 0) & (rows < array.shape[0]) & (cols >= 0) & (cols < array.shape[1])
+
+        values = np.full(xs.shape, np.nan)
+        values[inside] = array[rows[inside], cols[inside]]
+        if self.nodata is not None:
+            values[values == self.nodata] = np.nan
+        return values
+
+    def close(self):
+        """Detach from the block, and remove it if this process published it."""
+        self.levels = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _read_into(src, buffer, level, dtype, masked, nodata):
+    """Read band 1 of src into its level's place in buffer in row blocks, writing nodata where it is masked."""
+    array = np.ndarray(level['shape'], dtype=dtype, buffer=buffer, offset=level['offset'])
+    for row in range(0, src.height, PUBLISH_BLOCK_ROWS):
+        window = ((row, min(row + PUBLISH_BLOCK_ROWS, src.height)), (0, src.width))
+        if masked:
+            data = src.read(1, window=window, masked=True)
+            array[window[0][0]:window[0][1]] = data.filled(nodata) if nodata is not None else data.data
+        else:
+            src.read(1, window=window, out=array[window[0][0]:window[0][1]])
+
+def _attach_untracked(name):
+    """
+    Open an existing block without registering it with the resource tracker.
+
+    Before Python 3.13 every process that opens a block registers it, and the
+    tracker removes it when that process exits, pulling the DHM away from
+    all other workers. Unregistering afterwards is not enough, as spawned
+    workers share their parent's tracker, so registration is skipped.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def main():
+    """Publish a DHM and keep it available until interrupted."""
+    parser = argparse.ArgumentParser(description='Publish the merged DHM into shared memory for worker processes.')
+    parser.add_argument('path', nargs='?', default='data/merged_dhm.tif', help='Merged DHM GeoTIFF')
+    parser.add_argument('--name', default='hill-dem', help='Shared memory name workers attach with')
+    args = parser.parse_args()
+
+    dem = SharedDEM.publish(args.path, args.name)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        logger.info(f"Serving shared DHM '{dem.name}'; set DHM_SHARED_MEMORY={dem.name} for the workers")
+        while True:
+            time.sleep(3600)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        dem.close()
+        logger.info(f"Removed shared DHM '{args.name}'")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
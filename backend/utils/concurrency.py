@@ -0,0 +1,131 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class CoalescingExecutor:
+    """
+    Bounded thread pool for blocking work (DEM and database reads) behind async views.
+
+    Calls submitted with the same key while an earlier one is still running
+    share its result instead of running again, so a burst of identical
+    requests costs one read. A key of None is never coalesced.
+    """
+
+    def __init__(self, max_workers=4, thread_name_prefix='io'):
+        """Initialize with the number of worker threads."""
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def submit(self, key, function, *args, **kwargs):
+        """
+        Run function(*args, **kwargs) on the pool.
+
+        Returns:
+            concurrent.futures.Future, shared with any running call of the same key
+        """
+        if key is None:
+            return self._executor.submit(function, *args, **kwargs)
+        with self._lock:
+            future = self._running.get(key)
+            if future is not None:
+                return future
+            future = self._running[key] = self._executor.submit(function, *args, **kwargs)
+        # Outside the lock: the callback runs right away if the call has already finished
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    async def run(self, key, function, *args, **kwargs):
+        """Await function(*args, **kwargs) on the pool; see submit."""
+        return await asyncio.wrap_future(self.submit(key, function, *args, **kwargs))
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._running.get(key) is future:
+                del self._running[key]
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+
+class RequestBatcher:
+    """
+    Merges concurrent requests into batched calls on a CoalescingExecutor.
+
+    Requests queue up while the pool is busy; each worker takes everything
+    queued and passes it to one call of handle_batch, so a burst of small
+    lookups turns into a few large ones.
+    """
+
+    def __init__(self, handle_batch, executor):
+        """
+        Initialize with the batch handler and the pool to run it on.
+
+        Args:
+            handle_batch: Called with a list of request payloads; returns one
+                result per payload, in order. A result that is an exception is
+                raised for its payload only; an exception raised by
+                handle_batch itself fails the whole batch
+            executor: CoalescingExecutor whose workers run the batches
+        """
+        self.handle_batch = handle_batch
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._pending = []
+        self._workers = 0
+
+    def submit(self, payload):
+        """Queue a request; returns a Future for its result."""
+        future = Future()
+        with self._lock:
+            self._pending.append((payload, future))
+            if self._workers < self.executor.max_workers:
+                self._workers += 1
+                self.executor.submit(None, self._drain)
+        return future
+
+    async def run(self, payload):
+        """Await the result of a request; see submit."""
+        return await asyncio.wrap_future(self.submit(payload))
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._workers -= 1
+                    return
+            # Requests cancelled while queued are dropped
+            batch = [(payload, future) for payload, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.handle_batch([payload for payload, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+
+# One pool per name and worker process; threads do not survive a fork
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(name, max_workers=4):
+    """Get the named CoalescingExecutor for this worker process, creating it on first use."""
+    key = (os.getpid(), name)
+    executor = _executors.get(key)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(key)
+            if executor is None:
+                executor = _executors[key] = CoalescingExecutor(max_workers, thread_name_prefix=name)
+    return executor
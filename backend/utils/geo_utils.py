@@ -1,15 +1,16 @@
 import rasterio
 import numpy as np
+from scipy.signal import savgol_coeffs
 from shapely.geometry import Point, LineString
 
 def get_elevation(dem, x, y):
-    """Get elevation for a point, handling no-data values"""
+    """Get elevation for a point, or None where the DEM's declared nodata mask applies"""
     try:
-        val = next(dem.sample([(x, y)]))[0]
-        if val == -9999.0:
+        val = next(dem.sample([(x, y)], masked=True))[0]
+        if np.ma.is_masked(val) or np.isnan(val):
             return None
-        return val
-    except:
+        return float(val)
+    except Exception:
         return None
 
 def calculate_segment_gradient(line_geometry, dem):
@@ -21,4 +22,230 @@ def calculate_segment_gradient(line_geometry, dem):
              for i in range(num_points + 1)]
     
     elevations = []
-    valid_points = []
\ No newline at end of file
+    valid_points = []
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decode an encoded polyline (Google polyline algorithm) to coordinates.
+    
+    Args:
+        encoded: Encoded polyline string
+        precision: Number of decimals encoded (5 for Google, 6 for OSRM/Valhalla)
+        
+    Returns:
+        Tuple of (lons, lats) NumPy arrays
+    """
+    values = []
+    result = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        result |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            result = shift = 0
+            
+    if len(values) % 2:
+        raise ValueError("Invalid encoded polyline")
+        
+    # Values are deltas of (lat, lon) pairs
+    coords = np.cumsum(np.array(values, dtype='int64').reshape(-1, 2), axis=0) / 10 ** precision
+    return coords[:, 1], coords[:, 0]
+
+def encode_profiles(offsets, elevations):
+    """
+    Delta-encode elevation profiles as little-endian int16 decimetre steps.
+    
+    Args:
+        offsets: Start of each profile in elevations (n_profiles + 1 entries)
+        elevations: Elevations in meters of all profiles, concatenated
+        
+    Returns:
+        Tuple of (start_decimetres, deltas) lists; start_decimetres holds each
+        profile's first elevation in decimetres (None for empty profiles) and
+        deltas the bytes of the remaining steps
+    """
+    offsets = np.asarray(offsets, dtype='int64')
+    # Round the absolute values so rounding errors never accumulate
+    decimetres = np.rint(np.asarray(elevations, dtype='float64') * 10).astype('int64')
+    steps = np.diff(decimetres)
+    
+    starts, deltas = [], []
+    for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        if end <= start:
+            starts.append(None)
+            deltas.append(None)
+            continue
+        profile_steps = steps[start:end - 1]
+        if len(profile_steps) and np.abs(profile_steps).max() > np.iinfo('int16').max:
+            raise ValueError("Elevation step too large for int16 decimetre encoding")
+        starts.append(int(decimetres[start]))
+        deltas.append(profile_steps.astype('<i2').tobytes())
+    return starts, deltas
+
+def encode_profile(elevations):
+    """Delta-encode a single profile; returns (start_decimetres, deltas)."""
+    starts, deltas = encode_profiles([0, len(elevations)], elevations)
+    return starts[0], deltas[0]
+
+def fill_profile_gaps(distances, elevations, max_gap):
+    """
+    Interpolate missing elevations (NaN) along a profile.
+    
+    Each run of missing samples is filled linearly between the valid samples
+    around it; runs at either end take the nearest valid elevation. Gaps are
+    measured in meters along the profile, between the valid samples that
+    bound them.
+    
+    Args:
+        distances: Sample distances along the line in meters
+        elevations: Elevations with NaN where there is no data
+        max_gap: Longest gap in meters that is filled
+        
+    Returns:
+        Tuple of (elevations, longest gap in meters, filled sample count).
+        elevations is None when fewer than two samples are valid or a gap is
+        longer than max_gap; otherwise it is a filled copy (or the input
+        itself when nothing is missing)
+    """
+    distances = np.asarray(distances, dtype='float64')
+    elevations = np.asarray(elevations, dtype='float64')
+    missing = np.isnan(elevations)
+    if not missing.any():
+        return elevations, 0.0, 0
+    if len(elevations) - missing.sum() < 2:
+        return None, float(distances[-1] - distances[0]) if len(distances) else 0.0, 0
+    
+    # Runs of missing samples as [start, end) index ranges
+    edges = np.diff(np.concatenate([[0], missing.view(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    last = len(elevations) - 1
+    gaps = distances[np.minimum(ends, last)] - distances[np.maximum(starts - 1, 0)]
+    longest = float(gaps.max())
+    if longest > max_gap:
+        return None, longest, 0
+    
+    valid = ~missing
+    filled = np.interp(distances, distances[valid], elevations[valid])
+    return filled, longest, int(missing.sum())
+
+def smooth_profiles(offsets, elevations, window=5, polyorder=2):
+    """
+    Savitzky-Golay smoothing of concatenated profiles in one pass.
+    
+    Interior samples are a single convolution over all profiles; the first
+    and last window // 2 samples of each profile are evaluated from a
+    polynomial fitted to its first or last window samples, as scipy's
+    savgol_filter does in 'interp' mode. Profiles with window samples or
+    fewer are left as they are.
+    
+    Args:
+        offsets: Start of each profile in elevations (n_profiles + 1 entries)
+        elevations: Elevations of all profiles, concatenated
+        window: Odd number of samples in the filter window
+        polyorder: Order of the fitted polynomial, less than window
+        
+    Returns:
+        Smoothed copy of elevations
+    """
+    if window % 2 == 0 or polyorder >= window:
+        raise ValueError(f"Invalid smoothing window {window} for polynomial order {polyorder}")
+    offsets = np.asarray(offsets, dtype='int64')
+    elevations = np.asarray(elevations, dtype='float64')
+    smoothed = elevations.copy()
+    counts = np.diff(offsets)
+    starts = offsets[:-1][counts > window]
+    ends = offsets[1:][counts > window]
+    if not len(starts):
+        return smoothed
+    half = window // 2
+    
+    # Interior samples: windows that lie within one profile
+    convolved = np.convolve(elevations, savgol_coeffs(window, polyorder), mode='same')
+    interior = np.zeros(len(elevations) + 1, dtype='int64')
+    np.add.at(interior, starts + half, 1)
+    np.add.at(interior, ends - half, -1)
+    interior = np.cumsum(interior[:-1]) > 0
+    smoothed[interior] = convolved[interior]
+    
+    # Edge samples: polynomial fits over each profile's first and last window
+    steps = np.arange(window)
+    head = np.array([savgol_coeffs(window, polyorder, pos=i, use='dot') for i in range(half)])
+    tail = np.array([savgol_coeffs(window, polyorder, pos=window - half + i, use='dot') for i in range(half)])
+    smoothed[starts[:, None] + steps[:half]] = elevations[starts[:, None] + steps] @ head.T
+    smoothed[ends[:, None] - half + steps[:half]] = elevations[ends[:, None] - window + steps] @ tail.T
+    return smoothed
+
+def profile_statistics(offsets, distances, elevations):
+    """
+    Gradient statistics of concatenated profiles without a per-profile loop.
+    
+    Gradients are taken between consecutive samples of a profile that are a
+    positive distance apart; elevation gain sums all rises along a profile.
+    
+    Args:
+        offsets: Start of each profile in the sample arrays (n_profiles + 1 entries)
+        distances: Sample distances along each profile in meters, concatenated
+        elevations: Elevations in meters, concatenated
+        
+    Returns:
+        Tuple of per-profile arrays (avg_gradient, max_gradient, elevation_gain,
+        gradient_count); gradients are absolute percentages and are NaN for
+        profiles without any gradient
+    """
+    offsets = np.asarray(offsets, dtype='int64')
+    counts = np.diff(offsets)
+    profiles = len(counts)
+    samples = int(offsets[-1])
+    avg_gradient = np.full(profiles, np.nan)
+    max_gradient = np.full(profiles, np.nan)
+    elevation_gain = np.zeros(profiles)
+    gradient_count = np.zeros(profiles, dtype='int64')
+    if samples < 2:
+        return avg_gradient, max_gradient, elevation_gain, gradient_count
+    
+    distance_steps = np.diff(np.asarray(distances, dtype='float64'))
+    elevation_steps = np.diff(np.asarray(elevations, dtype='float64'))
+    
+    # Steps from one profile's last sample to the next profile's first are not steps
+    within = np.ones(samples - 1, dtype=bool)
+    boundaries = offsets[1:-1]
+    within[boundaries[(boundaries > 0) & (boundaries < samples)] - 1] = False
+    valid = within & (distance_steps > 0)
+    gradients = np.zeros(samples - 1)
+    np.divide(elevation_steps, distance_steps, out=gradients, where=valid)
+    gradients = np.abs(gradients) * 100
+    rises = np.where(within, np.maximum(elevation_steps, 0), 0.0)
+    
+    # Sum per profile; steps are padded to one per sample so every start indexes them
+    nonempty = counts > 0
+    starts = offsets[:-1][nonempty]
+    gradients = np.append(np.where(valid, gradients, 0.0), 0.0)
+    gradient_count[nonempty] = np.add.reduceat(np.append(valid, False).astype('int64'), starts)
+    gradient_sum = np.add.reduceat(gradients, starts)
+    gradient_max = np.maximum.reduceat(gradients, starts)
+    elevation_gain[nonempty] = np.add.reduceat(np.append(rises, 0.0), starts)
+    
+    has_gradients = gradient_count > 0
+    avg_gradient[has_gradients] = gradient_sum[has_gradients[nonempty]] / gradient_count[has_gradients]
+    max_gradient[has_gradients] = gradient_max[has_gradients[nonempty]]
+    return avg_gradient, max_gradient, elevation_gain, gradient_count
+
+def decode_profile(start_decimetres, deltas, spacing):
+    """
+    Decode a profile encoded with encode_profile.
+    
+    Args:
+        start_decimetres: First elevation in decimetres
+        deltas: Bytes of little-endian int16 decimetre steps
+        spacing: Distance between samples in meters
+        
+    Returns:
+        Tuple of (distances, elevations) NumPy arrays in meters
+    """
+    decimetres = np.empty(len(deltas) // 2 + 1, dtype='int64')
+    decimetres[0] = start_decimetres
+    np.cumsum(np.frombuffer(deltas, dtype='<i2'), dtype='int64', out=decimetres[1:])
+    decimetres[1:] += start_decimetres
+    return np.arange(len(decimetres)) * float(spacing), decimetres / 10.0
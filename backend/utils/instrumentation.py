@@ -0,0 +1,337 @@
+import re
+import sqlite3
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+
+# Upper bounds of the request duration histogram buckets in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timing names recorded for database work; everything else is a request phase
+DATABASE_TIMINGS = ('db', 'hill_db')
+
+METRIC_PREFIX = 'hill_analyzer'
+
+# Timings collected outside a request, e.g. by work offloaded to a thread pool
+_collected_timings = contextvars.ContextVar('collected_timings', default=None)
+
+def current_timings():
+    """Timings of the current request (or collect_timings block) as name -> [count, seconds], or None."""
+    if not has_request_context():
+        return _collected_timings.get()
+    return g.get('_timings')
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the timings recorded in a with block that runs outside a request.
+
+    Work offloaded to another thread has no request context; it collects its
+    timings into the yielded dict, which the request adds with merge_timings.
+    """
+    timings = {}
+    token = _collected_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected_timings.reset(token)
+
+def merge_timings(timings):
+    """Add timings collected with collect_timings to the current request's."""
+    for name, (count, seconds) in timings.items():
+        record(name, seconds, count)
+
+def record(name, seconds, count=1, timings=None):
+    """
+    Add a timed operation to the current request's timings.
+
+    Args:
+        name: Timing name, e.g. 'db' or 'serialize'
+        seconds: Time taken
+        count: Number of operations (0 adds time only, e.g. for fetches)
+        timings: Timings dict to record into; defaults to the current request's
+    """
+    if timings is None:
+        timings = current_timings()
+    if timings is None:
+        return
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [count, seconds]
+    else:
+        entry[0] += count
+        entry[1] += seconds
+
+@contextmanager
+def timer(name):
+    """Record the time spent in a with block under name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timed_map(name, function, items):
+    """
+    Lazily apply function to items, recording the total time under name.
+
+    Meant for streamed responses: the time is recorded once when the
+    generator finishes or is closed, into the request that created it.
+    """
+    timings = current_timings()
+
+    def generate():
+        total, count = 0.0, 0
+        try:
+            for item in items:
+                start = time.perf_counter()
+                result = function(item)
+                total += time.perf_counter() - start
+                count += 1
+                yield result
+        finally:
+            record(name, total, count, timings)
+
+    return generate()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """sqlite3 cursor recording statement and fetch times in the request timings."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record(self.connection.timing_name, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record(self.connection.timing_name, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record(self.connection.timing_name, time.perf_counter() - start, count=0)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            record(self.connection.timing_name, time.perf_counter() - start, count=0)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record(self.connection.timing_name, time.perf_counter() - start, count=0)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are TimedCursors."""
+
+    timing_name = 'sqlite'
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TimedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connect_sqlite(path, timing_name='sqlite'):
+    """Open a sqlite3 connection whose queries are recorded under timing_name."""
+    conn = sqlite3.connect(path, factory=TimedConnection)
+    conn.timing_name = timing_name
+    return conn
+
+def instrument_engine(engine, timing_name='db'):
+    """Record the statements of a SQLAlchemy engine under timing_name."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record(timing_name, time.perf_counter() - conn.info['_query_start'].pop())
+
+
+class Metrics:
+    """Thread-safe per-process request metrics rendered in the Prometheus text format."""
+
+    def __init__(self, prefix=METRIC_PREFIX, buckets=DURATION_BUCKETS):
+        """Initialize empty metrics with a metric name prefix and histogram buckets."""
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests = {}        # (method, endpoint, status) -> count
+        self._durations = {}       # (method, endpoint) -> [bucket counts..., count, sum]
+        self._response_bytes = {}  # endpoint -> bytes
+        self._queries = {}         # (endpoint, database) -> [count, seconds]
+        self._phases = {}          # (endpoint, phase) -> seconds
+
+    def observe(self, method, endpoint, status, seconds, size, timings):
+        """Record one finished request."""
+        with self._lock:
+            key = (method, endpoint, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            histogram = self._durations.setdefault((method, endpoint), [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+            self._response_bytes[endpoint] = self._response_bytes.get(endpoint, 0) + size
+            for name, (count, total) in timings.items():
+                if name in DATABASE_TIMINGS:
+                    entry = self._queries.setdefault((endpoint, name), [0, 0.0])
+                    entry[0] += count
+                    entry[1] += total
+                else:
+                    self._phases[(endpoint, name)] = self._phases.get((endpoint, name), 0.0) + total
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines += [f'# HELP {p}_http_requests_total Requests handled.',
+                      f'# TYPE {p}_http_requests_total counter']
+            for (method, endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{p}_http_requests_total{_labels(method=method, endpoint=endpoint, status=status)} {count}')
+
+            lines += [f'# HELP {p}_http_request_duration_seconds Request wall time including streaming.',
+                      f'# TYPE {p}_http_request_duration_seconds histogram']
+            for (method, endpoint), histogram in sorted(self._durations.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    labels = _labels(method=method, endpoint=endpoint, le=f'{bound:g}')
+                    lines.append(f'{p}_http_request_duration_seconds_bucket{labels} {count}')
+                labels = _labels(method=method, endpoint=endpoint)
+                lines.append(f'{p}_http_request_duration_seconds_bucket'
+                             f'{_labels(method=method, endpoint=endpoint, le="+Inf")} {histogram[-2]}')
+                lines.append(f'{p}_http_request_duration_seconds_count{labels} {histogram[-2]}')
+                lines.append(f'{p}_http_request_duration_seconds_sum{labels} {histogram[-1]:.6f}')
+
+            lines += [f'# HELP {p}_http_response_bytes_total Response body bytes sent.',
+                      f'# TYPE {p}_http_response_bytes_total counter']
+            for endpoint, size in sorted(self._response_bytes.items()):
+                lines.append(f'{p}_http_response_bytes_total{_labels(endpoint=endpoint)} {size}')
+
+            lines += [f'# HELP {p}_db_queries_total SQL statements executed.',
+                      f'# TYPE {p}_db_queries_total counter']
+            for (endpoint, database), (count, _) in sorted(self._queries.items()):
+                lines.append(f'{p}_db_queries_total{_labels(endpoint=endpoint, database=database)} {count}')
+
+            lines += [f'# HELP {p}_db_query_seconds_total Time spent executing SQL and fetching rows.',
+                      f'# TYPE {p}_db_query_seconds_total counter']
+            for (endpoint, database), (_, seconds) in sorted(self._queries.items()):
+                lines.append(f'{p}_db_query_seconds_total{_labels(endpoint=endpoint, database=database)} '
+                             f'{seconds:.6f}')
+
+            lines += [f'# HELP {p}_request_phase_seconds_total Time spent in instrumented request phases.',
+                      f'# TYPE {p}_request_phase_seconds_total counter']
+            for (endpoint, phase), seconds in sorted(self._phases.items()):
+                lines.append(f'{p}_request_phase_seconds_total{_labels(endpoint=endpoint, phase=phase)} '
+                             f'{seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+def _labels(**labels):
+    """Prometheus label set with escaped values."""
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+def _escape(value):
+    return re.sub(r'(["\\])', r'\\\1', str(value)).replace('\n', '\\n')
+
+
+def init_instrumentation(app, metrics=None, server_timing=True):
+    """
+    Time every request of a Flask app and serve the metrics at /metrics.
+
+    Requests record named timings (see record and timer) in flask.g. Their
+    totals are sent as a Server-Timing header and added to the metrics once
+    the response is closed, so streamed responses count their full duration
+    and size. Streamed responses send their headers first, so their
+    Server-Timing header only covers the work before the first byte.
+
+    Args:
+        app: Flask application
+        metrics: Metrics instance; a new one by default
+        server_timing: Whether to add Server-Timing headers
+
+    Returns:
+        The Metrics instance
+    """
+    metrics = metrics or Metrics()
+    app.extensions['metrics'] = metrics
+
+    @app.before_request
+    def start_request_timer():
+        g._request_start = time.perf_counter()
+        g._timings = {}
+
+    @app.after_request
+    def finish_request_timer(response):
+        start = g.get('_request_start')
+        timings = g.get('_timings')
+        if start is None or timings is None:
+            return response
+
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        method, status = request.method, response.status_code
+
+        if server_timing:
+            response.headers['Server-Timing'] = _server_timing(timings, time.perf_counter() - start)
+
+        # Measure streamed bodies as they are sent; others are complete already
+        sent = [0]
+        if response.is_streamed:
+            response.response = _count_bytes(response.response, sent)
+        else:
+            sent[0] = response.calculate_content_length() or 0
+
+        def observe():
+            metrics.observe(method, endpoint, status, time.perf_counter() - start, sent[0], timings)
+
+        response.call_on_close(observe)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
+
+def _server_timing(timings, total):
+    """Server-Timing header value for a request's timings."""
+    parts = []
+    for name, (count, seconds) in timings.items():
+        description = f';desc="{count} queries"' if name in DATABASE_TIMINGS else ''
+        parts.append(f'{name};dur={seconds * 1000:.2f}{description}')
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+def _count_bytes(chunks, sent):
+    """Pass chunks through, adding their sizes to sent[0]."""
+    try:
+        for chunk in chunks:
+            sent[0] += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
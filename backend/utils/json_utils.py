@@ -0,0 +1,103 @@
+import json
+import numpy as np
+from flask import Response, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+def dumps(obj):
+    """
+    Serialize an object to compact JSON bytes.
+
+    Uses orjson when it is installed and the standard library otherwise.
+    NumPy scalars and arrays are supported by both.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':'), default=_default).encode('utf-8')
+
+def dumps_with_raw(obj, raw_members):
+    """
+    Serialize a dict and add members whose values are already JSON text.
+
+    The raw values are spliced into the output as they are, without being
+    parsed and encoded again, so they must be valid JSON.
+
+    Args:
+        obj: Dictionary of regular members
+        raw_members: Dictionary of member name -> JSON text (str or bytes)
+
+    Returns:
+        JSON bytes of the combined object
+    """
+    body = dumps(obj)
+    if not raw_members:
+        return body
+
+    parts = [body[:-1]]
+    separator = b',' if len(obj) else b''
+    for key, raw in raw_members.items():
+        parts += [separator, dumps(key), b':', raw.encode('utf-8') if isinstance(raw, str) else raw]
+        separator = b','
+    parts.append(b'}')
+    return b''.join(parts)
+
+def json_response(body, status=200):
+    """Wrap serialized JSON bytes in a response."""
+    return Response(body, status=status, mimetype='application/json')
+
+def stream_array(items, head=b'[', tail=b']', chunk_size=65536):
+    """
+    Generate a JSON array from serialized items in chunks.
+
+    Items are buffered into chunks of roughly chunk_size bytes so a large
+    response is not written one small item at a time.
+
+    Args:
+        items: Iterable of serialized JSON values (bytes)
+        head: Bytes before the first item, e.g. b'{"features":['
+        tail: Bytes after the last item, e.g. b']}'
+        chunk_size: Approximate size of each yielded chunk
+
+    Yields:
+        Bytes chunks of the complete document
+    """
+    buffer = [head]
+    size = len(head)
+    separator = b''
+    for item in items:
+        buffer += [separator, item]
+        size += len(item) + 1
+        separator = b','
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(tail)
+    yield b''.join(buffer)
+
+def stream_lines(items, chunk_size=65536):
+    """Generate newline-delimited JSON (NDJSON) from serialized items in chunks."""
+    buffer = []
+    size = 0
+    for item in items:
+        buffer += [item, b'\n']
+        size += len(item) + 1
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def streaming_response(chunks, mimetype='application/json'):
+    """Stream generated chunks, keeping the request context (and database session) alive."""
+    return Response(stream_with_context(chunks), mimetype=mimetype)
+
+def _default(obj):
+    """Fallback conversion of NumPy values for the standard library encoder."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
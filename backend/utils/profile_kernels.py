@@ -0,0 +1,295 @@
+# backend/utils/profile_kernels.py
+"""
+Batch kernels for road elevation profiles stored as flat arrays with offsets.
+
+Profile p's samples are offsets[p]:offsets[p + 1] of the distance and
+elevation arrays. Two interchangeable backends implement the same steps:
+
+- 'numpy': the reference implementation, built on the array functions in
+  geo_utils; the climb sweep runs its loop in plain Python
+- 'numba': explicit loops compiled with Numba, which handle the branching
+  of gap filling and the climb sweep without temporary arrays
+
+Numba is optional; without it every backend resolves to 'numpy'.
+"""
+import numpy as np
+from scipy.signal import savgol_coeffs
+import logging
+
+from .geo_utils import fill_profile_gaps, smooth_profiles, profile_statistics
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - optional speed-up
+    numba = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KERNEL_BACKENDS = ('auto', 'numpy', 'numba')
+
+def resolve_backend(backend='auto'):
+    """
+    Name of the backend to use for a configured backend.
+
+    'auto' picks 'numba' when it is installed; 'numba' falls back to 'numpy'
+    with a warning when it is not.
+    """
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Unknown profile kernel backend: {backend}")
+    if backend == 'numpy':
+        return 'numpy'
+    if numba is None:
+        if backend == 'numba':
+            logger.warning("Numba is not installed; using the NumPy profile kernels")
+        return 'numpy'
+    return 'numba'
+
+def get_profile_kernels(backend='auto'):
+    """ProfileKernels for a configured backend ('auto', 'numpy' or 'numba')."""
+    backend = resolve_backend(backend)
+    if backend not in _kernels:
+        _kernels[backend] = NumbaKernels() if backend == 'numba' else ProfileKernels()
+    return _kernels[backend]
+
+_kernels = {}
+
+
+class ProfileKernels:
+    """NumPy reference implementation of the profile kernels."""
+
+    backend = 'numpy'
+
+    def fill_gaps(self, offsets, distances, elevations, max_gap):
+        """
+        Interpolate nodata gaps of every profile, as fill_profile_gaps does for one.
+
+        Args:
+            offsets: Start of each profile in the sample arrays (n_profiles + 1 entries)
+            distances: Sample distances along each profile in meters, concatenated
+            elevations: Elevations with NaN where there is no data, concatenated
+            max_gap: Longest gap in meters that is filled
+
+        Returns:
+            Tuple of (elevations, longest_gap, filled_count, usable). Gaps of
+            usable profiles are filled in the returned elevations; profiles
+            with a gap longer than max_gap or fewer than two valid samples are
+            not usable and keep their NaN values
+        """
+        offsets = np.asarray(offsets, dtype='int64')
+        elevations = np.asarray(elevations, dtype='float64')
+        counts = np.diff(offsets)
+        longest_gap = np.zeros(len(counts))
+        filled_count = np.zeros(len(counts), dtype='int64')
+        usable = counts > 0
+        missing = np.isnan(elevations)
+        if not missing.any():
+            return elevations, longest_gap, filled_count, usable
+
+        filled = elevations.copy()
+        profile_of_sample = np.repeat(np.arange(len(counts)), counts)
+        for p in np.unique(profile_of_sample[missing]).tolist():
+            start, end = offsets[p], offsets[p + 1]
+            values, longest_gap[p], filled_count[p] = fill_profile_gaps(
+                distances[start:end], elevations[start:end], max_gap)
+            if values is None:
+                usable[p] = False
+            else:
+                filled[start:end] = values
+        return filled, longest_gap, filled_count, usable
+
+    def smooth(self, offsets, elevations, window=5, polyorder=2):
+        """Savitzky-Golay smoothing of every profile; see geo_utils.smooth_profiles."""
+        return smooth_profiles(offsets, elevations, window, polyorder)
+
+    def statistics(self, offsets, distances, elevations):
+        """Per-profile (avg_gradient, max_gradient, elevation_gain, gradient_count); see geo_utils.profile_statistics."""
+        return profile_statistics(offsets, distances, elevations)
+
+    def sweep(self, heights, max_drop):
+        """
+        Linear sweep returning (low, peak) index pairs of rises in heights.
+
+        A rise ends when heights drop more than max_drop below its peak or
+        below its start; see ClimbDetector.find_climbs.
+        """
+        intervals = _sweep_loop(np.asarray(heights, dtype='float64'), max_drop)
+        return [(int(low), int(peak)) for low, peak in intervals]
+
+
+class NumbaKernels(ProfileKernels):
+    """The profile kernels as loops compiled with Numba."""
+
+    backend = 'numba'
+
+    def __init__(self):
+        """Compile the loops (on first call, or from Numba's on-disk cache)."""
+        jit = numba.njit(cache=True, nogil=True)
+        self._fill_gaps = jit(_fill_gaps_loop)
+        self._smooth = jit(_smooth_loop)
+        self._statistics = jit(_statistics_loop)
+        self._sweep = jit(_sweep_loop)
+
+    def fill_gaps(self, offsets, distances, elevations, max_gap):
+        offsets = np.ascontiguousarray(offsets, dtype='int64')
+        distances = np.ascontiguousarray(distances, dtype='float64')
+        filled = np.array(elevations, dtype='float64')
+        profiles = len(offsets) - 1
+        longest_gap = np.zeros(profiles)
+        filled_count = np.zeros(profiles, dtype='int64')
+        usable = np.zeros(profiles, dtype=np.bool_)
+        self._fill_gaps(offsets, distances, filled, float(max_gap), longest_gap, filled_count, usable)
+        return filled, longest_gap, filled_count, usable
+
+    def smooth(self, offsets, elevations, window=5, polyorder=2):
+        if window % 2 == 0 or polyorder >= window:
+            raise ValueError(f"Invalid smoothing window {window} for polynomial order {polyorder}")
+        half = window // 2
+        weights = np.array([savgol_coeffs(window, polyorder, pos=i, use='dot') for i in range(window)])
+        elevations = np.ascontiguousarray(elevations, dtype='float64')
+        smoothed = elevations.copy()
+        self._smooth(np.ascontiguousarray(offsets, dtype='int64'), elevations, weights[half].copy(),
+                     weights[:half].copy(), weights[window - half:].copy(), smoothed)
+        return smoothed
+
+    def statistics(self, offsets, distances, elevations):
+        profiles = len(offsets) - 1
+        avg_gradient = np.full(profiles, np.nan)
+        max_gradient = np.full(profiles, np.nan)
+        elevation_gain = np.zeros(profiles)
+        gradient_count = np.zeros(profiles, dtype='int64')
+        self._statistics(np.ascontiguousarray(offsets, dtype='int64'),
+                         np.ascontiguousarray(distances, dtype='float64'),
+                         np.ascontiguousarray(elevations, dtype='float64'),
+                         avg_gradient, max_gradient, elevation_gain, gradient_count)
+        return avg_gradient, max_gradient, elevation_gain, gradient_count
+
+    def sweep(self, heights, max_drop):
+        intervals = self._sweep(np.ascontiguousarray(heights, dtype='float64'), float(max_drop))
+        return [(int(low), int(peak)) for low, peak in intervals]
+
+
+# Plain loops compiled by NumbaKernels. They only use what Numba's nopython
+# mode supports and write their results into the arrays they are given.
+
+def _fill_gaps_loop(offsets, distances, elevations, max_gap, longest_gap, filled_count, usable):
+    for p in range(len(offsets) - 1):
+        start, end = offsets[p], offsets[p + 1]
+        if end <= start:
+            continue
+        valid = 0
+        for i in range(start, end):
+            if not np.isnan(elevations[i]):
+                valid += 1
+        if valid == end - start:
+            usable[p] = True
+            continue
+        if valid < 2:
+            longest_gap[p] = distances[end - 1] - distances[start]
+            continue
+
+        # Longest run of missing samples, measured between the valid samples around it
+        longest = 0.0
+        i = start
+        while i < end:
+            if np.isnan(elevations[i]):
+                run_end = i
+                while run_end < end and np.isnan(elevations[run_end]):
+                    run_end += 1
+                gap = distances[min(run_end, end - 1)] - distances[max(i - 1, start)]
+                longest = max(longest, gap)
+                i = run_end
+            else:
+                i += 1
+        longest_gap[p] = longest
+        if longest > max_gap:
+            continue
+
+        # Fill interior runs linearly and edge runs with the nearest valid value
+        i = start
+        while i < end:
+            if np.isnan(elevations[i]):
+                run_end = i
+                while run_end < end and np.isnan(elevations[run_end]):
+                    run_end += 1
+                for j in range(i, run_end):
+                    if i == start:
+                        elevations[j] = elevations[run_end]
+                    elif run_end == end:
+                        elevations[j] = elevations[i - 1]
+                    else:
+                        slope = (elevations[run_end] - elevations[i - 1]) / (distances[run_end] - distances[i - 1])
+                        elevations[j] = slope * (distances[j] - distances[i - 1]) + elevations[i - 1]
+                filled_count[p] += run_end - i
+                i = run_end
+            else:
+                i += 1
+        usable[p] = True
+
+def _smooth_loop(offsets, elevations, center, head, tail, smoothed):
+    window = len(center)
+    half = window // 2
+    for p in range(len(offsets) - 1):
+        start, end = offsets[p], offsets[p + 1]
+        if end - start <= window:
+            continue
+        for i in range(start + half, end - half):
+            total = 0.0
+            for k in range(window):
+                total += center[k] * elevations[i - half + k]
+            smoothed[i] = total
+        for j in range(half):
+            first = 0.0
+            last = 0.0
+            for k in range(window):
+                first += head[j, k] * elevations[start + k]
+                last += tail[j, k] * elevations[end - window + k]
+            smoothed[start + j] = first
+            smoothed[end - half + j] = last
+
+def _statistics_loop(offsets, distances, elevations, avg_gradient, max_gradient, elevation_gain, gradient_count):
+    for p in range(len(offsets) - 1):
+        total = 0.0
+        steepest = 0.0
+        gain = 0.0
+        count = 0
+        for i in range(offsets[p] + 1, offsets[p + 1]):
+            rise = elevations[i] - elevations[i - 1]
+            if rise > 0:
+                gain += rise
+            run = distances[i] - distances[i - 1]
+            if run > 0:
+                gradient = abs(rise / run * 100)
+                total += gradient
+                steepest = max(steepest, gradient)
+                count += 1
+        elevation_gain[p] = gain
+        gradient_count[p] = count
+        if count:
+            avg_gradient[p] = total / count
+            max_gradient[p] = steepest
+
+def _sweep_loop(heights, max_drop):
+    intervals = np.empty((len(heights) // 2 + 1, 2), dtype=np.int64)
+    found = 0
+    low = peak = 0
+    for i in range(1, len(heights)):
+        if heights[i] > heights[peak]:
+            peak = i
+        elif heights[peak] - heights[i] > max_drop:
+            if peak > low:
+                intervals[found, 0] = low
+                intervals[found, 1] = peak
+                found += 1
+            low = peak = i
+        if heights[i] < heights[low]:
+            if peak > low:
+                intervals[found, 0] = low
+                intervals[found, 1] = peak
+                found += 1
+            low = peak = i
+    if peak > low:
+        intervals[found, 0] = low
+        intervals[found, 1] = peak
+        found += 1
+    return intervals[:found]
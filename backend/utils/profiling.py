@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+
+# Profiler modes besides plain timers
+PROFILER_MODES = ('cprofile', 'sample')
+
+class StageProfiler:
+    """
+    Timers, counters and progress reporting for long batch runs.
+
+    Work is grouped into stages (e.g. 'process_roads'). Within the current
+    stage, timer() accumulates the time of repeated steps, count() adds to
+    counters and progress() logs throughput and an ETA. Each stage can also
+    run under cProfile or a sampling profiler. report() returns everything as
+    a dictionary and write_report() stores it as JSON.
+
+    Timers and counters are cheap enough to leave on for every run; the
+    profilers are only used when a mode is given.
+    """
+
+    def __init__(self, mode=None, output_dir=None, report_interval=30.0, sample_interval=0.005, top=30):
+        """
+        Initialize the profiler.
+
+        Args:
+            mode: None for timers only, 'cprofile' or 'sample'
+            output_dir: Directory for per-stage cProfile dumps and collapsed
+                stacks; None keeps only the summaries in the report
+            report_interval: Minimum seconds between progress log lines
+            sample_interval: Seconds between samples of the sampling profiler
+            top: Number of functions listed per stage in the report
+        """
+        if mode is not None and mode not in PROFILER_MODES:
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.report_interval = report_interval
+        self.sample_interval = sample_interval
+        self.top = top
+        self.started = datetime.now(timezone.utc)
+        self.stages = {}
+        self._stack = []
+        self._progress = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a top-level step, profiling it if a mode is set."""
+        stats = self._stage_stats(name)
+        self._stack.append(name)
+        profiler = self._start_profiler()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stats
+        except BaseException:
+            stats['status'] = 'error'
+            raise
+        finally:
+            stats['wall_seconds'] += time.perf_counter() - wall
+            stats['cpu_seconds'] += time.process_time() - cpu
+            if profiler is not None:
+                stats['profile'] = self._stop_profiler(profiler, name)
+            self._stack.pop()
+            self._progress.pop(name, None)
+            logger.info(f"Stage {name} took {_format_seconds(stats['wall_seconds'])}")
+
+    def timer(self, name):
+        """Context manager adding its block's time to the current stage's timer name."""
+        return _Timer(self._current()['timers'], name)
+
+    def add_time(self, name, seconds, calls=1):
+        """Add time measured elsewhere to a timer of the current stage."""
+        timer = self._current()['timers'].setdefault(name, [0, 0.0])
+        timer[0] += calls
+        timer[1] += seconds
+
+    def count(self, name, n=1):
+        """Add n to a counter of the current stage."""
+        counters = self._current()['counters']
+        counters[name] = counters.get(name, 0) + n
+
+    def progress(self, done, total, unit='items'):
+        """
+        Log progress with throughput and ETA, at most every report_interval seconds.
+
+        Args:
+            done: Items finished so far in the current stage
+            total: Total number of items
+            unit: Name of the items for the log line
+        """
+        stage = self._stack[-1] if self._stack else None
+        now = time.perf_counter()
+        state = self._progress.get(stage)
+        if state is None or state['unit'] != unit:
+            state = self._progress[stage] = {'unit': unit, 'start': now, 'next': now + self.report_interval,
+                                             'done': done}
+        if now < state['next'] and done < total:
+            return
+        state['next'] = now + self.report_interval
+
+        elapsed = now - state['start']
+        rate = (done - state['done']) / elapsed if elapsed > 0 else 0.0
+        eta = f", ETA {_format_seconds((total - done) / rate)}" if rate > 0 and done < total else ''
+        percent = 100.0 * done / total if total else 100.0
+        logger.info(f"Processing {unit} {done}/{total} ({percent:.1f}%, {rate:.1f} {unit}/s{eta})")
+
+    def progress_callback(self, unit='items'):
+        """A (done, total) callable reporting progress, e.g. for DHMProcessor.merge_dhm_files."""
+        return functools.partial(self._progress_callback, unit=unit)
+
+    def _progress_callback(self, done, total, unit):
+        self.progress(done, total, unit)
+
+    def report(self):
+        """
+        All stages as a dictionary.
+
+        Each stage has wall and CPU seconds, status, timers (calls, seconds and
+        share of the stage's wall time), counters with per-second rates and,
+        when profiled, the top functions.
+        """
+        stages = {}
+        for name, stats in self.stages.items():
+            wall = stats['wall_seconds']
+            stages[name] = {
+                'status': stats['status'],
+                'wall_seconds': wall,
+                'cpu_seconds': stats['cpu_seconds'],
+                'timers': {timer: {'calls': calls, 'seconds': seconds,
+                                   'share': seconds / wall if wall else None}
+                           for timer, (calls, seconds) in stats['timers'].items()},
+                'counters': dict(stats['counters']),
+                'rates': {counter: value / wall for counter, value in stats['counters'].items() if wall}
+            }
+            if 'profile' in stats:
+                stages[name]['profile'] = stats['profile']
+        return {
+            'version': REPORT_VERSION,
+            'started': self.started.isoformat(),
+            'finished': datetime.now(timezone.utc).isoformat(),
+            'command': sys.argv,
+            'pid': os.getpid(),
+            'mode': self.mode or 'timers',
+            'total_wall_seconds': sum(stats['wall_seconds'] for stats in self.stages.values()),
+            'stages': stages
+        }
+
+    def write_report(self, path):
+        """Write report() as JSON and log a per-stage summary."""
+        report = self.report()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        for name, stats in report['stages'].items():
+            timers = ', '.join(f"{timer} {_format_seconds(t['seconds'])}"
+                               for timer, t in sorted(stats['timers'].items(), key=lambda item: -item[1]['seconds']))
+            logger.info(f"{name}: {_format_seconds(stats['wall_seconds'])} wall, "
+                        f"{_format_seconds(stats['cpu_seconds'])} CPU" + (f" ({timers})" if timers else ''))
+        logger.info(f"Profile report written to {path}")
+        return report
+
+    def _current(self):
+        """Statistics of the innermost running stage (or of 'other' outside stages)."""
+        return self._stage_stats(self._stack[-1] if self._stack else 'other')
+
+    def _stage_stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = {'status': 'ok', 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                         'timers': {}, 'counters': {}}
+        return stats
+
+    def _start_profiler(self):
+        # Profilers do not nest; only the outermost stage is profiled
+        if self.mode is None or len(self._stack) > 1:
+            return None
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        sampler = SamplingProfiler(self.sample_interval)
+        sampler.start()
+        return sampler
+
+    def _stop_profiler(self, profiler, stage):
+        if isinstance(profiler, SamplingProfiler):
+            profiler.stop()
+            if self.output_dir:
+                profiler.write_collapsed(os.path.join(self.output_dir, f"profile_{stage}.folded"))
+            return profiler.summary(self.top)
+
+        profiler.disable()
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.output_dir, f"profile_{stage}.prof"))
+        return _cprofile_summary(profiler, self.top)
+
+
+class _Timer:
+    """Accumulates a block's time into timers[name] as [calls, seconds]."""
+
+    __slots__ = ('timers', 'name', 'start')
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timer = self.timers.get(self.name)
+        if timer is None:
+            timer = self.timers[self.name] = [0, 0.0]
+        timer[0] += 1
+        timer[1] += time.perf_counter() - self.start
+        return False
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling one thread's stack from a background thread.
+
+    Overhead depends on the sampling interval rather than on the number of
+    calls, so it suits long runs where cProfile would slow everything down.
+    Only the thread that created the profiler is sampled.
+    """
+
+    def __init__(self, interval=0.005):
+        """Initialize with the seconds between samples."""
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def summary(self, top=30):
+        """Functions with the most samples, on top of the stack (self) and anywhere in it (total)."""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        share = (lambda count: count / self.samples) if self.samples else (lambda count: 0.0)
+        return {
+            'samples': self.samples,
+            'interval_seconds': self.interval,
+            'self': [{'function': f, 'samples': c, 'share': share(c)} for f, c in own.most_common(top)],
+            'total': [{'function': f, 'samples': c, 'share': share(c)} for f, c in total.most_common(top)]
+        }
+
+    def write_collapsed(self, path):
+        """Write the stacks in the collapsed format read by flame graph tools."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(';'.join(stack) + f" {count}\n")
+
+
+def _cprofile_summary(profiler, top=30):
+    """Functions with the most cumulative time in a cProfile run."""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (calls, _, own, cumulative, _) in stats.stats.items():
+        rows.append({'function': f"{function} ({os.path.basename(filename)}:{line})", 'calls': calls,
+                     'self_seconds': own, 'cumulative_seconds': cumulative})
+    rows.sort(key=lambda row: -row['cumulative_seconds'])
+    return {'total_seconds': stats.total_tt, 'functions': rows[:top]}
+
+def _format_seconds(seconds):
+    """Human readable duration, e.g. 2h05m, 3m12s, 14.2s or 0.042s."""
+    if seconds >= 3600:
+        return f"{int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m"
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+    return f"{seconds:.1f}s" if seconds >= 10 else f"{seconds:.3f}s"
@@ -0,0 +1,556 @@
+# benchmarks/load_test.py
+"""
+Load test the Flask API on a synthetic database.
+
+Seeds a scratch database with synthetic roads and hills, serves create_app()
+from a local WSGI server in a separate process and drives it with concurrent
+clients replaying a map-like request mix. Reports latency percentiles and
+throughput per endpoint:
+
+    python -m benchmarks.load_test --roads 20000 --hills 5000 --output load.json
+    python -m benchmarks.load_test --roads 20000 --hills 5000 --compare load.json
+
+With --compare the run fails (exit code 1) when an endpoint's p95 latency or
+throughput regresses by more than --max-regression. --url load tests an
+already running server instead, e.g. a staging deployment.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+import numpy as np
+from pyproj import Transformer
+import logging
+
+from backend.utils.geo_utils import encode_profiles
+from benchmarks.synthetic import generate_dem_tiles, DHM_CRS, ORIGIN_X, ORIGIN_Y
+from benchmarks.run_benchmarks import _environment, _git_info
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+# Roads and hills are spread over Denmark (lon/lat)
+DENMARK_BOUNDS = (8.1, 54.8, 12.6, 57.6)
+
+# Map viewport sizes in degrees, from a zoomed-in town to a region
+VIEWPORT_SIZES = (0.05, 0.1, 0.25, 0.5)
+
+HIGHWAY_TYPES = ['residential', 'unclassified', 'tertiary', 'secondary', 'track']
+HILL_CATEGORIES = ['4', '3', '2', '1', 'HC']
+
+# Default request mix: scenario -> relative weight. Viewport loads and detail
+# clicks dominate, as on the map page.
+DEFAULT_MIX = {
+    'hills_viewport': 30,
+    'hill_detail': 15,
+    'top_hills': 5,
+    'stats': 5,
+    'roads_filtered': 5,
+    'road_detail': 15,
+    'road_profile': 15,
+    'elevation': 10
+}
+
+def seed_database(workdir, road_count=20000, hill_count=5000, seed=0, dem=True):
+    """
+    Create the app and hill databases with synthetic data in workdir.
+
+    Writes app.db (roads and featured hills for create_app), hills.db (the
+    hill_routes database) and, if dem is True, a synthetic merged DHM in
+    workdir/data for /api/elevation.
+
+    Args:
+        workdir: Working directory; the server runs from here
+        road_count: Number of roads
+        hill_count: Number of hills
+        seed: Random seed
+        dem: Whether to generate the DHM
+
+    Returns:
+        Dictionary describing the seeded data (counts and DHM bounds)
+    """
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(workdir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    _seed_app_database(workdir, road_count, rng)
+    _seed_hill_database(os.path.join(workdir, 'hills.db'), hill_count, rng)
+
+    info = {'roads': road_count, 'hills': hill_count, 'dem_bounds': None}
+    if dem:
+        from backend.services.dhm_processor import DHMProcessor
+        dhm = DHMProcessor(data_dir)
+        if not os.path.exists(dhm.merged_dhm_path):
+            generate_dem_tiles(data_dir, tiles_x=2, tiles_y=2, tile_pixels=1000, resolution=0.8, seed=seed)
+            dhm.merge_dhm_files()
+        # Elevation requests are sent in WGS84 like the front end does
+        to_wgs84 = Transformer.from_crs(DHM_CRS, 'EPSG:4326', always_xy=True)
+        lon0, lat0 = to_wgs84.transform(ORIGIN_X + 50, ORIGIN_Y + 50)
+        lon1, lat1 = to_wgs84.transform(ORIGIN_X + 1550, ORIGIN_Y + 1550)
+        info['dem_bounds'] = [lon0, lat0, lon1, lat1]
+    logger.info(f"Seeded {road_count} roads and {hill_count} hills in {workdir}")
+    return info
+
+def _random_lines(count, rng, min_vertices=4, max_vertices=30, step=40.0):
+    """Random winding lines in lon/lat; returns (coordinate list, length in meters) pairs."""
+    lines = []
+    for _ in range(count):
+        vertices = int(rng.integers(min_vertices, max_vertices + 1))
+        heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.3, vertices - 1))
+        steps = rng.uniform(0.5, 1.5, vertices - 1) * step
+        lon0 = rng.uniform(DENMARK_BOUNDS[0], DENMARK_BOUNDS[2])
+        lat0 = rng.uniform(DENMARK_BOUNDS[1], DENMARK_BOUNDS[3])
+        dlat = np.concatenate([[0], np.cumsum(steps * np.sin(heading))]) / 111320
+        dlon = np.concatenate([[0], np.cumsum(steps * np.cos(heading))]) / (111320 * np.cos(np.radians(lat0)))
+        coordinates = np.round(np.stack([lon0 + dlon, lat0 + dlat], axis=1), 6).tolist()
+        lines.append((coordinates, float(steps.sum())))
+    return lines
+
+def _random_profiles(lengths, rng, spacing=10.0):
+    """Elevation profiles sampled every spacing meters; returns (offsets, elevations)."""
+    counts = np.maximum((np.asarray(lengths) // spacing).astype('int64') + 1, 2)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    bases = np.repeat(rng.uniform(0, 120, len(counts)), counts)
+    grades = np.repeat(rng.normal(0, 0.04, len(counts)), counts)
+    steps = (grades + rng.normal(0, 0.01, offsets[-1])) * spacing
+    # Cumulative rise within each profile, starting at 0
+    rise = np.cumsum(steps)
+    rise -= np.repeat(rise[offsets[:-1]], counts)
+    return offsets, np.maximum(bases + rise, 0)
+
+def _seed_app_database(workdir, road_count, rng, batch_size=5000):
+    """Fill app.db with synthetic roads and featured hills through the app's models."""
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.abspath(os.path.join(workdir, 'app.db'))}"
+    from app import create_app, db, Road, Hill
+
+    lines = _random_lines(road_count, rng)
+    lengths = [length for _, length in lines]
+    offsets, elevations = _random_profiles(lengths, rng)
+    starts, deltas = encode_profiles(offsets, elevations)
+    minimum = np.minimum.reduceat(elevations, offsets[:-1])
+    maximum = np.maximum.reduceat(elevations, offsets[:-1])
+
+    records = []
+    for i, (coordinates, length) in enumerate(lines):
+        gradient = float((maximum[i] - minimum[i]) / length * 100)
+        records.append({
+            'name': f"Vej {i + 1}",
+            'highway': HIGHWAY_TYPES[i % len(HIGHWAY_TYPES)],
+            'surface': 'asphalt',
+            'length_meters': length,
+            'min_elevation': float(minimum[i]),
+            'max_elevation': float(maximum[i]),
+            'gradient': gradient,
+            'maxspeed': 50,
+            'coordinates_json': json.dumps(coordinates, separators=(',', ':')),
+            'profile_spacing': 10.0,
+            'profile_start_dm': starts[i],
+            'profile_deltas': deltas[i],
+            'featured': i < 4,
+            'difficulty': 'easy' if gradient < 4 else 'moderate' if gradient < 8 else 'challenging'
+        })
+
+    app = create_app()
+    with app.app_context():
+        Hill.query.delete()
+        Road.query.delete()
+        for start in range(0, len(records), batch_size):
+            db.session.execute(Road.__table__.insert(), records[start:start + batch_size])
+        # A few hundred curated hills for /api/top-hills
+        db.session.execute(Hill.__table__.insert(), [{
+            'name': f"Bakke {i + 1}", 'location': 'Jylland', 'length': float(rng.uniform(0.2, 3)),
+            'height': float(rng.uniform(10, 120)), 'gradient': float(rng.uniform(2, 12)),
+            'rating': int(rng.integers(1, 6)), 'road_id': i + 1
+        } for i in range(min(300, road_count))])
+        db.session.commit()
+
+def _seed_hill_database(db_path, hill_count, rng):
+    """Fill the hill_routes database with synthetic hills and elevation profiles."""
+    from backend.services.hill_database import HillDatabase
+    HillDatabase(db_path).init_db()
+
+    lines = _random_lines(hill_count, rng, min_vertices=3, max_vertices=15, step=60.0)
+    offsets, elevations = _random_profiles([length for _, length in lines], rng, spacing=20.0)
+
+    hills, boxes, profiles = [], [], []
+    for i, (coordinates, length) in enumerate(lines):
+        hill_id = i + 1
+        profile = elevations[offsets[i]:offsets[i + 1]]
+        if profile[-1] < profile[0]:
+            profile = profile[::-1]
+        gain = float(profile[-1] - profile[0])
+        xs, ys = zip(*coordinates)
+        bbox = [min(xs), min(ys), max(xs), max(ys)]
+        wkt = 'LINESTRING (' + ', '.join(f"{x} {y}" for x, y in coordinates) + ')'
+        hills.append((hill_id, f"Bakke {hill_id}", str(hill_id), HILL_CATEGORIES[i % len(HILL_CATEGORIES)],
+                      length, gain / length * 100, float(np.max(np.diff(profile)) / 20.0 * 100), gain,
+                      float(profile[0]), float(profile[-1]), wkt, 'synthetic', json.dumps(bbox), 'Unknown'))
+        boxes.append((hill_id, bbox[0], bbox[2], bbox[1], bbox[3]))
+        profiles.extend((hill_id, j * 20.0, float(e)) for j, e in enumerate(profile))
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("DELETE FROM hills")
+        conn.execute("DELETE FROM elevation_profiles")
+        conn.execute("DELETE FROM idx_hills_bbox")
+        conn.executemany('''
+        INSERT INTO hills (
+            id, name, road_id, category, length_m, avg_gradient, max_gradient,
+            elevation_gain, start_elevation, end_elevation, geometry,
+            source, bbox, region
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', hills)
+        conn.executemany("INSERT INTO idx_hills_bbox (id, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?)", boxes)
+        conn.executemany("INSERT INTO elevation_profiles (hill_id, distance, elevation) VALUES (?, ?, ?)", profiles)
+    conn.close()
+
+class RequestMix:
+    """Generates request paths for the weighted scenarios."""
+
+    def __init__(self, info, mix=None, seed=0):
+        """
+        Initialize with the seeded data description and scenario weights.
+
+        Args:
+            info: Dictionary from seed_database (counts and DHM bounds)
+            mix: Scenario -> weight; None uses DEFAULT_MIX
+            seed: Random seed
+        """
+        mix = dict(DEFAULT_MIX if mix is None else mix)
+        if not info.get('dem_bounds'):
+            mix.pop('elevation', None)
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self.scenarios = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.scenarios]
+        if not self.scenarios:
+            raise ValueError("The request mix has no scenarios")
+        self.info = info
+        self.seed = seed
+
+    def generator(self, worker):
+        """Independent random generator for one client worker."""
+        return random.Random(self.seed * 1000 + worker)
+
+    def next(self, rng):
+        """Return (scenario, path) of a random request."""
+        scenario = rng.choices(self.scenarios, self.weights)[0]
+        return scenario, getattr(self, f'_{scenario}')(rng)
+
+    def _hills_viewport(self, rng):
+        # The map page sends its bounds and the filter form's values
+        size = rng.choice(VIEWPORT_SIZES)
+        west = rng.uniform(DENMARK_BOUNDS[0], DENMARK_BOUNDS[2] - size)
+        south = rng.uniform(DENMARK_BOUNDS[1], DENMARK_BOUNDS[3] - size / 2)
+        path = f"/api/hills?bbox={west:.5f},{south:.5f},{west + size:.5f},{south + size / 2:.5f}"
+        if rng.random() < 0.3:
+            path += f"&min_gradient={rng.choice([3, 5, 7])}"
+        return path
+
+    def _hill_detail(self, rng):
+        return f"/api/hills/{rng.randint(1, max(self.info['hills'], 1))}"
+
+    def _top_hills(self, rng):
+        return f"/api/top-hills?filter={rng.choice(['longest', 'steepest', 'highest'])}"
+
+    def _stats(self, rng):
+        return "/api/stats"
+
+    def _roads_filtered(self, rng):
+        # The search form narrows the list; the full list is a bulk export
+        return f"/api/roads?min_gradient={rng.choice([6, 8, 10])}&geometry=simplified"
+
+    def _road_detail(self, rng):
+        return f"/api/roads/{rng.randint(1, max(self.info['roads'], 1))}"
+
+    def _road_profile(self, rng):
+        return f"/api/roads/{rng.randint(1, max(self.info['roads'], 1))}/profile"
+
+    def _elevation(self, rng):
+        lon0, lat0, lon1, lat1 = self.info['dem_bounds']
+        return f"/api/elevation?lon={rng.uniform(lon0, lon1):.6f}&lat={rng.uniform(lat0, lat1):.6f}"
+
+
+def run_load(base_url, request_mix, concurrency=8, duration=20.0, warmup=2.0, timeout=60.0):
+    """
+    Drive a server with closed-loop clients for a fixed time.
+
+    Each of the concurrency workers sends the next request as soon as the
+    previous response body has been read completely. Requests finishing
+    during the warm-up are not recorded.
+
+    Args:
+        base_url: Server URL, e.g. http://127.0.0.1:5000
+        request_mix: RequestMix generating the requests
+        concurrency: Number of concurrent clients
+        duration: Measured seconds, after the warm-up
+        warmup: Seconds before measuring starts
+        timeout: Socket timeout per request in seconds
+
+    Returns:
+        Results dictionary with per-endpoint and overall statistics
+    """
+    url = urlsplit(base_url)
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    samples = [[] for _ in range(concurrency)]
+
+    def worker(index):
+        rng = request_mix.generator(index)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+        while True:
+            scenario, path = request_mix.next(rng)
+            sent = time.perf_counter()
+            if sent >= stop_at:
+                break
+            try:
+                connection.request('GET', (url.path.rstrip('/') or '') + path)
+                response = connection.getresponse()
+                size = len(response.read())
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                size, status = 0, None
+            done = time.perf_counter()
+            if done >= measure_from:
+                samples[index].append((scenario, done - sent, status, size))
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize([sample for worker_samples in samples for sample in worker_samples], duration)
+
+def summarize(samples, duration):
+    """
+    Latency percentiles, error counts and throughput per scenario.
+
+    Args:
+        samples: (scenario, seconds, HTTP status or None, bytes) tuples
+        duration: Measured seconds
+
+    Returns:
+        Dictionary with 'endpoints' (per scenario) and 'total' statistics
+    """
+    def stats(rows):
+        latency = np.array([row[1] for row in rows]) * 1000
+        errors = sum(1 for row in rows if row[2] is None or row[2] >= 500)
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if len(latency) else (np.nan,) * 3
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'client_errors': sum(1 for row in rows if row[2] is not None and 400 <= row[2] < 500),
+            'throughput': len(rows) / duration,
+            'mean_ms': float(latency.mean()) if len(latency) else None,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(latency.max()) if len(latency) else None,
+            'mean_bytes': float(np.mean([row[3] for row in rows])) if rows else None
+        }
+
+    by_scenario = {}
+    for row in samples:
+        by_scenario.setdefault(row[0], []).append(row)
+    return {
+        'duration': duration,
+        'endpoints': {name: stats(rows) for name, rows in sorted(by_scenario.items())},
+        'total': stats(samples)
+    }
+
+def report(results):
+    """Print the per-endpoint statistics as a table."""
+    print(f"{'endpoint':<16}{'reqs':>8}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'KiB':>9}")
+    rows = list(results['endpoints'].items()) + [('total', results['total'])]
+    for name, s in rows:
+        size = (s['mean_bytes'] or 0) / 1024
+        print(f"{name:<16}{s['requests']:>8}{s['errors']:>6}{s['throughput']:>9.1f}"
+              f"{s['p50_ms']:>8.1f}ms{s['p95_ms']:>7.1f}ms{s['p99_ms']:>7.1f}ms{size:>9.1f}")
+
+def compare(baseline, current, max_regression=1.2):
+    """
+    Compare p95 latency and throughput per endpoint against a baseline run.
+
+    Args:
+        baseline: Results of an earlier run
+        current: Results of this run
+        max_regression: Largest allowed p95 latency ratio (and inverse
+            throughput ratio) before an endpoint counts as regressed
+
+    Returns:
+        List of regressed endpoint names (including 'total')
+    """
+    regressed = []
+    print(f"{'endpoint':<16}{'base p95':>11}{'p95':>11}{'ratio':>8}{'base req/s':>12}{'req/s':>9}")
+    current_rows = dict(current['endpoints'], total=current['total'])
+    baseline_rows = dict(baseline['endpoints'], total=baseline['total'])
+    for name, s in current_rows.items():
+        base = baseline_rows.get(name)
+        if not base or not base['requests'] or not s['requests']:
+            continue
+        ratio = s['p95_ms'] / base['p95_ms'] if base['p95_ms'] else float('inf')
+        slower = ratio > max_regression or s['throughput'] * max_regression < base['throughput']
+        failing = s['errors'] > base['errors']
+        flag = '  REGRESSION' if slower or failing else ''
+        if flag:
+            regressed.append(name)
+        print(f"{name:<16}{base['p95_ms']:>9.1f}ms{s['p95_ms']:>9.1f}ms{ratio:>7.2f}x"
+              f"{base['throughput']:>12.1f}{s['throughput']:>9.1f}{flag}")
+    return regressed
+
+def serve(workdir, port_queue, verbose=False):
+    """
+    Serve create_app() from workdir with a threaded WSGI server.
+
+    Runs in a child process so the server and the load generator do not share
+    a GIL. The bound port is put on port_queue once the server listens.
+    """
+    os.chdir(workdir)
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.abspath('app.db')}"
+    os.environ['DATA_DIR'] = os.path.abspath('data')
+    os.environ['FLASK_DEBUG'] = 'False'
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    from werkzeug.serving import make_server
+    from app import create_app
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+def start_server(workdir, verbose=False, timeout=60.0):
+    """Start serve() in a child process; returns (process, base URL)."""
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    process = context.Process(target=serve, args=(workdir, port_queue, verbose), daemon=True)
+    process.start()
+    port = port_queue.get(timeout=timeout)
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Wait until the app answers
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/stats')
+            connection.getresponse().read()
+            connection.close()
+            return process, base_url
+        except OSError:
+            if time.perf_counter() > deadline:
+                process.terminate()
+                raise RuntimeError("Load test server did not start")
+            time.sleep(0.2)
+
+def _parse_mix(text):
+    """Parse 'scenario=weight,...' into a mix, starting from DEFAULT_MIX."""
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, text.split(',')):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Load test the API on a synthetic database.')
+    parser.add_argument('--roads', type=int, default=20000, help='Synthetic roads to seed')
+    parser.add_argument('--hills', type=int, default=5000, help='Synthetic hills to seed')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for data and requests')
+    parser.add_argument('--no-dem', action='store_true', help='Skip the DHM and the elevation scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=20.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds before measuring')
+    parser.add_argument('--mix', default='', help=f"Scenario weights, e.g. 'stats=0,hill_detail=40'; "
+                                                  f"scenarios: {', '.join(DEFAULT_MIX)}")
+    parser.add_argument('--url', default=None, help='Load test this running server instead of a local one; '
+                                                    'its data must match --roads/--hills')
+    parser.add_argument('--workdir', default=None, help='Directory for the seeded databases (reused if seeded)')
+    parser.add_argument('--output', default=None, help='Write results JSON to this file')
+    parser.add_argument('--compare', default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=1.2,
+                        help='Allowed p95 latency / throughput ratio before failing the comparison')
+    parser.add_argument('--verbose', action='store_true', help='Keep the app and server logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('backend').setLevel(logging.WARNING)
+        logging.getLogger('app').setLevel(logging.WARNING)
+        logging.getLogger('benchmarks.synthetic').setLevel(logging.WARNING)
+
+    process = None
+    workdir = None
+    if args.url:
+        base_url = args.url
+        info = {'roads': args.roads, 'hills': args.hills, 'dem_bounds': None}
+    else:
+        workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='hill-load-'))
+        os.makedirs(workdir, exist_ok=True)
+        info_file = os.path.join(workdir, 'seed.json')
+        expected = {'roads': args.roads, 'hills': args.hills, 'seed': args.seed, 'dem': not args.no_dem}
+        info = None
+        if os.path.exists(info_file):
+            with open(info_file) as f:
+                info = json.load(f)
+            if info.get('params') != expected:
+                info = None
+        if info is None:
+            info = seed_database(workdir, args.roads, args.hills, args.seed, dem=not args.no_dem)
+            info['params'] = expected
+            with open(info_file, 'w') as f:
+                json.dump(info, f)
+        process, base_url = start_server(workdir, args.verbose)
+
+    try:
+        logger.info(f"Load testing {base_url} with {args.concurrency} clients for {args.duration:g}s")
+        results = run_load(base_url, RequestMix(info, _parse_mix(args.mix), args.seed),
+                           args.concurrency, args.duration, args.warmup)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+        if workdir is not None and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results.update({
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': {'roads': info['roads'], 'hills': info['hills'], 'concurrency': args.concurrency,
+                   'warmup': args.warmup, 'url': args.url, 'mix': _parse_mix(args.mix), 'seed': args.seed},
+        'environment': _environment(),
+        'git': _git_info()
+    })
+    report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(json.load(f), results, args.max_regression)
+        if regressed:
+            logger.error(f"Regressed endpoints: {', '.join(regressed)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
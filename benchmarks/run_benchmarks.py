@@ -0,0 +1,376 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark the gradient pipeline on synthetic data.
+
+Generates fractal DHM tiles and a road network at the chosen scale, times
+each pipeline stage and writes the results as JSON:
+
+    python -m benchmarks.run_benchmarks --scale small --output results.json
+    python -m benchmarks.run_benchmarks --scale small --compare results.json
+
+Everything runs offline; generated data is kept in --workdir for reuse.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+import rasterio
+import shapely
+import geopandas as gpd
+import logging
+
+from backend.services.dhm_processor import DHMProcessor
+from backend.services.road_processor import RoadProcessor
+from backend.services.hill_database import HillDatabase
+from backend.services.dhm_processor import sample_points_along_line
+from backend.utils.profile_kernels import get_profile_kernels, resolve_backend
+from benchmarks.synthetic import generate_dem_tiles, generate_road_network, ORIGIN_X, ORIGIN_Y
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+# Synthetic data sizes; 'large' matches the real 0.4 m, 1 km DHM tiles
+SCALES = {
+    'small': {'tiles_x': 2, 'tiles_y': 2, 'tile_pixels': 1000, 'resolution': 0.8, 'road_spacing': 200.0},
+    'medium': {'tiles_x': 4, 'tiles_y': 4, 'tile_pixels': 1250, 'resolution': 0.8, 'road_spacing': 150.0},
+    'large': {'tiles_x': 6, 'tiles_y': 6, 'tile_pixels': 2500, 'resolution': 0.4, 'road_spacing': 100.0},
+}
+
+STAGES = ['merge', 'slope', 'sample_points', 'sample_lines', 'load_roads', 'gradients',
+          'gradients_cached', 'kernels', 'hills', 'hill_import', 'road_import']
+
+# Largest difference tolerated between a kernel backend and the NumPy reference
+KERNEL_TOLERANCE = 1e-9
+
+def prepare_data(workdir, params, seed):
+    """Generate the synthetic tiles and roads unless they already exist."""
+    dhm_dir = os.path.join(workdir, 'dhm')
+    roads_file = os.path.join(workdir, 'roads.geojson')
+    extent_x = params['tiles_x'] * params['tile_pixels'] * params['resolution']
+    extent_y = params['tiles_y'] * params['tile_pixels'] * params['resolution']
+    bounds = (ORIGIN_X, ORIGIN_Y, ORIGIN_X + extent_x, ORIGIN_Y + extent_y)
+
+    setup = {}
+    if not (os.path.isdir(dhm_dir) and any(f.startswith('DTM') for f in os.listdir(dhm_dir))):
+        start = time.perf_counter()
+        generate_dem_tiles(dhm_dir, params['tiles_x'], params['tiles_y'], params['tile_pixels'],
+                           params['resolution'], seed)
+        setup['generate_dem_seconds'] = time.perf_counter() - start
+    if not os.path.exists(roads_file):
+        start = time.perf_counter()
+        generate_road_network(roads_file, bounds, params['road_spacing'], seed)
+        setup['generate_roads_seconds'] = time.perf_counter() - start
+    return dhm_dir, roads_file, bounds, setup
+
+def timed(function, repeat=1):
+    """
+    Run a function repeat times.
+
+    Returns:
+        Tuple of (timing dict with best/mean/runs, result of the last run)
+    """
+    runs = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        runs.append(time.perf_counter() - start)
+    return {'seconds': min(runs), 'mean_seconds': float(np.mean(runs)), 'runs': runs}, result
+
+def run_benchmarks(workdir, scale='small', stages=STAGES, repeat=1, seed=0, sample_distance=10,
+                   point_count=100000, legacy_roads=0):
+    """
+    Run the pipeline benchmarks.
+
+    Args:
+        workdir: Directory for generated data and outputs
+        scale: Key of SCALES
+        stages: Stages to time; stages needed by later ones always run
+        repeat: Runs per stage; the best time is reported
+        seed: Random seed for the synthetic data
+        sample_distance: Distance between elevation samples in meters
+        point_count: Number of random points for the point sampling stage
+        legacy_roads: Number of roads for the standalone gradient_calculator
+            stage; 0 skips it
+
+    Returns:
+        Results dictionary
+    """
+    params = SCALES[scale]
+    dhm_dir, roads_file, bounds, setup = prepare_data(workdir, params, seed)
+    results = {}
+
+    def stage(name, function, **counts):
+        # Untimed stages still run once when a later stage needs their output
+        timing, result = timed(function, repeat if name in stages else 1)
+        if name in stages:
+            results[name] = dict(timing, **counts)
+            logger.info(f"{name}: {timing['seconds']:.3f}s")
+        return result
+
+    dhm = DHMProcessor(dhm_dir)
+    merged_path = stage('merge', _without(dhm.merged_dhm_path, dhm.merge_dhm_files))
+    with rasterio.open(merged_path) as src:
+        pixels = src.width * src.height
+    if 'merge' in results:
+        results['merge']['pixels'] = pixels
+        results['merge']['megapixels_per_second'] = pixels / 1e6 / results['merge']['seconds']
+
+    if 'slope' in stages:
+        stage('slope', _without(dhm.slope_path, dhm.compute_slope_raster), pixels=pixels)
+
+    dhm.load_merged_dhm(merge_if_missing=False)
+    rng = np.random.default_rng(seed)
+    xs = rng.uniform(bounds[0], bounds[2], point_count)
+    ys = rng.uniform(bounds[1], bounds[3], point_count)
+    if 'sample_points' in stages:
+        stage('sample_points', lambda: dhm.get_elevations(xs, ys), points=point_count)
+
+    processor = RoadProcessor(roads_file, dhm, cache_dir=os.path.join(workdir, 'cache'),
+                              sample_distance=sample_distance)
+    roads = stage('load_roads', processor.load_roads)
+    road_count = len(roads)
+    if 'load_roads' in results:
+        results['load_roads']['roads'] = road_count
+
+    if 'sample_lines' in stages:
+        total_length = float(roads.geometry.length.sum())
+        stage('sample_lines',
+              lambda: [dhm.sample_elevations_along_line(line, sample_distance) for line in roads.geometry],
+              roads=road_count, road_km=total_length / 1000)
+
+    stage('gradients', lambda: processor.calculate_road_gradients(use_cache=False), roads=road_count)
+    if 'gradients' in results:
+        results['gradients']['roads_per_second'] = road_count / results['gradients']['seconds']
+
+    if 'gradients_cached' in stages:
+        # Fill the cache, then time loading from it
+        processor.calculate_road_gradients()
+        stage('gradients_cached', processor.calculate_road_gradients, roads=road_count)
+
+    if 'kernels' in stages:
+        results.update(_compare_kernels(processor, sample_distance, repeat))
+
+    # Candidates are cached per minimum gradient; clear them so detection is timed
+    def identify():
+        processor._climb_candidates = {}
+        return processor.identify_hills()
+    hills = stage('hills', identify, roads=road_count)
+    if 'hills' in results:
+        results['hills']['hills'] = len(hills)
+
+    if 'hill_import' in stages:
+        hills_file = os.path.join(workdir, 'hills.geojson')
+        processor.save_hills(hills_file)
+        database = HillDatabase(os.path.join(workdir, 'hills.db'))
+        stage('hill_import', lambda: database.import_hills_from_geojson(hills_file), hills=len(hills))
+
+    if 'road_import' in stages:
+        stage('road_import', lambda: _import_roads(processor, workdir), roads=road_count)
+
+    if legacy_roads:
+        results['legacy_gradients'] = _legacy_gradients(roads_file, merged_path, workdir, legacy_roads)
+
+    dhm.close()
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'scale': scale,
+        'params': dict(params, seed=seed, sample_distance=sample_distance, repeat=repeat),
+        'environment': _environment(),
+        'git': _git_info(),
+        'setup': setup,
+        'stages': results
+    }
+
+def compare(baseline, current):
+    """
+    Print per-stage timings of two result sets side by side.
+
+    Returns:
+        Dictionary of stage -> current / baseline time ratio
+    """
+    ratios = {}
+    print(f"{'stage':<18}{'baseline':>12}{'current':>12}{'ratio':>9}")
+    for name, timing in current['stages'].items():
+        base = baseline['stages'].get(name)
+        if not base or 'seconds' not in base or 'seconds' not in timing:
+            continue
+        ratios[name] = timing['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        print(f"{name:<18}{base['seconds']:>11.3f}s{timing['seconds']:>11.3f}s{ratios[name]:>8.2f}x")
+    return ratios
+
+def _import_roads(processor, workdir):
+    """Import roads into a scratch copy of the app database."""
+    database_uri = f"sqlite:///{os.path.abspath(os.path.join(workdir, 'app.db'))}"
+    previous = os.environ.get('DATABASE_URI')
+    os.environ['DATABASE_URI'] = database_uri
+    try:
+        from seed_db import import_roads
+        return import_roads(processor)
+    finally:
+        if previous is None:
+            os.environ.pop('DATABASE_URI', None)
+        else:
+            os.environ['DATABASE_URI'] = previous
+
+def _legacy_gradients(roads_file, dem_file, workdir, road_count):
+    """Time the standalone gradient_calculator on the first roads."""
+    try:
+        from backend.services import gradient_calculator
+    except ImportError as e:
+        logger.warning(f"Skipping legacy gradient benchmark: {e}")
+        return {'skipped': str(e)}
+
+    subset_file = os.path.join(workdir, f'roads_first_{road_count}.geojson')
+    gpd.read_file(roads_file).head(road_count).to_file(subset_file, driver='GeoJSON')
+
+    # The legacy code prints per-road debug output
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        timing, _ = timed(lambda: gradient_calculator.calculate_road_gradients(subset_file, dem_file))
+    timing['roads'] = road_count
+    timing['roads_per_second'] = road_count / timing['seconds']
+    return timing
+
+def _compare_kernels(processor, sample_distance, repeat=1):
+    """
+    Time each profile kernel backend on the roads' raw profiles and check it against NumPy.
+
+    Every backend fills gaps, smooths, computes gradient statistics and runs
+    the climb sweep on the same DHM samples. Backends other than the NumPy
+    reference record the largest difference from it and whether all
+    outputs match within KERNEL_TOLERANCE.
+
+    Returns:
+        Dictionary of 'kernels_<backend>' stage results
+    """
+    profiles = [sample_points_along_line(line, sample_distance) for line in processor.roads_gdf.geometry
+                if line.length >= sample_distance * 2]
+    counts = [len(distances) for distances, _, _ in profiles]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+    distances = np.concatenate([distances for distances, _, _ in profiles])
+    xs = np.concatenate([xs for _, xs, _ in profiles])
+    ys = np.concatenate([ys for _, _, ys in profiles])
+    elevations = processor.dhm_processor.get_elevations(xs, ys, sample_distance)
+
+    def pipeline(kernels):
+        filled, gaps, filled_count, usable = kernels.fill_gaps(offsets, distances, elevations, processor.max_gap)
+        smoothed = kernels.smooth(offsets, filled, processor.smoothing_window, processor.smoothing_order)
+        statistics = kernels.statistics(offsets, distances, smoothed)
+        heights = smoothed - 0.03 * distances
+        climbs = [kernels.sweep(heights[start:end], 3.0)
+                  for start, end, ok in zip(offsets[:-1], offsets[1:], usable) if ok]
+        return [filled, gaps, filled_count, usable, smoothed, *statistics], climbs
+
+    backends = ['numpy'] + (['numba'] if resolve_backend('numba') == 'numba' else [])
+    results, reference = {}, None
+    for backend in backends:
+        kernels = get_profile_kernels(backend)
+        pipeline(kernels)  # compile or warm up
+        timing, (arrays, climbs) = timed(lambda: pipeline(kernels), repeat)
+        timing.update(roads=len(counts), samples=int(offsets[-1]))
+        if reference is None:
+            reference = arrays, climbs
+        else:
+            difference = max(float(np.nanmax(np.abs(np.asarray(a, dtype='float64') - b), initial=0))
+                             for a, b in zip(arrays, reference[0]))
+            nan_match = all(np.array_equal(np.isnan(np.asarray(a, dtype='float64')), np.isnan(b))
+                            for a, b in zip(arrays, reference[0]))
+            timing['max_difference'] = difference
+            timing['matches'] = bool(nan_match and difference <= KERNEL_TOLERANCE and climbs == reference[1])
+            timing['speedup'] = results['kernels_numpy']['seconds'] / timing['seconds']
+            if not timing['matches']:
+                logger.error(f"Profile kernels '{backend}' differ from the NumPy reference (max {difference:g})")
+        results[f'kernels_{backend}'] = timing
+        logger.info(f"kernels_{backend}: {timing['seconds']:.3f}s")
+    return results
+
+def _without(path, function):
+    """Wrap a stage that reuses an existing output file so every run does the work."""
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        return function()
+    return run
+
+def _environment():
+    """Interpreter, platform and key library versions."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'rasterio': rasterio.__version__,
+        'gdal': rasterio.__gdal_version__,
+        'shapely': shapely.__version__,
+        'geopandas': gpd.__version__
+    }
+
+def _git_info():
+    """Current commit and whether the tree has local changes, if in a git checkout."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Benchmark the gradient pipeline on synthetic data.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Size of the synthetic data')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to time')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per stage; the best time is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+    parser.add_argument('--sample-distance', type=float, default=10.0, help='Distance between elevation samples in meters')
+    parser.add_argument('--points', type=int, default=100000, help='Random points for the point sampling stage')
+    parser.add_argument('--legacy-roads', type=int, default=0,
+                        help='Also time the standalone gradient_calculator on this many roads')
+    parser.add_argument('--workdir', default=None, help='Directory for generated data (reused if it exists)')
+    parser.add_argument('--output', default=None, help='Write results JSON to this file')
+    parser.add_argument('--compare', default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Keep the pipeline INFO logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('backend').setLevel(logging.WARNING)
+        logging.getLogger('benchmarks.synthetic').setLevel(logging.WARNING)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix=f'hill-bench-{args.scale}-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = run_benchmarks(workdir, args.scale, args.stages, args.repeat, args.seed,
+                                 args.sample_distance, args.points, args.legacy_roads)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        logger.info(f"Results written to {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+    # Kernel backends that disagree with the reference fail the run
+    mismatched = [name for name, stage in results['stages'].items() if stage.get('matches') is False]
+    return 1 if mismatched else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
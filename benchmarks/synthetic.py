@@ -0,0 +1,205 @@
+# benchmarks/synthetic.py
+"""Synthetic DHM tiles and road networks for benchmarking the gradient pipeline."""
+import os
+import numpy as np
+import geopandas as gpd
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import LineString
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# CRS and nodata value of the Danish DHM
+DHM_CRS = 'EPSG:25832'
+DHM_NODATA = -9999.0
+
+# Lower left corner of the synthetic area (near Vejle)
+ORIGIN_X = 530000.0
+ORIGIN_Y = 6170000.0
+
+HIGHWAY_TYPES = ['residential', 'unclassified', 'tertiary', 'secondary', 'track']
+
+def fractal_terrain(xs, ys, seed=0, octaves=6, base_wavelength=1500.0, base_amplitude=60.0,
+                    persistence=0.5, base_elevation=40.0):
+    """
+    Fractal terrain heights from multi-octave value noise.
+
+    The noise is a function of world coordinates only, so tiles generated
+    separately join seamlessly.
+
+    Args:
+        xs, ys: Coordinate arrays (broadcastable) in meters
+        seed: Random seed
+        octaves: Number of noise layers
+        base_wavelength: Wavelength of the coarsest layer in meters
+        base_amplitude: Amplitude of the coarsest layer in meters
+        persistence: Amplitude factor between successive layers
+        base_elevation: Mean elevation in meters
+
+    Returns:
+        Float32 array of elevations
+    """
+    heights = np.full(np.broadcast(xs, ys).shape, base_elevation, dtype='float64')
+    wavelength, amplitude = base_wavelength, base_amplitude
+    for octave in range(octaves):
+        heights += amplitude * (2 * _value_noise(xs / wavelength, ys / wavelength, seed + octave) - 1)
+        wavelength /= 2
+        amplitude *= persistence
+    return np.maximum(heights, 0).astype('float32')
+
+def generate_dem_tiles(directory, tiles_x=2, tiles_y=2, tile_pixels=1000, resolution=0.8,
+                       seed=0, nodata_holes=2, block_rows=256):
+    """
+    Write a grid of synthetic DTM GeoTIFF tiles like the DHM download.
+
+    Args:
+        directory: Output directory
+        tiles_x, tiles_y: Number of tiles in each direction
+        tile_pixels: Width and height of each tile in pixels
+        resolution: Pixel size in meters
+        seed: Random seed
+        nodata_holes: Number of nodata rectangles (lakes) per tile
+        block_rows: Rows generated at a time, bounding memory use
+
+    Returns:
+        List of tile paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tile_extent = tile_pixels * resolution
+    paths = []
+
+    for row in range(tiles_y):
+        for col in range(tiles_x):
+            left = ORIGIN_X + col * tile_extent
+            top = ORIGIN_Y + (tiles_y - row) * tile_extent
+            path = os.path.join(directory, f"DTM_1km_{int(top // 1000)}_{int(left // 1000)}_{row}_{col}.tif")
+
+            profile = {
+                'driver': 'GTiff', 'width': tile_pixels, 'height': tile_pixels, 'count': 1,
+                'dtype': 'float32', 'crs': DHM_CRS, 'nodata': DHM_NODATA,
+                'transform': from_origin(left, top, resolution, resolution)
+            }
+            holes = [(rng.integers(0, tile_pixels), rng.integers(0, tile_pixels),
+                      rng.integers(5, tile_pixels // 20 + 6), rng.integers(5, tile_pixels // 20 + 6))
+                     for _ in range(nodata_holes)]
+
+            with rasterio.open(path, 'w', **profile) as dst:
+                xs = left + (np.arange(tile_pixels) + 0.5) * resolution
+                for start in range(0, tile_pixels, block_rows):
+                    rows = np.arange(start, min(start + block_rows, tile_pixels))
+                    ys = top - (rows + 0.5) * resolution
+                    block = fractal_terrain(xs[None, :], ys[:, None], seed)
+
+                    # Water surfaces have no data in the DHM
+                    for hole_row, hole_col, height, width in holes:
+                        r0, r1 = max(hole_row - start, 0), min(hole_row + height - start, len(rows))
+                        if r0 < r1:
+                            block[r0:r1, hole_col:hole_col + width] = DHM_NODATA
+
+                    dst.write(block, 1, window=((start, start + len(rows)), (0, tile_pixels)))
+            paths.append(path)
+
+    logger.info(f"Generated {len(paths)} synthetic DHM tiles in {directory}")
+    return paths
+
+def generate_road_network(path, bounds, spacing=200.0, seed=0, removal=0.15, split=0.2, structures=0.02,
+                          crs='EPSG:4326'):
+    """
+    Write a synthetic road network as GeoJSON.
+
+    Junctions sit on a jittered grid; neighbouring junctions are joined by
+    slightly winding ways. Some links are dropped so there are dead ends and
+    degree-two nodes, and some ways are split in two so climbs cross way
+    boundaries, as in OSM data. A few ways are tagged as bridges or tunnels.
+
+    Args:
+        path: Output GeoJSON path
+        bounds: (minx, miny, maxx, maxy) in the DHM CRS
+        spacing: Distance between junctions in meters
+        seed: Random seed
+        removal: Fraction of links left out
+        split: Fraction of ways split at their midpoint
+        structures: Fraction of links tagged bridge=yes or tunnel=yes
+        crs: CRS of the written file
+
+    Returns:
+        Number of ways written
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bounds
+    margin = spacing / 4
+    cols = int((maxx - minx - 2 * margin) // spacing) + 1
+    rows = int((maxy - miny - 2 * margin) // spacing) + 1
+
+    gx, gy = np.meshgrid(minx + margin + np.arange(cols) * spacing, miny + margin + np.arange(rows) * spacing)
+    jitter = spacing * 0.2
+    nodes = np.stack([gx.ravel(), gy.ravel()], axis=1) + rng.uniform(-jitter, jitter, (rows * cols, 2))
+    nodes[:, 0] = np.clip(nodes[:, 0], minx + 1, maxx - 1)
+    nodes[:, 1] = np.clip(nodes[:, 1], miny + 1, maxy - 1)
+
+    index = np.arange(rows * cols).reshape(rows, cols)
+    links = np.concatenate([
+        np.stack([index[:, :-1].ravel(), index[:, 1:].ravel()], axis=1),
+        np.stack([index[:-1, :].ravel(), index[1:, :].ravel()], axis=1)
+    ])
+    links = links[rng.random(len(links)) >= removal]
+
+    records = []
+    for u, v in links:
+        line = _winding_line(nodes[u], nodes[v], rng)
+        highway = HIGHWAY_TYPES[rng.integers(len(HIGHWAY_TYPES))]
+        name = f"Vej {len(records) + 1}"
+        tags = {'name': name, 'highway': highway, 'bridge': None, 'tunnel': None}
+        if rng.random() < structures:
+            tags['bridge' if rng.random() < 0.75 else 'tunnel'] = 'yes'
+        if rng.random() < split and len(line) > 3:
+            middle = len(line) // 2
+            records.append({**tags, 'geometry': LineString(line[:middle + 1])})
+            records.append({**tags, 'geometry': LineString(line[middle:])})
+        else:
+            records.append({**tags, 'geometry': LineString(line)})
+
+    roads = gpd.GeoDataFrame(records, geometry='geometry', crs=DHM_CRS)
+    if crs != DHM_CRS:
+        roads = roads.to_crs(crs)
+    roads.to_file(path, driver='GeoJSON')
+    logger.info(f"Generated {len(roads)} synthetic road ways in {path}")
+    return len(roads)
+
+def _winding_line(start, end, rng, vertices=6):
+    """Vertices of a gently winding line between two points."""
+    t = np.linspace(0, 1, vertices)[:, None]
+    line = start + (end - start) * t
+    normal = np.array([-(end - start)[1], (end - start)[0]]) / max(np.hypot(*(end - start)), 1e-9)
+    offsets = rng.normal(0, 8, vertices) * np.sin(np.pi * t[:, 0])
+    return line + offsets[:, None] * normal
+
+def _value_noise(x, y, seed):
+    """Smoothly interpolated lattice noise in [0, 1]."""
+    ix, iy = np.floor(x), np.floor(y)
+    fx, fy = x - ix, y - iy
+    ix, iy = ix.astype('int64'), iy.astype('int64')
+
+    # Smoothstep weights avoid visible lattice edges
+    wx = fx * fx * (3 - 2 * fx)
+    wy = fy * fy * (3 - 2 * fy)
+    top = _lattice(ix, iy, seed) * (1 - wx) + _lattice(ix + 1, iy, seed) * wx
+    bottom = _lattice(ix, iy + 1, seed) * (1 - wx) + _lattice(ix + 1, iy + 1, seed) * wx
+    return top * (1 - wy) + bottom * wy
+
+def _lattice(ix, iy, seed):
+    """Deterministic pseudo-random value in [0, 1) for integer lattice points."""
+    with np.errstate(over='ignore'):
+        h = (np.asarray(ix).astype('uint64') * np.uint64(0x9E3779B97F4A7C15)) \
+            ^ (np.asarray(iy).astype('uint64') * np.uint64(0xC2B2AE3D27D4EB4F)) \
+            ^ np.uint64((seed * 0x165667B1) & 0xFFFFFFFF)
+        # SplitMix64 finaliser
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    return (h >> np.uint64(11)).astype('float64') / float(1 << 53)
@@ -1,10 +1,14 @@
 # seed_db.py
 import os
+import hashlib
 import argparse
+from datetime import datetime
 import logging
+import config
 from backend.services.dhm_processor import DHMProcessor
 from backend.services.road_processor import RoadProcessor
 from backend.services.hill_database import HillDatabase
+from backend.utils.profiling import StageProfiler, PROFILER_MODES
 
 # Set up logging
 logging.basicConfig(
@@ -13,74 +17,192 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def process_data(args):
-    """Process data and populate the database."""
+def import_roads(road_processor, batch_size=5000, replace=False):
+    """
+    Import the processed roads into the app database.
+    
+    Roads are matched to existing rows by their source_key (see
+    road_processor.source_keys), or by identical coordinates for rows
+    imported before keys were stored. Matched rows are updated in place, so
+    their ids, the featured/favorite flags set by users and Hill.road_id links
+    stay valid, and new roads are inserted. Roads missing from the new data
+    are removed unless they are featured, a favorite or linked from a hill.
+    
+    Args:
+        road_processor: RoadProcessor with gradients calculated or cached
+        batch_size: Rows per INSERT/UPDATE batch
+        replace: Delete all roads (and unlink hills from them) before importing
+        
+    Returns:
+        Number of roads imported
+    """
+    # The Road model lives with the Flask app; create_app also adds new columns
+    from app import create_app, db, Road, Hill
+    from sqlalchemy import update, or_
+    
+    records = road_processor.road_records()
+    app = create_app()
+    with app.app_context():
+        existing, legacy = {}, {}
+        if replace:
+            Hill.query.filter(Hill.road_id.isnot(None)).update({Hill.road_id: None}, synchronize_session=False)
+            Road.query.delete()
+        else:
+            rows = db.session.query(Road.id, Road.source_key, Road.coordinates_json).yield_per(batch_size)
+            for road_id, key, coordinates_json in rows:
+                if key:
+                    existing[key] = road_id
+                else:
+                    legacy.setdefault(_coordinates_hash(coordinates_json), road_id)
+        
+        updates, inserts, matched = [], [], set()
+        for record in records:
+            road_id = existing.get(record['source_key'])
+            if road_id is None and legacy:
+                road_id = legacy.pop(_coordinates_hash(record['coordinates_json']), None)
+            if road_id is None:
+                inserts.append(record)
+            else:
+                matched.add(road_id)
+                updates.append({'id': road_id, **record})
+        
+        # Roads gone from the data, except those users or hills refer to
+        stale = (set(existing.values()) | set(legacy.values())) - matched
+        removed = []
+        if stale:
+            kept = {road_id for road_id, in db.session.query(Road.id).filter(
+                or_(Road.featured.is_(True), Road.favorite.is_(True)))}
+            kept |= {road_id for road_id, in db.session.query(Hill.road_id).filter(Hill.road_id.isnot(None))}
+            removed = sorted(stale - kept)
+            for start in range(0, len(removed), batch_size):
+                Road.query.filter(Road.id.in_(removed[start:start + batch_size])).delete(synchronize_session=False)
+        
+        for start in range(0, len(updates), batch_size):
+            db.session.execute(update(Road), updates[start:start + batch_size])
+        for start in range(0, len(inserts), batch_size):
+            db.session.execute(Road.__table__.insert(), inserts[start:start + batch_size])
+        db.session.commit()
+    logger.info(f"Roads updated: {len(updates)}, added: {len(inserts)}, removed: {len(removed)}, "
+                f"kept for users or hills: {len(stale) - len(removed)}")
+    return len(records)
+
+def _coordinates_hash(coordinates_json):
+    return hashlib.sha1((coordinates_json or '').encode()).digest()
+
+def process_data(args, profiler=None):
+    """
+    Process data and populate the database.
+    
+    Args:
+        args: Parsed command line arguments
+        profiler: StageProfiler timing each step; a timers-only one is used if not given
+    """
     logger.info("Starting data processing...")
+    profiler = profiler or StageProfiler()
     
     # Initialize processors
     dhm_processor = DHMProcessor(args.data_dir)
-    road_processor = RoadProcessor(args.roads_file, dhm_processor)
+    if args.shared_dem:
+        dhm_processor.attach_shared_dem(args.shared_dem)
+    road_processor = RoadProcessor(
+        args.roads_file,
+        dhm_processor,
+        cache_dir=False if args.no_cache else args.cache_dir,
+        sample_distance=args.sample_distance,
+        max_gap=args.max_gap,
+        smoothing_window=args.smoothing_window,
+        smoothing_order=args.smoothing_order,
+        kernel=args.kernel,
+        profiler=profiler
+    )
     hill_db = HillDatabase(args.db_path)
     
     # Process DHM data if requested
     if args.process_dhm:
         logger.info("Processing DHM data...")
         try:
-            merged_path = dhm_processor.merge_dhm_files()
-            logger.info(f"DHM data processed and saved to {merged_path}")
+            with profiler.stage('process_dhm'):
+                merged_path = dhm_processor.merge_dhm_files(progress_callback=profiler.progress_callback('windows'))
+                logger.info(f"DHM data processed and saved to {merged_path}")
         except Exception as e:
             logger.error(f"Error processing DHM data: {e}")
             if not args.continue_on_error:
                 return False
     
+    # Compute slope/aspect raster if requested
+    if args.compute_slope:
+        logger.info("Computing slope/aspect raster...")
+        try:
+            with profiler.stage('compute_slope'):
+                slope_path = dhm_processor.compute_slope_raster(max_workers=args.workers)
+                logger.info(f"Slope/aspect raster saved to {slope_path}")
+        except Exception as e:
+            logger.error(f"Error computing slope raster: {e}")
+            if not args.continue_on_error:
+                return False
+    
     # Process road data if requested
     if args.process_roads:
         logger.info("Processing road data...")
         try:
-            # Load roads
-            roads_gdf = road_processor.load_roads()
-            logger.info(f"Loaded {len(roads_gdf)} road segments")
+            with profiler.stage('process_roads'):
+                # Load roads
+                roads_gdf = road_processor.load_roads()
+                logger.info(f"Loaded {len(roads_gdf)} road segments")
             
-            # Calculate gradients
-            road_processor.calculate_road_gradients(
-                sample_distance=args.sample_distance,
-                smoothing=not args.no_smoothing
-            )
+                # Calculate gradients
+                road_processor.calculate_road_gradients(smoothing=not args.no_smoothing)
             
-            # Save processed roads
-            output_path = os.path.join(args.data_dir, 'processed_roads.geojson')
-            saved = road_processor.save_processed_roads(output_path)
-            if saved:
-                logger.info(f"Processed road data saved to {output_path}")
-            else:
-                logger.error("Failed to save processed road data")
-                if not args.continue_on_error:
-                    return False
+                # Save processed roads
+                output_path = os.path.join(args.data_dir, 'processed_roads.geojson')
+                with profiler.timer('save_roads'):
+                    saved = road_processor.save_processed_roads(output_path)
+                if saved:
+                    logger.info(f"Processed road data saved to {output_path}")
+                else:
+                    logger.error("Failed to save processed road data")
+                    if not args.continue_on_error:
+                        return False
         except Exception as e:
             logger.error(f"Error processing road data: {e}")
             if not args.continue_on_error:
                 return False
     
+    # Import roads with their elevation profiles if requested
+    if args.import_roads:
+        logger.info("Importing roads to database...")
+        try:
+            with profiler.stage('import_roads'):
+                imported = import_roads(road_processor, replace=args.replace_roads)
+                profiler.count('roads_imported', imported)
+                logger.info(f"Imported {imported} roads with elevation profiles")
+        except Exception as e:
+            logger.error(f"Error importing roads to database: {e}")
+            if not args.continue_on_error:
+                return False
+    
     # Identify hills if requested
     if args.identify_hills:
         logger.info("Identifying hills...")
         try:
-            # Set hill identification parameters
-            # These should be set before calling identify_hills()
-            road_processor.HILL_MIN_LENGTH = args.min_length
-            road_processor.HILL_MIN_GRADIENT = args.min_gradient
-            road_processor.HILL_MIN_ELEVATION_GAIN = args.min_elevation_gain
+            with profiler.stage('identify_hills'):
+                # Identify and save hills
+                hills_path = os.path.join(args.data_dir, 'denmark_hills.geojson')
+                saved = road_processor.save_hills(
+                    hills_path,
+                    min_length=args.min_length,
+                    min_gradient=args.min_gradient,
+                    min_elevation_gain=args.min_elevation_gain,
+                    category_method=args.category_method,
+                    category_thresholds=args.category_thresholds
+                )
             
-            # Identify and save hills
-            hills_path = os.path.join(args.data_dir, 'denmark_hills.geojson')
-            saved = road_processor.save_hills(hills_path)
-            
-            if saved:
-                logger.info(f"Identified hills saved to {hills_path}")
-            else:
-                logger.error("Failed to save identified hills")
-                if not args.continue_on_error:
-                    return False
+                if saved:
+                    logger.info(f"Identified hills saved to {hills_path}")
+                else:
+                    logger.error("Failed to save identified hills")
+                    if not args.continue_on_error:
+                        return False
         except Exception as e:
             logger.error(f"Error identifying hills: {e}")
             if not args.continue_on_error:
@@ -90,23 +212,24 @@ def process_data(args):
     if args.import_database:
         logger.info("Importing hills to database...")
         try:
-            # Initialize database
-            hill_db.init_db()
+            with profiler.stage('import_database'):
+                # Initialize database
+                hill_db.init_db()
             
-            # Import hills
-            hills_path = os.path.join(args.data_dir, 'denmark_hills.geojson')
-            if not os.path.exists(hills_path):
-                logger.error(f"Hills file not found: {hills_path}")
-                if not args.continue_on_error:
-                    return False
-            else:
-                imported = hill_db.import_hills_from_geojson(hills_path)
-                if imported:
-                    logger.info(f"Hills imported to database: {args.db_path}")
-                else:
-                    logger.error("Failed to import hills to database")
+                # Import hills
+                hills_path = os.path.join(args.data_dir, 'denmark_hills.geojson')
+                if not os.path.exists(hills_path):
+                    logger.error(f"Hills file not found: {hills_path}")
                     if not args.continue_on_error:
                         return False
+                else:
+                    imported = hill_db.import_hills_from_geojson(hills_path)
+                    if imported:
+                        logger.info(f"Hills imported to database: {args.db_path}")
+                    else:
+                        logger.error("Failed to import hills to database")
+                        if not args.continue_on_error:
+                            return False
         except Exception as e:
             logger.error(f"Error importing hills to database: {e}")
             if not args.continue_on_error:
@@ -123,40 +246,83 @@ def main():
     parser.add_argument('--data-dir', default='data', help='Directory containing data files')
     parser.add_argument('--roads-file', default='data/denmark_roads.geojson', help='Path to roads GeoJSON file')
     parser.add_argument('--db-path', default='hills.db', help='Path to SQLite database')
+    parser.add_argument('--cache-dir', default=None, help='Gradient cache directory (default: cache next to the roads file)')
     
     # Processing flags
     parser.add_argument('--process-dhm', action='store_true', help='Process DHM data')
+    parser.add_argument('--compute-slope', action='store_true', help='Compute slope/aspect raster from the merged DHM')
     parser.add_argument('--process-roads', action='store_true', help='Process road data')
+    parser.add_argument('--import-roads', action='store_true', help='Import roads and their elevation profiles to the app database')
+    parser.add_argument('--replace-roads', action='store_true',
+                        help='Delete all roads before importing, dropping user flags and hill links (not set by --all)')
     parser.add_argument('--identify-hills', action='store_true', help='Identify hills')
     parser.add_argument('--import-database', action='store_true', help='Import hills to database')
     parser.add_argument('--all', action='store_true', help='Perform all processing steps')
     
     # Processing parameters
     parser.add_argument('--sample-distance', type=float, default=10.0, help='Distance between elevation samples in meters')
+    parser.add_argument('--max-gap', type=float, default=config.PROFILE_MAX_GAP,
+                        help='Longest DHM nodata gap in meters to interpolate along a road profile')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker threads for raster processing')
     parser.add_argument('--no-smoothing', action='store_true', help='Disable elevation profile smoothing')
-    parser.add_argument('--min-length', type=float, default=100.0, help='Minimum hill length in meters')
-    parser.add_argument('--min-gradient', type=float, default=3.0, help='Minimum average gradient percentage')
-    parser.add_argument('--min-elevation-gain', type=float, default=10.0, help='Minimum elevation gain in meters')
+    parser.add_argument('--smoothing-window', type=int, default=config.PROFILE_SMOOTHING_WINDOW,
+                        help='Samples in the Savitzky-Golay smoothing window (odd)')
+    parser.add_argument('--smoothing-order', type=int, default=config.PROFILE_SMOOTHING_ORDER,
+                        help='Polynomial order of the Savitzky-Golay smoothing')
+    parser.add_argument('--shared-dem', default=config.DHM_SHARED_MEMORY,
+                        help='Read elevations from a DHM published in shared memory under this name')
+    parser.add_argument('--kernel', choices=['auto', 'numpy', 'numba'], default=config.PROFILE_KERNEL,
+                        help='Profile kernel backend; auto uses Numba when it is installed')
+    parser.add_argument('--no-cache', action='store_true', help='Recalculate gradients instead of using the gradient cache')
+    parser.add_argument('--min-length', type=float, default=config.HILL_MIN_LENGTH, help='Minimum hill length in meters')
+    parser.add_argument('--min-gradient', type=float, default=config.HILL_MIN_GRADIENT, help='Minimum average gradient percentage')
+    parser.add_argument('--min-elevation-gain', type=float, default=config.HILL_MIN_ELEVATION_GAIN, help='Minimum elevation gain in meters')
+    parser.add_argument('--category-method', choices=['gradient', 'score'], default=config.HILL_CATEGORY_METHOD,
+                        help='Categorise hills by average gradient or by FIETS-style climb score')
+    parser.add_argument('--category-thresholds', type=float, nargs=4, default=config.HILL_CATEGORY_THRESHOLDS,
+                        metavar=('CAT3', 'CAT2', 'CAT1', 'HC'),
+                        help='Lower bounds of categories 3, 2, 1 and HC for the category method')
     
     # Error handling
     parser.add_argument('--continue-on-error', action='store_true', help='Continue processing if an error occurs')
     
+    # Profiling
+    parser.add_argument('--profile', action='store_true',
+                        help='Write a JSON report of per-stage timers and counters')
+    parser.add_argument('--profiler', choices=PROFILER_MODES, default=None,
+                        help='Also profile each stage with cProfile or a sampling profiler (implies --profile)')
+    parser.add_argument('--profile-output', default=None,
+                        help='Profile report path (default: <data-dir>/profiles/seed_<timestamp>.json)')
+    
     args = parser.parse_args()
     
     # If --all is specified, enable all processing steps
     if args.all:
         args.process_dhm = True
+        args.compute_slope = True
         args.process_roads = True
+        args.import_roads = True
         args.identify_hills = True
         args.import_database = True
     
     # Check if at least one processing step is enabled
-    if not (args.process_dhm or args.process_roads or args.identify_hills or args.import_database):
+    if not (args.process_dhm or args.compute_slope or args.process_roads or args.import_roads or args.identify_hills or args.import_database):
         logger.error("No processing steps specified. Use --help for usage information.")
         return 1
     
+    # Profile report and profiler dumps go next to each other
+    args.profile = args.profile or args.profiler is not None or args.profile_output is not None
+    profile_output = args.profile_output or os.path.join(
+        args.data_dir, 'profiles', f"seed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    profiler = StageProfiler(mode=args.profiler,
+                             output_dir=os.path.splitext(profile_output)[0] if args.profiler else None)
+    
     # Process data
-    success = process_data(args)
+    try:
+        success = process_data(args, profiler)
+    finally:
+        if args.profile:
+            profiler.write_report(profile_output)
     
     return 0 if success else 1
 
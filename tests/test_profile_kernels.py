@@ -0,0 +1,108 @@
+# tests/test_profile_kernels.py
+"""The Numba profile kernels must match the NumPy reference implementation."""
+import numpy as np
+import pytest
+
+pytest.importorskip('numba')
+
+from backend.utils.profile_kernels import ProfileKernels, NumbaKernels
+
+TOLERANCE = 1e-9
+MAX_GAP = 50.0
+
+@pytest.fixture(scope='module')
+def kernels():
+    return ProfileKernels(), NumbaKernels()
+
+def flat(profiles, spacing=10.0):
+    """Offsets, distances and elevations of a list of elevation lists."""
+    counts = [len(p) for p in profiles]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+    distances = np.concatenate([np.arange(n) * spacing for n in counts]) if profiles else np.empty(0)
+    elevations = np.concatenate([np.asarray(p, dtype='float64') for p in profiles]) if profiles else np.empty(0)
+    return offsets, distances.astype('float64'), elevations
+
+def clean_profiles():
+    rng = np.random.default_rng(7)
+    return [[], [12.0], [3.0, 4.5], [1.0, 2.0, 1.5], list(rng.normal(40, 2, 5)), list(rng.normal(40, 2, 6)),
+            [], list(np.cumsum(rng.normal(0, 1, 60)) + 100), list(np.full(8, 20.0))]
+
+def gappy_profiles():
+    nan = np.nan
+    rng = np.random.default_rng(11)
+    interior = np.cumsum(rng.normal(0, 1, 30)) + 50
+    interior[[4, 5, 6, 15]] = nan
+    too_long = np.cumsum(rng.normal(0, 1, 30)) + 50
+    too_long[8:16] = nan
+    return [[], [nan], [nan, 5.0], [nan, nan, 3.0, 4.0, nan], list(interior), list(too_long),
+            [1.0, nan, nan, nan], [nan, nan, nan], [2.0, nan, 4.0], [7.0, 8.0]]
+
+def assert_close(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE, equal_nan=True)
+
+@pytest.mark.parametrize('profiles', [gappy_profiles(), clean_profiles(), []], ids=['gaps', 'clean', 'empty'])
+def test_fill_gaps(kernels, profiles):
+    reference, numba = kernels
+    offsets, distances, elevations = flat(profiles)
+    expected = reference.fill_gaps(offsets, distances, elevations, MAX_GAP)
+    actual = numba.fill_gaps(offsets, distances, elevations, MAX_GAP)
+
+    assert_close(actual[0], expected[0])
+    assert_close(actual[1], expected[1])
+    np.testing.assert_array_equal(actual[2], expected[2])
+    np.testing.assert_array_equal(actual[3], expected[3])
+
+def test_fill_gaps_leaves_input_unchanged(kernels):
+    offsets, distances, elevations = flat(gappy_profiles())
+    original = elevations.copy()
+    for kernel in kernels:
+        kernel.fill_gaps(offsets, distances, elevations, MAX_GAP)
+        np.testing.assert_array_equal(elevations, original)
+
+@pytest.mark.parametrize('window, polyorder', [(5, 2), (7, 3), (3, 1)])
+@pytest.mark.parametrize('profiles', [clean_profiles(), []], ids=['clean', 'empty'])
+def test_smooth(kernels, profiles, window, polyorder):
+    reference, numba = kernels
+    offsets, _, elevations = flat(profiles)
+    assert_close(numba.smooth(offsets, elevations, window, polyorder),
+                 reference.smooth(offsets, elevations, window, polyorder))
+
+def test_smooth_rejects_invalid_window(kernels):
+    offsets, _, elevations = flat(clean_profiles())
+    with pytest.raises(ValueError):
+        kernels[1].smooth(offsets, elevations, 4, 2)
+
+@pytest.mark.parametrize('profiles', [clean_profiles(), []], ids=['clean', 'empty'])
+def test_statistics(kernels, profiles):
+    reference, numba = kernels
+    offsets, distances, elevations = flat(profiles)
+    expected = reference.statistics(offsets, distances, elevations)
+    actual = numba.statistics(offsets, distances, elevations)
+    for a, e in zip(actual[:3], expected[:3]):
+        assert_close(a, e)
+    np.testing.assert_array_equal(actual[3], expected[3])
+
+def test_statistics_skips_zero_length_steps(kernels):
+    reference, numba = kernels
+    offsets = np.array([0, 4])
+    distances = np.array([0.0, 10.0, 10.0, 20.0])
+    elevations = np.array([1.0, 2.0, 2.5, 2.0])
+    expected = reference.statistics(offsets, distances, elevations)
+    actual = numba.statistics(offsets, distances, elevations)
+    for a, e in zip(actual, expected):
+        assert_close(a, e)
+    assert actual[3][0] == 2
+
+@pytest.mark.parametrize('heights', [
+    [],
+    [5.0],
+    [1.0, 2.0, 3.0, 4.0],
+    [4.0, 3.0, 2.0, 1.0],
+    [0.0, 5.0, 1.0, 6.0, 2.0, 10.0, 0.0, 3.0],
+    list(np.full(10, 2.0)),
+    list(np.cumsum(np.random.default_rng(3).normal(0, 2, 200)))
+], ids=['empty', 'single', 'rising', 'falling', 'dips', 'flat', 'random_walk'])
+@pytest.mark.parametrize('max_drop', [0.0, 3.0])
+def test_sweep(kernels, heights, max_drop):
+    reference, numba = kernels
+    assert numba.sweep(heights, max_drop) == reference.sweep(heights, max_drop)
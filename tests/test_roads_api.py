@@ -0,0 +1,27 @@
+# tests/test_roads_api.py
+"""Field and geometry projection of the roads API."""
+import json
+import pytest
+
+from app import create_app, db, Road
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'roads.db'}")
+    app = create_app()
+    with app.app_context():
+        db.session.add(Road(name='Vej 1', highway='secondary', length_meters=250.0, min_elevation=10.0,
+                            max_elevation=22.0, gradient=4.8, coordinates_json='[[9.48, 55.67], [9.49, 55.68]]'))
+        db.session.commit()
+    return app.test_client()
+
+def test_fields_and_geometry(client):
+    response = client.get('/api/roads?fields=id,name&geometry=none')
+    assert response.status_code == 200
+    assert json.loads(response.get_data(as_text=True))['roads'] == [{'id': 1, 'name': 'Vej 1'}]
+
+@pytest.mark.parametrize('query', ['fields=coordinates&geometry=none', 'fields=,'])
+def test_no_fields_left(client, query):
+    response = client.get(f'/api/roads?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'